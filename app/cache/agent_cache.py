@@ -0,0 +1,17 @@
+# app/cache/agent_cache.py
+import hashlib
+import os
+from app.cache.ttl_cache import TTLCache
+
+# Agentes compilados (prompt + LLM con tools enlazadas): armarlos cuesta validar
+# el prompt y serializar los schemas de las tools, así que se reutilizan por prompt.
+# No guardan estado de conversación: la Memory va en el AgentExecutor de cada request.
+AGENT_CACHE_TTL_SECONDS = float(os.getenv('AGENT_CACHE_TTL_SECONDS', '3600'))
+AGENT_CACHE_MAXSIZE = int(os.getenv('AGENT_CACHE_MAXSIZE', '256'))
+
+# sha256(system prompt) -> agente (Runnable de create_openai_tools_agent)
+agent_cache = TTLCache(maxsize=AGENT_CACHE_MAXSIZE, ttl_seconds=AGENT_CACHE_TTL_SECONDS, name="agents")
+
+
+def agent_cache_key(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
@@ -0,0 +1,57 @@
+# app/cache/config_cache.py
+import os
+from typing import Optional
+from app.cache.ttl_cache import TTLCache
+
+# Tablas pequeñas y casi estáticas: TTL largo e invalidación explícita al escribir
+CONFIG_CACHE_TTL_SECONDS = float(os.getenv('CONFIG_CACHE_TTL_SECONDS', '300'))
+
+# display_phone_number -> Optional[AccountSnapshot]
+account_cache = TTLCache(maxsize=1024, ttl_seconds=CONFIG_CACHE_TTL_SECONDS, name="accounts")
+
+# display_phone_number -> tuple[TextChatbotSnapshot, ...]
+chatbot_config_cache = TTLCache(maxsize=1024, ttl_seconds=CONFIG_CACHE_TTL_SECONDS, name="text_chatbot")
+
+
+def invalidate_account(from_uid: Optional[str] = None) -> None:
+    """Invalida la cuenta de un número, o todas si from_uid es None"""
+    if from_uid is None:
+        account_cache.clear()
+    else:
+        account_cache.invalidate(from_uid)
+
+
+def invalidate_chatbot_config(from_uid: Optional[str] = None) -> None:
+    """Invalida la configuración de chatbot de un número, o todas si from_uid es None"""
+    if from_uid is None:
+        chatbot_config_cache.clear()
+    else:
+        chatbot_config_cache.invalidate(from_uid)
+
+
+# (account_id, current_path) -> CompiledMenu (opciones hijas en tbl_simple_answer)
+menu_options_cache = TTLCache(maxsize=4096, ttl_seconds=CONFIG_CACHE_TTL_SECONDS, name="menu_options")
+
+
+def invalidate_menu_options(account_id: Optional[str] = None) -> None:
+    """Invalida los menús compilados de una cuenta, o todos si account_id es None"""
+    if account_id is None:
+        menu_options_cache.clear()
+    else:
+        menu_options_cache.invalidate_where(lambda key: key[0] == account_id)
+
+
+# Cuentas con más respuestas que esto no se cachean completas (se consulta la BD por path)
+SIMPLE_ANSWER_GRAPH_MAX_NODES = int(os.getenv('SIMPLE_ANSWER_GRAPH_MAX_NODES', '20000'))
+
+# account_id -> Optional[SimpleAnswerGraph] (None = cuenta demasiado grande para cachear)
+simple_answer_graph_cache = TTLCache(maxsize=256, ttl_seconds=CONFIG_CACHE_TTL_SECONDS, name="simple_answer_graph")
+
+
+def invalidate_simple_answers(account_id: Optional[str] = None) -> None:
+    """Invalida grafo y menús compilados de una cuenta, o de todas si account_id es None"""
+    if account_id is None:
+        simple_answer_graph_cache.clear()
+    else:
+        simple_answer_graph_cache.invalidate(account_id)
+    invalidate_menu_options(account_id)
@@ -0,0 +1,149 @@
+# app/cache/config_changes.py
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from app.cache.config_cache import invalidate_account, invalidate_chatbot_config, invalidate_simple_answers
+from app.utils.metrics import metrics
+
+# Propagación entre workers de los cambios en tbl_simple_answer / tbl_text_chatbot /
+# tbl_accounts (tbl_config_change_log, llenada por triggers en la migración 0006)
+CONFIG_CHANGES_ENABLED = os.getenv('CONFIG_CHANGES_ENABLED', 'true').lower() == 'true'
+CONFIG_CHANGES_POLL_SECONDS = float(os.getenv('CONFIG_CHANGES_POLL_SECONDS', '0.5'))
+CONFIG_CHANGES_RETRY_SECONDS = float(os.getenv('CONFIG_CHANGES_RETRY_SECONDS', '10'))
+CONFIG_CHANGES_BATCH_SIZE = int(os.getenv('CONFIG_CHANGES_BATCH_SIZE', '1000'))
+# Ids por debajo del último leído que se vuelven a consultar: una transacción que
+# tomó su id antes pero hizo commit después aparece "atrás" del último visto
+CONFIG_CHANGES_LOOKBACK_IDS = int(os.getenv('CONFIG_CHANGES_LOOKBACK_IDS', '100'))
+
+# tabla -> invalidación por alcance (account_id o from_uid; None = todo)
+CHANGE_HANDLERS: Dict[str, Callable[[Optional[str]], None]] = {
+    "tbl_simple_answer": invalidate_simple_answers,
+    "tbl_text_chatbot": invalidate_chatbot_config,
+    "tbl_accounts": invalidate_account,
+}
+
+
+class ConfigChangePoller:
+    """
+    Un hilo por worker que lee tbl_config_change_log por id (índice de la PK,
+    una query barata cada CONFIG_CHANGES_POLL_SECONDS) e invalida solo la
+    cuenta / número afectado. Las escrituras del propio worker ya invalidan
+    al momento desde el repository; esto cubre a los demás workers y las
+    ediciones hechas directo en la BD.
+    """
+
+    def __init__(self, interval_seconds: float = CONFIG_CHANGES_POLL_SECONDS,
+                 batch_size: int = CONFIG_CHANGES_BATCH_SIZE,
+                 lookback_ids: int = CONFIG_CHANGES_LOOKBACK_IDS,
+                 enabled: bool = CONFIG_CHANGES_ENABLED):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.lookback_ids = lookback_ids
+        self.enabled = enabled
+        self.last_id: Optional[int] = None
+        self._seen: Set[int] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.changes_applied = 0
+        self.invalidations = 0
+        self.last_poll_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        """Lanza el hilo de sondeo (idempotente)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="config-changes", daemon=True)
+                self._thread.start()
+
+    def ensure_initialized(self) -> None:
+        """
+        Toma como punto de partida el último cambio registrado. El warm-up lo
+        llama antes de precargar, para no perder cambios hechos mientras tanto.
+        """
+        if self.last_id is not None:
+            return
+        from config.database import db_session_scope
+        from app.repositories.config_change_log_repository import ConfigChangeLogRepository
+
+        with db_session_scope() as db:
+            repo = ConfigChangeLogRepository(db)
+            last_id = repo.get_last_id()
+            # Los cambios ya presentes en la ventana de lookback no se vuelven a aplicar
+            recent = {row.id for row in repo.find_after(max(last_id - self.lookback_ids, 0), self.batch_size)}
+        with self._lock:
+            if self.last_id is None:
+                self.last_id = last_id
+                self._seen = recent
+                print(f"🔄 CONFIG_CHANGES: Escuchando cambios desde id {last_id}")
+
+    def poll_once(self) -> int:
+        """Aplica los cambios nuevos; retorna cuántos"""
+        from config.database import db_session_scope
+        from app.repositories.config_change_log_repository import ConfigChangeLogRepository
+
+        self.ensure_initialized()
+        started = time.perf_counter()
+        with db_session_scope() as db:
+            rows = ConfigChangeLogRepository(db).find_after(
+                max(self.last_id - self.lookback_ids, 0), self.batch_size
+            )
+            changes = [(row.id, row.table_name, row.scope_key) for row in rows if row.id not in self._seen]
+
+        scopes: Set[Tuple[str, Optional[str]]] = set()
+        for change_id, table_name, scope_key in changes:
+            self._seen.add(change_id)
+            scopes.add((table_name, scope_key))
+        for table_name, scope_key in scopes:
+            handler = CHANGE_HANDLERS.get(table_name)
+            if handler is not None:
+                handler(scope_key)
+
+        if changes:
+            self.last_id = max(self.last_id, changes[-1][0])
+            self.changes_applied += len(changes)
+            self.invalidations += len(scopes)
+            metrics.increment("config_changes.applied", len(changes))
+            labels = sorted(f"{table}:{scope or '*'}" for table, scope in scopes)
+            print(f"🔄 CONFIG_CHANGES: {len(changes)} cambios -> invalidado {', '.join(labels[:20])}"
+                  f"{'...' if len(labels) > 20 else ''}")
+        # Solo se recuerdan los ids que siguen dentro de la ventana de lookback
+        self._seen = {i for i in self._seen if i > self.last_id - self.lookback_ids}
+
+        metrics.observe("config_changes.poll", time.perf_counter() - started)
+        self.last_poll_at = datetime.now().isoformat(timespec="seconds")
+        return len(changes)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.poll_once()
+                if self.last_error is not None:
+                    print("✅ CONFIG_CHANGES: Sondeo recuperado")
+                self.last_error = None
+                time.sleep(self.interval_seconds)
+            except Exception as e:
+                # Sin la migración 0006 o sin BD: reintenta sin inundar el log
+                if self.last_error != str(e):
+                    print(f"❌ CONFIG_CHANGES: Error sondeando cambios: {str(e)[:200]}")
+                self.last_error = str(e)
+                metrics.increment("config_changes.error")
+                time.sleep(CONFIG_CHANGES_RETRY_SECONDS)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "last_id": self.last_id,
+            "changes_applied": self.changes_applied,
+            "invalidations": self.invalidations,
+            "last_poll_at": self.last_poll_at,
+            "last_error": self.last_error,
+        }
+
+
+# Poller compartido por el proceso
+config_change_poller = ConfigChangePoller()
@@ -0,0 +1,76 @@
+# app/cache/response_cache.py
+import hashlib
+import os
+import re
+from typing import Iterable, Optional, Tuple
+from app.cache.ttl_cache import TTLCache
+from app.search.text_normalizer import fold_accents
+
+# Caché de respuestas del agente para turnos triviales (saludos, agradecimientos...)
+LLM_RESPONSE_CACHE_ENABLED = os.getenv('LLM_RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('LLM_RESPONSE_CACHE_TTL_SECONDS', '3600'))
+LLM_RESPONSE_CACHE_MAXSIZE = int(os.getenv('LLM_RESPONSE_CACHE_MAXSIZE', '2048'))
+
+# Cuántos mensajes previos entran en la huella del historial
+LLM_CACHE_HISTORY_MESSAGES = int(os.getenv('LLM_CACHE_HISTORY_MESSAGES', '2'))
+
+# Intenciones que se pueden cachear (coma-separadas, ver CACHEABLE_INTENT_PATTERNS)
+LLM_CACHEABLE_INTENTS = frozenset(
+    i.strip() for i in os.getenv('LLM_CACHEABLE_INTENTS', 'saludo,agradecimiento,despedida').split(',') if i.strip()
+)
+
+# Patrones sobre el mensaje normalizado (minúsculas, sin tildes ni signos).
+# Deben cubrir el mensaje COMPLETO: "hola, busco un celular" no es un saludo cacheable.
+CACHEABLE_INTENT_PATTERNS = {
+    "saludo": re.compile(
+        r"^(hola|holi|hello|hi|hey|buenas|buen dia|buenos dias|buenas tardes|buenas noches|que tal)"
+        r"( (que tal|como estas|como esta|hola|buenas))?$"
+    ),
+    "agradecimiento": re.compile(
+        r"^(ok |listo |perfecto |genial )?(gracias|muchas gracias|mil gracias|thanks|te agradezco)"
+        r"( (por todo|por la ayuda|por tu ayuda))?$"
+    ),
+    "despedida": re.compile(
+        r"^(chau|chao|adios|bye|hasta luego|hasta pronto|nos vemos|eso es todo|nada mas)"
+        r"( gracias)?$"
+    ),
+    "confirmacion": re.compile(r"^(ok|okey|okay|si|listo|dale|vale|perfecto|de acuerdo)$"),
+}
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9 ]+")
+_REPEATED_RE = re.compile(r"([a-z])\1{2,}")
+
+# (hash del prompt, mensaje normalizado, huella del historial) -> texto de respuesta
+llm_response_cache = TTLCache(
+    maxsize=LLM_RESPONSE_CACHE_MAXSIZE, ttl_seconds=LLM_RESPONSE_CACHE_TTL_SECONDS, name="llm_responses"
+)
+
+
+def normalize_message(text: str) -> str:
+    """'¡¡Holaaa!! 😊' -> 'hola': sin tildes, signos ni letras repetidas"""
+    text = _NON_WORD_RE.sub(" ", fold_accents(text or ""))
+    text = _REPEATED_RE.sub(r"\1", text)
+    return " ".join(text.split())
+
+
+def detect_cacheable_intent(normalized_message: str) -> Optional[str]:
+    """Intención habilitada en LLM_CACHEABLE_INTENTS que coincide con el mensaje, o None"""
+    for intent, pattern in CACHEABLE_INTENT_PATTERNS.items():
+        if intent in LLM_CACHEABLE_INTENTS and pattern.match(normalized_message):
+            return intent
+    return None
+
+
+def _short_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def history_fingerprint(recent_messages: Iterable[str]) -> str:
+    """Huella de los últimos mensajes: el mismo 'gracias' tras otra respuesta es otra entrada"""
+    messages = list(recent_messages)[-LLM_CACHE_HISTORY_MESSAGES:] if LLM_CACHE_HISTORY_MESSAGES > 0 else []
+    return _short_hash("\n".join(normalize_message(m) for m in messages))
+
+
+def build_cache_key(prompt: str, normalized_message: str, recent_messages: Iterable[str]) -> Tuple[str, str, str]:
+    """Clave (prompt, mensaje, historial); cambiar el prompt de la cuenta invalida sus entradas"""
+    return _short_hash(prompt or ""), normalized_message, history_fingerprint(recent_messages)
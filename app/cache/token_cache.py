@@ -0,0 +1,19 @@
+# app/cache/token_cache.py
+import os
+from typing import Optional
+from app.cache.ttl_cache import TTLCache
+
+# Token de app de Gupshup: se reutiliza entre envíos en lugar de login + token por mensaje.
+# Un 401 al enviar lo invalida antes de que expire el TTL.
+GUPSHUP_TOKEN_TTL_SECONDS = float(os.getenv('GUPSHUP_TOKEN_TTL_SECONDS', '3000'))
+
+# (appid, gs_user) -> token de app
+gupshup_token_cache = TTLCache(maxsize=1024, ttl_seconds=GUPSHUP_TOKEN_TTL_SECONDS, name="gupshup_tokens")
+
+
+def invalidate_app_token(appid: Optional[str] = None) -> None:
+    """Invalida los tokens de una app, o todos si appid es None"""
+    if appid is None:
+        gupshup_token_cache.clear()
+    else:
+        gupshup_token_cache.invalidate_where(lambda key: key[0] == appid)
@@ -0,0 +1,16 @@
+# app/cache/tool_cache.py
+import os
+from app.cache.ttl_cache import TTLCache
+
+# Resultados de las tools del agente: mismas preguntas -> mismo JSON sin tocar la BD.
+# Se vacía cuando cambia la versión del catálogo (ver productos_tools).
+TOOL_CACHE_TTL_SECONDS = float(os.getenv('TOOL_CACHE_TTL_SECONDS', '600'))
+TOOL_CACHE_MAXSIZE = int(os.getenv('TOOL_CACHE_MAXSIZE', '512'))
+
+# (tool, termino normalizado, palabras clave normalizadas) -> JSON
+product_tool_cache = TTLCache(maxsize=TOOL_CACHE_MAXSIZE, ttl_seconds=TOOL_CACHE_TTL_SECONDS, name="product_tools")
+
+
+def invalidate_product_tool_cache() -> None:
+    """Limpia la caché de búsquedas (p.ej. tras una carga masiva del catálogo)"""
+    product_tool_cache.clear()
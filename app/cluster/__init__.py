@@ -0,0 +1 @@
+# app/cluster/__init__.py
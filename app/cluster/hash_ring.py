@@ -0,0 +1,72 @@
+# app/cluster/hash_ring.py
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def conversation_key(from_uid, client_uid) -> str:
+    """Clave de una conversación: número del negocio + cliente"""
+    return f"{from_uid}:{client_uid}"
+
+
+def _hash(value: str) -> int:
+    # md5 solo como función de dispersión estable entre procesos (hash() cambia por proceso)
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Hashing consistente con nodos virtuales: cada nodo ocupa `vnodes` puntos
+    del anillo y una clave pertenece al primer punto en sentido horario.
+    Al agregar o quitar un nodo solo cambian de dueño ~1/N de las claves.
+
+    add / remove arman un anillo nuevo y lo publican con una sola asignación
+    (puntos y dueños juntos), así owner() puede leerlo sin lock desde otros hilos.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 128):
+        self.vnodes = vnodes
+        self._nodes: List[str] = []
+        self._ring: Tuple[List[int], List[str]] = ([], [])     # (puntos ordenados, dueño de cada punto)
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes = self._nodes + [node]
+        self._rebuild()
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes = [n for n in self._nodes if n != node]
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        ring: List[Tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self._nodes for i in range(self.vnodes)
+        )
+        self._ring = ([point for point, _ in ring], [node for _, node in ring])
+
+    def owner(self, key: str) -> Optional[str]:
+        """Nodo dueño de la clave (None con el anillo vacío)"""
+        points, owners = self._ring
+        if not points:
+            return None
+        return owners[bisect.bisect(points, _hash(key)) % len(points)]
+
+    def distribution(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Claves por nodo (para revisar el balance)"""
+        counts = {node: 0 for node in self._nodes}
+        for key in keys:
+            owner = self.owner(key)
+            counts[owner] = counts.get(owner, 0) + 1
+        return counts
@@ -0,0 +1,190 @@
+# app/cluster/router.py
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from app.cluster.hash_ring import HashRing, conversation_key
+from app.services.webhook_parser import extract_webhook_events, group_conversations
+from app.utils.metrics import metrics
+
+# Réplicas detrás del balanceador: cada conversación (número del negocio, cliente)
+# tiene una réplica dueña; las demás le reenvían el webhook. Vacío = una sola réplica.
+CLUSTER_NODES = os.getenv('CLUSTER_NODES', '')     # URLs base separadas por coma (http://app-1:5001,...)
+CLUSTER_SELF = os.getenv('CLUSTER_SELF', '')       # URL base de esta réplica (una de CLUSTER_NODES)
+CLUSTER_VNODES = int(os.getenv('CLUSTER_VNODES', '128'))
+CLUSTER_FORWARD_TIMEOUT_SECONDS = float(os.getenv('CLUSTER_FORWARD_TIMEOUT_SECONDS', '30'))
+CLUSTER_CONNECT_TIMEOUT_SECONDS = float(os.getenv('CLUSTER_CONNECT_TIMEOUT_SECONDS', '1'))
+# Réplica que no acepta conexiones: sale del anillo durante este tiempo
+CLUSTER_NODE_COOLDOWN_SECONDS = float(os.getenv('CLUSTER_NODE_COOLDOWN_SECONDS', '10'))
+CLUSTER_SECRET = os.getenv('CLUSTER_SECRET', '')
+
+FORWARDED_BY_HEADER = "X-Cluster-Forwarded-By"
+TOKEN_HEADER = "X-Cluster-Token"
+OWNER_HEADER = "X-Cluster-Owner"
+
+
+def _parse_nodes(value: str) -> List[str]:
+    return [n.strip().rstrip("/") for n in value.split(",") if n.strip()]
+
+
+def _never_reached(error: requests.exceptions.ConnectionError) -> bool:
+    """
+    True solo si el fallo fue al conectar (la réplica nunca recibió el webhook).
+    Un corte a mitad de la respuesta (RemoteDisconnected, reset, worker muerto por
+    timeout) también llega como ConnectionError, pero el dueño pudo haber respondido.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    cause = error.args[0] if error.args else None
+    if isinstance(cause, MaxRetryError):
+        cause = cause.reason
+    return isinstance(cause, NewConnectionError)
+
+
+@dataclass
+class ForwardedResponse:
+    """Respuesta de la réplica dueña, para devolverla tal cual al balanceador"""
+    status_code: int
+    body: bytes
+    content_type: str
+    owner: str
+
+
+class ConversationRouter:
+    """
+    Decide qué réplica procesa un webhook de mensajes. El dueño de cada
+    conversación sale de un HashRing sobre CLUSTER_NODES, así sus cachés
+    (sesión, memoria del agente, grafo de la cuenta) quedan calientes en una
+    sola réplica y sus mensajes no se procesan en paralelo en dos.
+
+    Si la réplica dueña no acepta la conexión se procesa localmente (la
+    disponibilidad pesa más que la afinidad) y la réplica sale del anillo
+    por CLUSTER_NODE_COOLDOWN_SECONDS. Si falla después de recibir el
+    webhook (timeout de lectura, conexión cortada) se responde 504 / 502 y
+    no se reprocesa: Gupshup reintenta y el lease de la sesión ordena los turnos.
+    """
+
+    def __init__(self, nodes: List[str], self_node: str, vnodes: int = CLUSTER_VNODES,
+                 timeout_seconds: float = CLUSTER_FORWARD_TIMEOUT_SECONDS,
+                 connect_timeout_seconds: float = CLUSTER_CONNECT_TIMEOUT_SECONDS,
+                 cooldown_seconds: float = CLUSTER_NODE_COOLDOWN_SECONDS,
+                 secret: str = CLUSTER_SECRET):
+        self.nodes = list(nodes)
+        self.self_node = self_node.rstrip("/")
+        self.vnodes = vnodes
+        self.timeout_seconds = timeout_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.secret = secret
+        self.enabled = len(self.nodes) > 1 and self.self_node in self.nodes
+        if self.nodes and not self.enabled:
+            print(f"⚠️ CLUSTER: Ruteo deshabilitado (CLUSTER_SELF={self.self_node!r} no está en CLUSTER_NODES "
+                  f"o hay una sola réplica)")
+        self._ring = HashRing(self.nodes, vnodes)
+        self._down_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._http = requests.Session()
+        self._http.mount("http://", HTTPAdapter(pool_maxsize=32))
+        self._http.mount("https://", HTTPAdapter(pool_maxsize=32))
+
+    def owner_for(self, from_uid: Any, client_uid: Any) -> str:
+        """Réplica dueña de la conversación (entre las que están disponibles)"""
+        ring = self._live_ring()
+        with self._lock:
+            owner = ring.owner(conversation_key(from_uid, client_uid))
+        return owner or self.self_node
+
+    def _live_ring(self) -> HashRing:
+        with self._lock:
+            now = time.monotonic()
+            expired = [node for node, until in self._down_until.items() if until <= now]
+            for node in expired:
+                del self._down_until[node]
+                self._ring.add(node)
+                print(f"🔁 CLUSTER: {node} vuelve al anillo")
+            return self._ring
+
+    def _mark_down(self, node: str) -> None:
+        with self._lock:
+            if node not in self._down_until:
+                self._ring.remove(node)
+            self._down_until[node] = time.monotonic() + self.cooldown_seconds
+        metrics.increment("cluster.node_down")
+        print(f"⚠️ CLUSTER: {node} fuera del anillo por {self.cooldown_seconds:.0f}s")
+
+    def route(self, payload: Dict[str, Any], headers: Mapping[str, str]) -> Optional[ForwardedResponse]:
+        """
+        None si el webhook se procesa en esta réplica; si no, la respuesta de
+        la réplica dueña. Un webhook ya reenviado nunca se reenvía de nuevo.
+        """
+        if not self.enabled:
+            return None
+        if headers.get(FORWARDED_BY_HEADER) and (not self.secret or headers.get(TOKEN_HEADER) == self.secret):
+            metrics.increment("cluster.forward.received")
+            return None
+
+        conversations = group_conversations(extract_webhook_events(payload))
+        owners = {self.owner_for(from_uid, client_uid) for from_uid, client_uid in conversations}
+        if len(owners) != 1:
+            # Sin mensajes o con conversaciones de varios dueños (poco común): se procesa aquí
+            metrics.increment("cluster.local.mixed" if owners else "cluster.local.no_conversation")
+            return None
+
+        owner = owners.pop()
+        if owner == self.self_node:
+            metrics.increment("cluster.local.owner")
+            return None
+        return self._forward(owner, payload)
+
+    def _forward(self, owner: str, payload: Dict[str, Any]) -> Optional[ForwardedResponse]:
+        headers = {FORWARDED_BY_HEADER: self.self_node}
+        if self.secret:
+            headers[TOKEN_HEADER] = self.secret
+        started = time.perf_counter()
+        try:
+            response = self._http.post(f"{owner}/webhook/gupshup", json=payload, headers=headers,
+                                       timeout=(self.connect_timeout_seconds, self.timeout_seconds))
+        except requests.exceptions.ConnectionError as e:
+            if not _never_reached(e):
+                # La conexión se cortó con el webhook ya enviado: el dueño pudo haber
+                # respondido al cliente, reprocesarlo aquí duplicaría mensajes
+                metrics.increment("cluster.forward.broken")
+                print(f"❌ CLUSTER: {owner} cortó la conexión tras recibir el webhook: {str(e)[:120]}")
+                return ForwardedResponse(502, b'{"status": "error", "message": "Owner replica dropped the connection"}',
+                                         "application/json", owner)
+            # No se pudo conectar: el webhook no llegó, procesarlo aquí no duplica nada
+            metrics.increment("cluster.forward.failed")
+            print(f"❌ CLUSTER: No se pudo reenviar a {owner}: {str(e)[:120]}")
+            self._mark_down(owner)
+            return None
+        except requests.exceptions.Timeout:
+            # La réplica dueña lo recibió y sigue procesando: no se reprocesa aquí
+            metrics.increment("cluster.forward.timeout")
+            print(f"⏳ CLUSTER: {owner} no respondió en {self.timeout_seconds:.0f}s")
+            return ForwardedResponse(504, b'{"status": "error", "message": "Owner replica timed out"}',
+                                     "application/json", owner)
+
+        metrics.increment("cluster.forward.ok")
+        metrics.observe("cluster.forward", time.perf_counter() - started)
+        return ForwardedResponse(response.status_code, response.content,
+                                 response.headers.get("content-type", "application/json"), owner)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            down = {node: round(until - now, 1) for node, until in self._down_until.items()}
+        return {
+            "enabled": self.enabled,
+            "self": self.self_node,
+            "nodes": self.nodes,
+            "down": down,
+            "vnodes": self.vnodes,
+        }
+
+
+# Router compartido por el proceso
+conversation_router = ConversationRouter(_parse_nodes(CLUSTER_NODES), CLUSTER_SELF)
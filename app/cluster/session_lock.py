@@ -0,0 +1,265 @@
+# app/cluster/session_lock.py
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from app.utils.metrics import metrics
+
+# Un solo turno por sesión a la vez, también entre réplicas (failover del ruteo por hash)
+SESSION_LOCK_BACKEND = os.getenv('SESSION_LOCK_BACKEND', 'memory')          # memory | postgres | none
+SESSION_LOCK_LEASE_SECONDS = float(os.getenv('SESSION_LOCK_LEASE_SECONDS', '30'))
+SESSION_LOCK_WAIT_SECONDS = float(os.getenv('SESSION_LOCK_WAIT_SECONDS', '40'))
+SESSION_LOCK_POLL_SECONDS = float(os.getenv('SESSION_LOCK_POLL_SECONDS', '0.05'))
+
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SessionLockTimeout(Exception):
+    """No se obtuvo el lease de la sesión dentro de SESSION_LOCK_WAIT_SECONDS"""
+
+    def __init__(self, key: str, waited_seconds: float):
+        self.key = key
+        self.waited_seconds = waited_seconds
+        super().__init__(f"Sesión {key} ocupada: sin lease tras {waited_seconds:.1f}s")
+
+
+class InMemoryLeaseBackend:
+    """Leases en memoria del proceso: una sola réplica, pruebas y replay"""
+
+    def __init__(self):
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._released = threading.Condition()
+
+    def try_acquire(self, key: str, owner: str, lease_seconds: float) -> bool:
+        with self._released:
+            current = self._leases.get(key)
+            now = time.monotonic()
+            if current is not None and current[0] != owner and current[1] > now:
+                return False
+            self._leases[key] = (owner, now + lease_seconds)
+            return True
+
+    def renew(self, key: str, owner: str, lease_seconds: float) -> bool:
+        with self._released:
+            current = self._leases.get(key)
+            if current is None or current[0] != owner:
+                return False
+            self._leases[key] = (owner, time.monotonic() + lease_seconds)
+            return True
+
+    def release(self, key: str, owner: str) -> None:
+        with self._released:
+            current = self._leases.get(key)
+            if current is not None and current[0] == owner:
+                del self._leases[key]
+            self._released.notify_all()
+
+    def wait(self, key: str, timeout: float) -> None:
+        with self._released:
+            self._released.wait(timeout)
+
+
+class PostgresLeaseBackend:
+    """
+    Leases en tbl_session_lease (migración 0007). Tomar el lease es un UPSERT
+    que solo gana si no hay lease vigente de otro dueño; el reloj es el de la
+    BD, así que no depende de la hora de cada réplica. Si la réplica muere,
+    el lease vence solo. Cada operación usa su propia conexión en autocommit:
+    los commit de la sesión del request no lo afectan.
+    """
+
+    ACQUIRE = """
+    INSERT INTO tbl_session_lease (session_key, owner, expires_at)
+    VALUES (:key, :owner, clock_timestamp() + make_interval(secs => :lease))
+    ON CONFLICT (session_key) DO UPDATE
+        SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at
+        WHERE tbl_session_lease.expires_at < clock_timestamp()
+           OR tbl_session_lease.owner = EXCLUDED.owner
+    RETURNING owner
+    """
+    RENEW = """
+    UPDATE tbl_session_lease SET expires_at = clock_timestamp() + make_interval(secs => :lease)
+    WHERE session_key = :key AND owner = :owner
+    """
+    RELEASE = "DELETE FROM tbl_session_lease WHERE session_key = :key AND owner = :owner"
+
+    def __init__(self, max_poll_seconds: float = 0.25):
+        self.max_poll_seconds = max_poll_seconds
+
+    def _execute(self, sql: str, **params: Any):
+        """Fila retornada (RETURNING) o filas afectadas"""
+        from sqlalchemy import text
+        from config.database import engine
+
+        with engine.begin() as conn:
+            result = conn.execute(text(sql), params)
+            return result.first() if result.returns_rows else result.rowcount
+
+    def try_acquire(self, key: str, owner: str, lease_seconds: float) -> bool:
+        return self._execute(self.ACQUIRE, key=key, owner=owner, lease=lease_seconds) is not None
+
+    def renew(self, key: str, owner: str, lease_seconds: float) -> bool:
+        return self._execute(self.RENEW, key=key, owner=owner, lease=lease_seconds) > 0
+
+    def release(self, key: str, owner: str) -> None:
+        self._execute(self.RELEASE, key=key, owner=owner)
+
+    def wait(self, key: str, timeout: float) -> None:
+        time.sleep(min(timeout, self.max_poll_seconds))
+
+
+class NullLeaseBackend:
+    """Sin exclusión (SESSION_LOCK_BACKEND=none): solo mide; útil para comparar en el replay"""
+
+    def try_acquire(self, key: str, owner: str, lease_seconds: float) -> bool:
+        return True
+
+    def renew(self, key: str, owner: str, lease_seconds: float) -> bool:
+        return True
+
+    def release(self, key: str, owner: str) -> None:
+        pass
+
+    def wait(self, key: str, timeout: float) -> None:
+        time.sleep(timeout)
+
+
+def build_backend(name: str):
+    if name == "postgres":
+        return PostgresLeaseBackend()
+    if name == "none":
+        return NullLeaseBackend()
+    return InMemoryLeaseBackend()
+
+
+class SessionLock:
+    """
+    Lease por session_id mientras un turno modifica la sesión.
+
+    - Reentrante por hilo: ChatGptHandler llama al Agent dentro del turno de
+      handlers con la misma sesión.
+    - Un hilo renovador extiende cada lease tomado cada lease/3 segundos, así
+      un turno largo no lo pierde; si el proceso muere, vence en lease_seconds.
+    - Métricas: session_lock.wait (espera), session_lock.hold (retención),
+      session_lock.contended, session_lock.timeout y session_lock.overlap
+      (dos turnos de la misma sesión a la vez en este proceso: no debería pasar).
+    """
+
+    def __init__(self, backend, lease_seconds: float = SESSION_LOCK_LEASE_SECONDS,
+                 wait_seconds: float = SESSION_LOCK_WAIT_SECONDS,
+                 poll_seconds: float = SESSION_LOCK_POLL_SECONDS):
+        self.backend = backend
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._held: Dict[str, str] = {}          # key -> owner, para el renovador
+        self._active: Counter = Counter()        # turnos en curso por key (detección de overlap)
+        self._renewer: Optional[threading.Thread] = None
+
+    def _depths(self) -> Dict[str, int]:
+        depths = getattr(self._local, "depths", None)
+        if depths is None:
+            depths = self._local.depths = {}
+        return depths
+
+    @contextmanager
+    def hold(self, session_id: Any, label: str = "turno") -> Iterator[None]:
+        key = str(session_id)
+        depths = self._depths()
+        if depths.get(key):
+            depths[key] += 1
+            try:
+                yield
+            finally:
+                depths[key] -= 1
+            return
+
+        owner = f"{NODE_ID}:{uuid.uuid4().hex[:12]}"
+        waited = self._acquire(key, owner, label)
+        depths[key] = 1
+        with self._lock:
+            self._held[key] = owner
+            self._active[key] += 1
+            if self._active[key] > 1:
+                metrics.increment("session_lock.overlap")
+                print(f"⚠️ SESSION_LOCK: {self._active[key]} turnos simultáneos en la sesión {key}")
+        self._ensure_renewer()
+
+        held_from = time.perf_counter()
+        try:
+            yield
+        finally:
+            del depths[key]
+            with self._lock:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+                if self._held.get(key) == owner:
+                    del self._held[key]
+            try:
+                self.backend.release(key, owner)
+            except Exception as e:
+                # El lease vence solo; no se pierde el turno por esto
+                print(f"❌ SESSION_LOCK: Error liberando la sesión {key}: {str(e)}")
+            metrics.observe("session_lock.hold", time.perf_counter() - held_from)
+            if waited > 0.5:
+                print(f"🔒 SESSION_LOCK: {label} esperó {waited * 1000:.0f} ms por la sesión {key}")
+
+    def _acquire(self, key: str, owner: str, label: str) -> float:
+        started = time.perf_counter()
+        attempts = 0
+        while True:
+            attempts += 1
+            if self.backend.try_acquire(key, owner, self.lease_seconds):
+                waited = time.perf_counter() - started
+                metrics.observe("session_lock.wait", waited)
+                if attempts > 1:
+                    metrics.increment("session_lock.contended")
+                return waited
+            waited = time.perf_counter() - started
+            if waited >= self.wait_seconds:
+                metrics.increment("session_lock.timeout")
+                metrics.observe("session_lock.wait", waited)
+                print(f"⏳ SESSION_LOCK: {label} sin lease de la sesión {key} tras {waited:.1f}s")
+                raise SessionLockTimeout(key, waited)
+            self.backend.wait(key, min(self.poll_seconds * attempts, self.wait_seconds - waited))
+
+    def _ensure_renewer(self) -> None:
+        with self._lock:
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew_loop, name="session-lock-renewer", daemon=True)
+                self._renewer.start()
+
+    def _renew_loop(self) -> None:
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._lock:
+                held = list(self._held.items())
+            for key, owner in held:
+                try:
+                    if not self.backend.renew(key, owner, self.lease_seconds):
+                        metrics.increment("session_lock.lost")
+                        print(f"⚠️ SESSION_LOCK: Lease de la sesión {key} perdido antes de terminar el turno")
+                except Exception as e:
+                    metrics.increment("session_lock.renew_failed")
+                    print(f"❌ SESSION_LOCK: Error renovando la sesión {key}: {str(e)}")
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            held = len(self._held)
+        return {
+            "backend": type(self.backend).__name__,
+            "lease_seconds": self.lease_seconds,
+            "wait_seconds": self.wait_seconds,
+            "held": held,
+        }
+
+
+# Lock compartido por el proceso
+session_lock = SessionLock(build_backend(SESSION_LOCK_BACKEND))
@@ -1,8 +1,12 @@
 # app/handlers/chatgpt_handler.py
+import os
 from typing import Dict, Any
 from app.handlers.base_handler import BaseHandler
 from app.repositories.simple_answer_repository import SimpleAnswerRepository
-from app.services.langchain_service import AdvancedLangChainService
+
+# Path de DummyHandler al que se deriva el chat si el pool de LLM está saturado
+# (vacío = solo se responde con LLM_OVERLOAD_MESSAGE y se sigue en ChatGPT)
+LLM_OVERLOAD_TRANSFER_PATH = os.getenv('LLM_OVERLOAD_TRANSFER_PATH', '')
 
 class ChatGptHandler(BaseHandler):
     """
@@ -12,7 +16,7 @@ class ChatGptHandler(BaseHandler):
     Permite respuestas inteligentes dentro del flujo de handlers estructurado.
     """
     
-    def __init__(self, simple_answer_repository: SimpleAnswerRepository, langchain_service: AdvancedLangChainService):
+    def __init__(self, simple_answer_repository: SimpleAnswerRepository, langchain_service):
         super().__init__("ChatGptHandler")
         self.simple_answer_repo = simple_answer_repository
         self.langchain_service = langchain_service
@@ -66,6 +70,9 @@ class ChatGptHandler(BaseHandler):
                 from_uid=from_uid
             )
             
+            if ai_response.get("overloaded"):
+                return self._overloaded_response(ai_response, session_data)
+            
             if not ai_response.get("success"):
                 print(f"❌ Error en LangChain: {ai_response}")
                 return {
@@ -171,6 +178,32 @@ class ChatGptHandler(BaseHandler):
             "session_data": updated_session_data
         }
     
+    def _overloaded_response(self, ai_response: Dict[str, Any], session_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Respuesta cuando el LLM no atendió a tiempo: mensaje de espera o
+        transferencia a un agente humano si LLM_OVERLOAD_TRANSFER_PATH está configurado.
+        """
+        updated_session_data = session_data.copy()
+        
+        if LLM_OVERLOAD_TRANSFER_PATH:
+            next_path = LLM_OVERLOAD_TRANSFER_PATH
+            next_handler = self._extract_handler_name(LLM_OVERLOAD_TRANSFER_PATH)
+            print(f"🚦 ChatGPT: LLM saturado ({ai_response.get('reason')}), transfiriendo a {next_path}")
+        else:
+            next_path = session_data.get("current_path", "")
+            next_handler = self.name
+            print(f"🚦 ChatGPT: LLM saturado ({ai_response.get('reason')}), respuesta de espera")
+        
+        updated_session_data["current_path"] = next_path
+        
+        return {
+            "success": True,
+            "message": ai_response.get("message", ""),
+            "next_path": next_path,
+            "next_handler": next_handler,
+            "session_data": updated_session_data
+        }
+    
     def _process_exact_answer(self, answer, session_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Procesa una respuesta exacta encontrada en la BD.
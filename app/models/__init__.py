@@ -14,7 +14,9 @@ from .text_chatbot import TblTextChatbot
 from .transfered_chat import TblTransferedChats
 from .gupshup_log import TblGupshupLog
 from .message import TblMessage
+from .message_status import TblMessageStatus
 from .products import TblProducts
+from .config_change_log import TblConfigChangeLog
 
 __all__ = [
     'Base',
@@ -28,5 +30,7 @@ __all__ = [
     'TblTransferedChats',
     'TblGupshupLog',
     'TblMessage',
-    'TblProducts'
+    'TblMessageStatus',
+    'TblProducts',
+    'TblConfigChangeLog'
 ]
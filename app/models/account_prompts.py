@@ -1,10 +1,14 @@
 # app/models/account_prompts.py
-from sqlalchemy import Column, Integer, Text, Boolean, DateTime
+from sqlalchemy import Column, Integer, Text, Boolean, DateTime, Index, text
 from sqlalchemy.sql import func
 from . import Base
 
 class TblAccountPrompts(Base):
     __tablename__ = 'tbl_account_prompts'
+
+    __table_args__ = (
+        Index('ix_account_prompts_active', 'account_id', postgresql_where=text('is_active = true')),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     account_id = Column(Text, nullable=False)
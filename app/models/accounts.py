@@ -1,9 +1,14 @@
 # app/models/accounts.py
-from sqlalchemy import Column, Integer, Text, String
+from sqlalchemy import Column, Integer, Text, String, Boolean, Index
 from . import Base
 
 class TblAccounts(Base):
     __tablename__ = 'tbl_accounts'
+
+    __table_args__ = (
+        Index('ix_accounts_from_uid', 'from_uid'),
+        Index('ix_accounts_account_id', 'account_id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     account_id = Column(Text, nullable=False)
@@ -12,6 +17,7 @@ class TblAccounts(Base):
     gs_password = Column(Text, nullable=True)
     appid = Column(Text, nullable=True)
     processing_strategy = Column(String(50), nullable=True, default='langchain')
+    llm_cache_enabled = Column(Boolean, nullable=False, default=True)  # Caché de respuestas del agente
     
     def __repr__(self):
         return f"<TblAccounts(id={self.id}, account_id='{self.account_id}', appid='{self.appid}')>"
\ No newline at end of file
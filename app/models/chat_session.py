@@ -1,9 +1,14 @@
 # app/models/chat_session.py
-from sqlalchemy import Column, Integer, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, Text, DateTime, Boolean, Index, text
 from . import Base
 
 class TblChatSession(Base):
     __tablename__ = 'tbl_chat_session'
+
+    __table_args__ = (
+        Index('ix_chat_session_active', 'client_uid', 'from_uid', 'ended_at',
+              postgresql_where=text('isclosed = false')),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     ended_at = Column(DateTime, nullable=True)
@@ -0,0 +1,19 @@
+# app/models/config_change_log.py
+from sqlalchemy import Column, BigInteger, Text, String, DateTime, Index
+from . import Base
+
+class TblConfigChangeLog(Base):
+    __tablename__ = 'tbl_config_change_log'
+
+    __table_args__ = (
+        Index('ix_config_change_log_changed_at', 'changed_at'),
+    )
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    table_name = Column(Text, nullable=False)             # Tabla modificada
+    scope_key = Column(Text, nullable=True)               # account_id o from_uid afectado (None = todos)
+    operation = Column(String(10), nullable=False)        # INSERT / UPDATE / DELETE
+    changed_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<TblConfigChangeLog(id={self.id}, table_name='{self.table_name}', scope_key='{self.scope_key}')>"
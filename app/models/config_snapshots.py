@@ -0,0 +1,105 @@
+# app/models/config_snapshots.py
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    """
+    Copia inmutable de una fila de tbl_accounts.
+    Se puede compartir entre hilos y requests sin depender de la sesión de BD.
+    """
+    id: int
+    account_id: str
+    from_uid: Optional[str]
+    gs_user: Optional[str]
+    gs_password: Optional[str]
+    appid: Optional[str]
+    processing_strategy: Optional[str]
+    llm_cache_enabled: bool = True
+
+    @classmethod
+    def from_model(cls, account) -> "AccountSnapshot":
+        return cls(
+            id=account.id,
+            account_id=account.account_id,
+            from_uid=account.from_uid,
+            gs_user=account.gs_user,
+            gs_password=account.gs_password,
+            appid=account.appid,
+            processing_strategy=account.processing_strategy,
+            llm_cache_enabled=account.llm_cache_enabled is not False
+        )
+
+
+@dataclass(frozen=True)
+class TextChatbotSnapshot:
+    """Copia inmutable de una fila de tbl_text_chatbot"""
+    id: int
+    from_uid: str
+    channel: int
+    initial_path: str
+
+    @classmethod
+    def from_model(cls, config) -> "TextChatbotSnapshot":
+        return cls(
+            id=config.id,
+            from_uid=config.from_uid,
+            channel=config.channel,
+            initial_path=config.initial_path
+        )
+
+
+@dataclass(frozen=True)
+class SimpleAnswerSnapshot:
+    """Copia inmutable de una fila de tbl_simple_answer"""
+    id: int
+    message: str
+    handler_path: str
+    handler_path_to: str
+    account_id: Optional[str]
+    invalid_error: Optional[str] = None
+    redirect_on_error: Optional[str] = None
+    handler_path_to_description: Optional[str] = None
+    description: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, answer) -> "SimpleAnswerSnapshot":
+        return cls(
+            id=answer.id,
+            message=answer.message,
+            handler_path=answer.handler_path,
+            handler_path_to=answer.handler_path_to,
+            account_id=answer.account_id,
+            invalid_error=answer.invalid_error,
+            redirect_on_error=answer.redirect_on_error,
+            handler_path_to_description=answer.handler_path_to_description,
+            description=answer.description
+        )
+
+
+class SimpleAnswerGraph:
+    """
+    Todas las respuestas de una cuenta indexadas por handler_path y por padre.
+    Resuelve find_by_handler_path / find_children_paths sin ir a la BD.
+    """
+
+    def __init__(self, answers: Iterable[SimpleAnswerSnapshot]):
+        self.answers: Tuple[SimpleAnswerSnapshot, ...] = tuple(sorted(answers, key=lambda a: a.handler_path))
+        self._by_path: Dict[str, SimpleAnswerSnapshot] = {}
+        self._children: Dict[str, List[SimpleAnswerSnapshot]] = {}
+        for answer in self.answers:
+            # Igual que .first() en BD: ante paths duplicados gana el primero
+            self._by_path.setdefault(answer.handler_path, answer)
+            parent, _, _ = answer.handler_path.rpartition("/")
+            self._children.setdefault(parent, []).append(answer)
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def get(self, handler_path: str) -> Optional[SimpleAnswerSnapshot]:
+        return self._by_path.get(handler_path)
+
+    def children(self, parent_path: str) -> List[SimpleAnswerSnapshot]:
+        """Hijos directos de parent_path, ordenados por handler_path"""
+        return list(self._children.get(parent_path, ()))
@@ -1,18 +1,25 @@
 # app/models/gupshup_log.py
-from sqlalchemy import Column, Integer, Text, DateTime, String
+from sqlalchemy import Column, BigInteger, Text, DateTime, String, Index, Sequence
+from sqlalchemy.dialects.postgresql import JSONB
 from . import Base
 
 class TblGupshupLog(Base):
     __tablename__ = 'tbl_gupshup_log'
+
+    # Particionada por mes en created_at (migrations/versions/0005_gupshup_log_partitioned.sql)
+    __table_args__ = (
+        Index('ix_gupshup_log_message_id', 'message_id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(BigInteger, Sequence('tbl_gupshup_log_id_seq_p'), primary_key=True)
     from_uid = Column(Text, nullable=True)
-    event = Column(Text, nullable=True)
-    created_at = Column(DateTime, nullable=True)
+    event = Column(JSONB, nullable=True)  # Payload original (TOAST con lz4)
+    created_at = Column(DateTime, primary_key=True)
     message_id = Column(String(255), nullable=True)
     app_id = Column(Text, nullable=True)
     type = Column(Text, nullable=True)
     channel = Column(Text, nullable=True)
     
     def __repr__(self):
-        return f"<TblGupshupLog(id={self.id}, event='{self.event}', message_id='{self.message_id}')>"
\ No newline at end of file
+        return f"<TblGupshupLog(id={self.id}, type='{self.type}', message_id='{self.message_id}')>"
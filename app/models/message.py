@@ -1,9 +1,14 @@
 # app/models/message.py
-from sqlalchemy import Column, Integer, Text, DateTime, BigInteger, String
+from sqlalchemy import Column, Integer, Text, DateTime, BigInteger, String, Index
 from . import Base
 
 class TblMessage(Base):
     __tablename__ = 'tbl_message'
+
+    __table_args__ = (
+        Index('ix_message_session_created', 'session_id', 'created_at'),
+        Index('ix_message_message_id', 'message_id'),
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     from_uid = Column(Text, nullable=True)
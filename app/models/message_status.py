@@ -0,0 +1,27 @@
+# app/models/message_status.py
+from sqlalchemy import Column, Text, String, SmallInteger, DateTime, Index
+from . import Base
+
+class TblMessageStatus(Base):
+    __tablename__ = 'tbl_message_status'
+
+    __table_args__ = (
+        Index('ix_message_status_from_uid_sent', 'from_uid', 'sent_at'),
+        Index('ix_message_status_status', 'status'),
+    )
+    
+    message_id = Column(String(255), primary_key=True)
+    from_uid = Column(Text, nullable=True)       # Número del negocio
+    client_uid = Column(Text, nullable=True)     # Destinatario
+    app_id = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False)
+    status_rank = Column(SmallInteger, nullable=False)
+    error_code = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+    read_at = Column(DateTime, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<TblMessageStatus(message_id='{self.message_id}', status='{self.status}')>"
@@ -0,0 +1,40 @@
+# app/models/product_snapshot.py
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class ProductSnapshot:
+    """
+    Copia inmutable de un producto activo de tbl_products.
+    Expone los mismos atributos que usan las tools y format_products_response,
+    por lo que puede reemplazar a TblProducts en los resultados de búsqueda.
+    """
+    id: int
+    nombre: Optional[str]
+    marca: Optional[str]
+    categoria: Optional[str]
+    modelo: Optional[str]
+    caracteristicas: Optional[str]
+    descripcion_larga: Optional[str]
+    rubro: Optional[str]
+    sub_familia: Optional[str]
+    precio_con_impuesto: Optional[Decimal]
+    stock_web: int
+
+    @classmethod
+    def from_model(cls, product) -> "ProductSnapshot":
+        return cls(
+            id=product.id,
+            nombre=product.nombre,
+            marca=product.marca,
+            categoria=product.categoria,
+            modelo=product.modelo,
+            caracteristicas=product.caracteristicas,
+            descripcion_larga=product.descripcion_larga,
+            rubro=product.rubro,
+            sub_familia=product.sub_familia,
+            precio_con_impuesto=product.precio_con_impuesto,
+            stock_web=product.stock_web or 0
+        )
@@ -1,9 +1,15 @@
 # app/models/simple_answer.py
-from sqlalchemy import Column, Integer, Text
+from sqlalchemy import Column, Integer, Text, Index
 from . import Base
 
 class TblSimpleAnswer(Base):
     __tablename__ = 'tbl_simple_answer'
+
+    __table_args__ = (
+        Index('ix_simple_answer_path_account', 'handler_path', 'account_id'),
+        Index('ix_simple_answer_account_path_prefix', 'account_id', 'handler_path',
+              postgresql_ops={'handler_path': 'text_pattern_ops'}),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     message = Column(Text, nullable=False)                               # text - Mensaje a mostrar
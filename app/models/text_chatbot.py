@@ -1,9 +1,13 @@
 # app/models/text_chatbot.py
-from sqlalchemy import Column, Integer, Text
+from sqlalchemy import Column, Integer, Text, Index
 from . import Base
 
 class TblTextChatbot(Base):
     __tablename__ = 'tbl_text_chatbot'
+
+    __table_args__ = (
+        Index('ix_text_chatbot_from_uid_channel', 'from_uid', 'channel'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     from_uid = Column(Text, nullable=False)                  # varchar(20) - Número del chatbot
@@ -1,5 +1,5 @@
 # app/models/transfered_chat.py
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Numeric, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Numeric, Text, Index, text
 from sqlalchemy.sql import func
 
 # Import Base from the models package
@@ -7,6 +7,11 @@ from . import Base
 
 class TblTransferedChats(Base):
     __tablename__ = "tbl_transfered_chats"
+
+    __table_args__ = (
+        Index('ix_transfered_chats_open_session', 'session_id', postgresql_where=text('closed_at IS NULL')),
+        Index('ix_transfered_chats_open_client', 'client_uid', postgresql_where=text('closed_at IS NULL')),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     client_uid = Column(String(255))
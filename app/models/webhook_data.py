@@ -15,6 +15,9 @@ class WebhookData:
     message_body: Optional[str] = None
     display_phone_number: Optional[str] = None
     app_id: Optional[str] = None
+    timestamp: Optional[str] = None
+    status: Optional[str] = None  # sent / delivered / read / failed (solo status updates)
+    error_code: Optional[str] = None
     
     # Flags de control
     is_user_message: bool = False
@@ -1,6 +1,8 @@
 # app/repositories/accounts_repository.py
 from sqlalchemy.orm import Session
 from app.models.accounts import TblAccounts
+from app.models.config_snapshots import AccountSnapshot
+from app.cache.config_cache import account_cache
 from typing import Optional
 
 class AccountsRepository:
@@ -13,6 +15,17 @@ class AccountsRepository:
             TblAccounts.from_uid == from_uid
         ).first()
     
+    def get_snapshot_by_from_uid(self, from_uid: str) -> Optional[AccountSnapshot]:
+        """
+        Versión cacheada de find_by_from_uid (read-through con TTL).
+        Retorna una copia inmutable, válida fuera de esta sesión de BD.
+        """
+        def load() -> Optional[AccountSnapshot]:
+            account = self.find_by_from_uid(from_uid)
+            return AccountSnapshot.from_model(account) if account else None
+        
+        return account_cache.get_or_load(from_uid, load)
+    
     def find_by_account_id(self, account_id: str) -> Optional[TblAccounts]:
         """Busca cuenta por account_id"""
         return self.db.query(TblAccounts).filter(
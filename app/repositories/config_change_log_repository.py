@@ -0,0 +1,20 @@
+# app/repositories/config_change_log_repository.py
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.config_change_log import TblConfigChangeLog
+from typing import List
+
+class ConfigChangeLogRepository:
+    def __init__(self, db_session: Session):
+        self.db = db_session
+    
+    def get_last_id(self) -> int:
+        """Id del último cambio registrado (0 si no hay ninguno)"""
+        return self.db.query(func.max(TblConfigChangeLog.id)).scalar() or 0
+    
+    def find_after(self, after_id: int, limit: int = 1000) -> List[TblConfigChangeLog]:
+        """Cambios con id mayor a after_id, en orden (usa la PK)"""
+        return self.db.query(TblConfigChangeLog).filter(
+            TblConfigChangeLog.id > after_id
+        ).order_by(TblConfigChangeLog.id).limit(limit).all()
+
@@ -2,14 +2,18 @@
 from sqlalchemy.orm import Session
 from app.models.gupshup_log import TblGupshupLog
 from datetime import datetime
+from typing import Any
 
 class GupshupRepository:
     def __init__(self, db_session: Session):
         self.db = db_session
     
-    def save_log(self, event: str, message_id: str = None, from_uid: str = None, 
+    def save_log(self, event: Any, message_id: str = None, from_uid: str = None, 
                  type: str = None, app_id: str = None, channel: str = None) -> TblGupshupLog:
-        """Guarda un registro en tbl_gupshup_log"""
+        """
+        Guarda un registro en tbl_gupshup_log (solo inserción).
+        event es el payload como dict; se guarda como JSONB.
+        """
         gupshup_log = TblGupshupLog(
             event=event,
             message_id=message_id,
@@ -21,8 +25,11 @@ class GupshupRepository:
         )
         
         self.db.add(gupshup_log)
+        self.db.flush()  # Asigna el id (nextval) sin releer la fila
+        # Desligar antes del commit: evita que el commit expire el objeto y que
+        # leer .id vuelva a traer el payload completo desde la BD
+        self.db.expunge(gupshup_log)
         self.db.commit()
-        self.db.refresh(gupshup_log)
         
         return gupshup_log
     
@@ -30,4 +37,4 @@ class GupshupRepository:
         """Busca un log por message_id"""
         return self.db.query(TblGupshupLog).filter(
             TblGupshupLog.message_id == message_id
-        ).first()
\ No newline at end of file
+        ).first()
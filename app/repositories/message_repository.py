@@ -2,7 +2,7 @@
 from sqlalchemy.orm import Session
 from app.models.message import TblMessage
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
 
 class MessageRepository:
     def __init__(self, db_session: Session):
@@ -39,8 +39,65 @@ class MessageRepository:
             TblMessage.message_id == message_id
         ).first()
     
+    def find_first_by_message_id(self, message_id: str) -> Optional[TblMessage]:
+        """Primer registro con ese message_id (el original si el mensaje se reprocesó)"""
+        return self.db.query(TblMessage).filter(
+            TblMessage.message_id == message_id
+        ).order_by(TblMessage.id).first()
+    
+    def find_bot_replies(self, inbound: TblMessage, before: Optional[datetime] = None,
+                         limit: int = 10) -> list[TblMessage]:
+        """Respuestas del bot a un mensaje entrante: salientes de la sesión hasta el siguiente entrante"""
+        query = self.db.query(TblMessage).filter(
+            TblMessage.session_id == inbound.session_id,
+            TblMessage.created_at >= inbound.created_at,
+            TblMessage.id != inbound.id
+        )
+        if before is not None:
+            query = query.filter(TblMessage.created_at < before)
+        
+        replies = []
+        for message in query.order_by(TblMessage.created_at, TblMessage.id).limit(limit * 2):
+            if message.message_direction == 0:
+                break
+            replies.append(message)
+            if len(replies) >= limit:
+                break
+        return replies
+    
     def find_by_session_id(self, session_id: int, limit: int = 50) -> list[TblMessage]:
         """Obtiene mensajes de una sesión (para historial)"""
         return self.db.query(TblMessage).filter(
             TblMessage.session_id == session_id
-        ).order_by(TblMessage.created_at.desc()).limit(limit).all()
\ No newline at end of file
+        ).order_by(TblMessage.created_at.desc()).limit(limit).all()
+    
+    def find_by_session_id_after(self, session_id: int, after_id: int = 0, limit: int = 50) -> list[TblMessage]:
+        """Mensajes de una sesión posteriores a after_id (los aún no resumidos), más recientes primero"""
+        return self.db.query(TblMessage).filter(
+            TblMessage.session_id == session_id,
+            TblMessage.id > after_id
+        ).order_by(TblMessage.created_at.desc()).limit(limit).all()
+    
+    def count_by_session_id_after(self, session_id: int, after_id: int = 0) -> int:
+        """Cantidad de mensajes de una sesión posteriores a after_id"""
+        return self.db.query(TblMessage).filter(
+            TblMessage.session_id == session_id,
+            TblMessage.id > after_id
+        ).count()
+    
+    def find_all_by_session_id_after(self, session_id: int, after_id: int = 0) -> list[TblMessage]:
+        """Todos los mensajes de una sesión posteriores a after_id, en orden cronológico (para resumir)"""
+        return self.db.query(TblMessage).filter(
+            TblMessage.session_id == session_id,
+            TblMessage.id > after_id
+        ).order_by(TblMessage.created_at, TblMessage.id).all()
+    
+    def iter_by_account_id(self, account_id: str, since: Optional[datetime] = None,
+                           batch_size: int = 1000) -> Iterator[TblMessage]:
+        """Recorre los mensajes de una cuenta por sesión y fecha, en lotes (uso offline)"""
+        query = self.db.query(TblMessage).filter(TblMessage.account_id == account_id)
+        if since is not None:
+            query = query.filter(TblMessage.created_at >= since)
+        return iter(query.order_by(
+            TblMessage.session_id, TblMessage.created_at, TblMessage.id
+        ).yield_per(batch_size))
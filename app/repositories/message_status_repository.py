@@ -0,0 +1,51 @@
+# app/repositories/message_status_repository.py
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.message_status import TblMessageStatus
+from typing import Any, Dict, List, Optional
+
+class MessageStatusRepository:
+    def __init__(self, db_session: Session):
+        self.db = db_session
+    
+    def bulk_upsert(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Inserta/actualiza estados en un solo INSERT ... ON CONFLICT.
+        El status solo avanza (no se pasa de 'read' a 'delivered' si llegan
+        desordenados) y los timestamps ya registrados se conservan.
+        """
+        if not rows:
+            return 0
+        
+        stmt = insert(TblMessageStatus).values(rows)
+        excluded = stmt.excluded
+        table = TblMessageStatus.__table__.c
+        advances = excluded.status_rank >= table.status_rank
+        
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TblMessageStatus.message_id],
+            set_={
+                "status": case((advances, excluded.status), else_=table.status),
+                "status_rank": func.greatest(table.status_rank, excluded.status_rank),
+                "error_code": func.coalesce(excluded.error_code, table.error_code),
+                "from_uid": func.coalesce(table.from_uid, excluded.from_uid),
+                "client_uid": func.coalesce(table.client_uid, excluded.client_uid),
+                "app_id": func.coalesce(table.app_id, excluded.app_id),
+                "sent_at": func.coalesce(table.sent_at, excluded.sent_at),
+                "delivered_at": func.coalesce(table.delivered_at, excluded.delivered_at),
+                "read_at": func.coalesce(table.read_at, excluded.read_at),
+                "failed_at": func.coalesce(table.failed_at, excluded.failed_at),
+                "updated_at": excluded.updated_at,
+            }
+        )
+        
+        self.db.execute(stmt)
+        self.db.commit()
+        return len(rows)
+    
+    def find_by_message_id(self, message_id: str) -> Optional[TblMessageStatus]:
+        """Estado de entrega de un mensaje saliente"""
+        return self.db.query(TblMessageStatus).filter(
+            TblMessageStatus.message_id == message_id
+        ).first()
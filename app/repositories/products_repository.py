@@ -2,11 +2,28 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
 from app.models.products import TblProducts
-from typing import List, Optional
+from app.models.product_snapshot import ProductSnapshot
+from app.search.product_index import product_catalog_index, ProductSearchIndex
+from app.search.pg_product_search import PostgresProductSearch
+from app.cache.ttl_cache import TTLCache
+from typing import List, Optional, Union
+import os
+
+# Motor de búsqueda de productos:
+# - 'memory': índice invertido en proceso (catálogos pequeños/medianos)
+# - 'postgres': tsvector + pg_trgm (catálogos grandes, requiere migración 0002)
+# - 'sql': LIKE '%termino%' original
+PRODUCT_SEARCH_BACKEND = os.getenv('PRODUCT_SEARCH_BACKEND', 'memory')
+
+# Firma del catálogo para backends sin índice en memoria (evita consultarla en cada llamada)
+_catalog_signature_cache = TTLCache(
+    maxsize=1, ttl_seconds=float(os.getenv('PRODUCT_INDEX_REFRESH_SECONDS', '300')), name="catalog_signature"
+)
 
 class ProductsRepository:
     def __init__(self, db_session: Session):
         self.db = db_session
+        self.pg_search = PostgresProductSearch(db_session)
     
     def consultar_productos(self, nombre: str = None, marca: str = None, 
                           tipo: str = 'info', rango_min: float = None, 
@@ -27,6 +44,7 @@ class ProductsRepository:
         try:
             query = self.db.query(TblProducts).filter(TblProducts.activo == True)
             print(f"📊 REPO: Query inicial creada")
+            relevance_order = None
             
             # Filtro por nombre/categoría mejorado
             if nombre:
@@ -56,6 +74,14 @@ class ProductsRepository:
                             func.lower(TblProducts.rubro).contains(categoria_especifica)
                         )
                     )
+                elif PRODUCT_SEARCH_BACKEND == 'postgres':
+                    # Búsqueda de texto completo con ranking (tsvector + trigramas)
+                    matched = self.pg_search.match(nombre_clean)
+                    if matched is not None:
+                        condition, rank = matched
+                        query = query.filter(condition)
+                        if not orden_precio and tipo != 'precio':
+                            relevance_order = rank.desc()
                 else:
                     # Búsqueda general en todos los campos
                     query = query.filter(
@@ -90,6 +116,9 @@ class ProductsRepository:
                 query = query.order_by(TblProducts.precio_con_impuesto.desc())
             elif orden_precio == 'mas_baratos' or tipo == 'precio':
                 query = query.order_by(TblProducts.precio_con_impuesto.asc())
+            elif relevance_order is not None:
+                # Más relevantes primero (backend postgres)
+                query = query.order_by(relevance_order, TblProducts.precio_con_impuesto.desc())
             else:
                 # Ordenamiento por defecto
                 query = query.order_by(TblProducts.nombre.asc())
@@ -149,8 +178,13 @@ class ProductsRepository:
         
         return "\\n".join(response_parts)
     
-    def buscar_simple(self, termino: str) -> List[TblProducts]:
+    def buscar_simple(self, termino: str) -> List[Union[TblProducts, ProductSnapshot]]:
         """Búsqueda simple. ChatGPT interpreta el resto."""
+        if PRODUCT_SEARCH_BACKEND == 'memory':
+            return self.get_search_index().search(termino, limit=5)
+        if PRODUCT_SEARCH_BACKEND == 'postgres':
+            return self.pg_search.search(termino, limit=5)
+        
         query = self.db.query(TblProducts).filter(TblProducts.activo == True)
         
         if termino:
@@ -168,8 +202,21 @@ class ProductsRepository:
         # Ordenar por precio DESC (mejores primero) - SOLO 5 productos
         return query.order_by(TblProducts.precio_con_impuesto.desc()).limit(5).all()
     
-    def buscar_con_palabras_clave(self, termino: str, palabras_clave: str = None) -> List[TblProducts]:
-        """Búsqueda con palabras clave adicionales para características"""
+    def buscar_con_palabras_clave(self, termino: str, palabras_clave: str = None) -> List[Union[TblProducts, ProductSnapshot]]:
+        """
+        Búsqueda con palabras clave adicionales para características.
+        Con el backend 'memory' responde desde el índice invertido (ranking BM25)
+        y retorna ProductSnapshot; con 'postgres' usa tsvector/pg_trgm con ranking;
+        con 'sql' usa los LIKE sobre tbl_products.
+        """
+        if PRODUCT_SEARCH_BACKEND == 'memory':
+            return self.get_search_index().search(termino, palabras_clave, limit=5)
+        if PRODUCT_SEARCH_BACKEND == 'postgres':
+            return self.pg_search.search(termino, palabras_clave, limit=5)
+        return self._buscar_con_palabras_clave_sql(termino, palabras_clave)
+    
+    def _buscar_con_palabras_clave_sql(self, termino: str, palabras_clave: str = None) -> List[TblProducts]:
+        """Búsqueda con LIKE '%termino%' (recorre la tabla completa)"""
         query = self.db.query(TblProducts).filter(TblProducts.activo == True)
         
         condiciones = []
@@ -196,6 +243,40 @@ class ProductsRepository:
         
         return query.order_by(TblProducts.precio_con_impuesto.desc()).limit(5).all()
     
+    def get_search_index(self) -> ProductSearchIndex:
+        """Índice en memoria del catálogo activo (se construye o refresca si hace falta)"""
+        return product_catalog_index.get(self.load_active_snapshots, self.get_catalog_signature)
+    
+    def refresh_search_index(self) -> ProductSearchIndex:
+        """Reconstruye el índice en memoria (llamar tras cargas masivas del catálogo)"""
+        return product_catalog_index.refresh(self.load_active_snapshots, self.get_catalog_signature)
+    
+    def load_active_snapshots(self) -> List[ProductSnapshot]:
+        """Carga el catálogo activo como copias inmutables"""
+        products = self.db.query(TblProducts).filter(TblProducts.activo == True).all()
+        return [ProductSnapshot.from_model(p) for p in products]
+    
+    def get_catalog_version(self) -> tuple:
+        """
+        Versión vigente del catálogo para invalidar cachés derivadas.
+        Con 'memory' es la firma del índice; en otro caso la firma cacheada con TTL.
+        """
+        if PRODUCT_SEARCH_BACKEND == 'memory':
+            return self.get_search_index().signature
+        return _catalog_signature_cache.get_or_load("catalog", self.get_catalog_signature)
+    
+    def get_catalog_signature(self) -> tuple:
+        """
+        Firma barata del catálogo: (activos, max(id), max(updated_at)).
+        Cambia cuando se insertan, activan/desactivan o actualizan productos.
+        """
+        row = self.db.query(
+            func.count(TblProducts.id).filter(TblProducts.activo == True),
+            func.max(TblProducts.id),
+            func.max(TblProducts.updated_at)
+        ).one()
+        return tuple(row)
+    
     def get_product_by_id(self, product_id: int) -> Optional[TblProducts]:
         """Obtiene un producto específico por ID"""
         return self.db.query(TblProducts).filter(TblProducts.id == product_id).first()
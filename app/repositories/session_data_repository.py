@@ -4,6 +4,10 @@ from app.models.session_data import TblSessionData
 from typing import Optional
 import json
 
+# El resumen de conversación vive en su propia fila para no competir con los
+# handlers, que reescriben el JSON completo de la sesión
+SUMMARY_ID_SUFFIX = ":summary"
+
 class SessionDataRepository:
     def __init__(self, db_session: Session):
         self.db = db_session
@@ -81,4 +85,33 @@ class SessionDataRepository:
             return False
         except Exception as e:
             print(f"❌ Error limpiando session_data: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def get_conversation_summary(self, session_id: str, fresh: bool = False) -> Optional[dict]:
+        """
+        Resumen incremental de la conversación (ver conversation_summary.py).
+        fresh=True relee la fila de la BD aunque ya esté cargada en la sesión
+        (otra réplica pudo haberlo actualizado).
+        """
+        summary_id = f"{session_id}{SUMMARY_ID_SUFFIX}"
+        if not fresh:
+            return self.get_session_data_as_dict(summary_id)
+        row = self.db.query(TblSessionData).filter(
+            TblSessionData.id == summary_id
+        ).populate_existing().first()
+        if row and row.data:
+            try:
+                return json.loads(row.data)
+            except json.JSONDecodeError:
+                print(f"❌ Error decodificando JSON para session_id: {summary_id}")
+        return None
+    
+    def save_conversation_summary(self, session_id: str, summary: dict) -> bool:
+        """Guarda el resumen incremental de la conversación"""
+        try:
+            self.save_session_data(f"{session_id}{SUMMARY_ID_SUFFIX}", summary)
+            return True
+        except Exception as e:
+            print(f"❌ Error guardando resumen de conversación: {e}")
+            self.db.rollback()
+            return False
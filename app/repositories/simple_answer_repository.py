@@ -1,17 +1,45 @@
 # app/repositories/simple_answer_repository.py
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.simple_answer import TblSimpleAnswer
-from typing import Optional, List
+from app.models.config_snapshots import SimpleAnswerGraph, SimpleAnswerSnapshot
+from app.cache.config_cache import (
+    SIMPLE_ANSWER_GRAPH_MAX_NODES, simple_answer_graph_cache, invalidate_simple_answers
+)
+from typing import Optional, List, Union
 
 class SimpleAnswerRepository:
     def __init__(self, db_session: Session):
         self.db = db_session
     
-    def find_by_handler_path(self, handler_path: str, account_id: str = None) -> Optional[TblSimpleAnswer]:
+    def get_graph(self, account_id: str) -> Optional[SimpleAnswerGraph]:
+        """
+        Grafo cacheado con todas las respuestas de la cuenta (read-through con TTL).
+        None si la cuenta supera SIMPLE_ANSWER_GRAPH_MAX_NODES: se consulta la BD.
+        """
+        def load() -> Optional[SimpleAnswerGraph]:
+            total = self.db.query(func.count(TblSimpleAnswer.id)).filter(
+                TblSimpleAnswer.account_id == account_id
+            ).scalar()
+            if total > SIMPLE_ANSWER_GRAPH_MAX_NODES:
+                print(f"⚠️ SIMPLE_ANSWER: Cuenta {account_id} con {total} respuestas, sin grafo en caché")
+                return None
+            rows = self.db.query(TblSimpleAnswer).filter(TblSimpleAnswer.account_id == account_id).all()
+            return SimpleAnswerGraph(SimpleAnswerSnapshot.from_model(r) for r in rows)
+        
+        return simple_answer_graph_cache.get_or_load(account_id, load)
+    
+    def find_by_handler_path(self, handler_path: str,
+                             account_id: str = None) -> Optional[Union[TblSimpleAnswer, SimpleAnswerSnapshot]]:
         """
         Busca respuesta por handler_path específico
-        Si se proporciona account_id, filtra también por cuenta
+        Si se proporciona account_id, filtra también por cuenta (desde el grafo cacheado)
         """
+        if account_id:
+            graph = self.get_graph(account_id)
+            if graph is not None:
+                return graph.get(handler_path)
+        
         query = self.db.query(TblSimpleAnswer).filter(
             TblSimpleAnswer.handler_path == handler_path
         )
@@ -35,11 +63,17 @@ class SimpleAnswerRepository:
         
         return query.order_by(TblSimpleAnswer.handler_path).all()
     
-    def find_children_paths(self, parent_path: str, account_id: str = None) -> List[TblSimpleAnswer]:
+    def find_children_paths(self, parent_path: str,
+                            account_id: str = None) -> List[Union[TblSimpleAnswer, SimpleAnswerSnapshot]]:
         """
         Encuentra rutas hijas directas de un path padre
         Ej: parent_path="/menu" encuentra "/menu/1", "/menu/2" pero no "/menu/1/a"
         """
+        if account_id:
+            graph = self.get_graph(account_id)
+            if graph is not None:
+                return graph.children(parent_path)
+        
         # Buscar rutas que empiecen con parent_path/ y no tengan más niveles
         pattern = f"{parent_path}/"
         
@@ -61,8 +95,11 @@ class SimpleAnswerRepository:
         
         return sorted(results, key=lambda x: x.handler_path)
     
-    def find_by_account_id(self, account_id: str) -> List[TblSimpleAnswer]:
+    def find_by_account_id(self, account_id: str) -> List[Union[TblSimpleAnswer, SimpleAnswerSnapshot]]:
         """Obtiene todas las respuestas de una cuenta específica"""
+        graph = self.get_graph(account_id)
+        if graph is not None:
+            return list(graph.answers)
         return self.db.query(TblSimpleAnswer).filter(
             TblSimpleAnswer.account_id == account_id
         ).order_by(TblSimpleAnswer.handler_path).all()
@@ -93,6 +130,7 @@ class SimpleAnswerRepository:
         self.db.add(new_answer)
         self.db.commit()
         self.db.refresh(new_answer)
+        invalidate_simple_answers(account_id)
         return new_answer
     
     def update_message(self, handler_path: str, new_message: str, account_id: str = None) -> bool:
@@ -109,6 +147,7 @@ class SimpleAnswerRepository:
             if answer:
                 answer.message = new_message
                 self.db.commit()
+                invalidate_simple_answers(account_id)
                 return True
             return False
         except Exception as e:
@@ -129,6 +168,7 @@ class SimpleAnswerRepository:
             if answer:
                 self.db.delete(answer)
                 self.db.commit()
+                invalidate_simple_answers(account_id)
                 return True
             return False
         except Exception as e:
@@ -1,7 +1,9 @@
 # app/repositories/text_chatbot_repository.py
 from sqlalchemy.orm import Session
 from app.models.text_chatbot import TblTextChatbot
-from typing import Optional, List
+from app.models.config_snapshots import TextChatbotSnapshot
+from app.cache.config_cache import chatbot_config_cache, invalidate_chatbot_config
+from typing import Optional, List, Tuple
 
 class TextChatbotRepository:
     def __init__(self, db_session: Session):
@@ -25,6 +27,16 @@ class TextChatbotRepository:
             TblTextChatbot.from_uid == from_uid
         ).order_by(TblTextChatbot.channel).all()
     
+    def get_snapshots_by_from_uid(self, from_uid: str) -> Tuple[TextChatbotSnapshot, ...]:
+        """
+        Versión cacheada de find_by_from_uid (read-through con TTL).
+        Retorna copias inmutables ordenadas por canal.
+        """
+        def load() -> Tuple[TextChatbotSnapshot, ...]:
+            return tuple(TextChatbotSnapshot.from_model(c) for c in self.find_by_from_uid(from_uid))
+        
+        return chatbot_config_cache.get_or_load(from_uid, load)
+    
     def find_by_channel(self, channel: int) -> List[TblTextChatbot]:
         """
         Obtiene todas las configuraciones de un canal específico
@@ -59,6 +71,7 @@ class TextChatbotRepository:
         self.db.add(new_config)
         self.db.commit()
         self.db.refresh(new_config)
+        invalidate_chatbot_config(from_uid)
         return new_config
     
     def update_initial_path(self, from_uid: str, channel: int, new_initial_path: str) -> bool:
@@ -70,6 +83,7 @@ class TextChatbotRepository:
             if config:
                 config.initial_path = new_initial_path
                 self.db.commit()
+                invalidate_chatbot_config(from_uid)
                 return True
             return False
         except Exception as e:
@@ -85,6 +99,7 @@ class TextChatbotRepository:
             if config:
                 self.db.delete(config)
                 self.db.commit()
+                invalidate_chatbot_config(from_uid)
                 return True
             return False
         except Exception as e:
@@ -0,0 +1 @@
+# app/routing/__init__.py
@@ -0,0 +1,266 @@
+# app/routing/intent_model.py
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+import numpy as np
+from app.cache.response_cache import normalize_message
+from app.routing.rule_classifier import get_compiled_menu
+from app.utils.metrics import metrics
+
+# Modelos entrenados offline (scripts/train_intent_model.py), un .npz por cuenta
+INTENT_MODEL_DIR = os.getenv('INTENT_MODEL_DIR', 'models/intent')
+INTENT_MODEL_MIN_CONFIDENCE = float(os.getenv('INTENT_MODEL_MIN_CONFIDENCE', '0.75'))
+INTENT_MODEL_RELOAD_SECONDS = float(os.getenv('INTENT_MODEL_RELOAD_SECONDS', '60'))
+
+N_FEATURES = 2 ** 14
+
+# Etiquetas especiales además de los handler_path de opciones de menú
+LABEL_RESTART = "__restart__"   # REQUEST_ACTION desde el path inicial
+LABEL_LLM = "__llm__"           # LANGCHAIN_RESPONSE
+
+
+def _hash(feature: str, n_features: int) -> int:
+    # crc32 es estable entre procesos (hash() de Python no lo es)
+    return zlib.crc32(feature.encode("utf-8")) % n_features
+
+
+def extract_features(text: str, n_features: int = N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vector disperso (índices, valores) con palabras, bigramas y trigramas de
+    caracteres hasheados, normalizado L2. Tolera typos ('celualr') y tildes.
+    """
+    normalized = normalize_message(text)
+    words = normalized.split()
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    padded = f" {normalized} "
+    features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    counts: Dict[int, float] = {}
+    for feature in features:
+        index = _hash(feature, n_features)
+        counts[index] = counts.get(index, 0.0) + 1.0
+
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    exp = np.exp(scores - scores.max())
+    return exp / exp.sum()
+
+
+class IntentModel:
+    """
+    Regresión logística multiclase sobre n-gramas hasheados.
+    Predice la etiqueta de ruteo (handler_path de la opción, __restart__ o
+    __llm__) en microsegundos: solo toca las columnas de los features presentes.
+    """
+
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray,
+                 n_features: int = N_FEATURES, metadata: Optional[Dict[str, Any]] = None):
+        self.labels = list(labels)
+        self.label_index = {label: i for i, label in enumerate(self.labels)}
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.n_features = n_features
+        self.metadata = metadata or {}
+
+    def scores(self, text: str) -> np.ndarray:
+        indices, values = extract_features(text, self.n_features)
+        return self.weights[:, indices] @ values + self.bias
+
+    def predict(self, text: str, allowed: Optional[Iterable[str]] = None,
+                required: Optional[Iterable[str]] = None) -> Tuple[Optional[str], float]:
+        """
+        Etiqueta más probable y su probabilidad. Con allowed, solo se elige entre
+        esas etiquetas, pero la probabilidad sigue siendo la de la distribución
+        completa (renormalizar hace que un único candidato valga siempre 1.0).
+        Con required, (None, 0.0) si ninguna de esas etiquetas está entre los
+        candidatos (p.ej. ningún hijo del path actual es conocido por el modelo).
+        """
+        probabilities = _softmax(self.scores(text))
+        if allowed is not None:
+            candidates = [self.label_index[label] for label in allowed if label in self.label_index]
+            if required is not None and not any(label in self.label_index for label in required):
+                return None, 0.0
+            if not candidates:
+                return None, 0.0
+            best = candidates[int(np.argmax(probabilities[candidates]))]
+            return self.labels[best], float(probabilities[best])
+
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = N_FEATURES,
+              epochs: int = 15, learning_rate: float = 0.5, l2: float = 1e-5,
+              seed: int = 7, metadata: Optional[Dict[str, Any]] = None) -> "IntentModel":
+        """Entrena con SGD sobre los vectores dispersos (cabe en memoria con cualquier volumen)"""
+        label_names = sorted(set(labels))
+        label_index = {label: i for i, label in enumerate(label_names)}
+        samples = [extract_features(text, n_features) for text in texts]
+        targets = np.array([label_index[label] for label in labels], dtype=np.int64)
+
+        weights = np.zeros((len(label_names), n_features), dtype=np.float32)
+        bias = np.zeros(len(label_names), dtype=np.float32)
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch * 0.5)
+            for i in rng.permutation(len(samples)):
+                indices, values = samples[i]
+                if not len(indices):
+                    continue
+                gradient = _softmax(weights[:, indices] @ values + bias)
+                gradient[targets[i]] -= 1.0
+                weights[:, indices] -= rate * (np.outer(gradient, values) + l2 * weights[:, indices])
+                bias -= rate * gradient
+
+        return cls(label_names, weights, bias, n_features, metadata)
+
+    def accuracy(self, texts: Sequence[str], labels: Sequence[str]) -> float:
+        if not texts:
+            return 0.0
+        hits = sum(1 for text, label in zip(texts, labels) if self.predict(text)[0] == label)
+        return hits / len(texts)
+
+    def save(self, path: str) -> None:
+        """Guarda en .npz de forma atómica (el registro puede estar leyendo el archivo)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            labels=np.array(self.labels, dtype=str),
+            weights=self.weights,
+            bias=self.bias,
+            n_features=np.array(self.n_features),
+            metadata=np.array(json.dumps(self.metadata, default=str))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                labels=[str(label) for label in data["labels"]],
+                weights=data["weights"],
+                bias=data["bias"],
+                n_features=int(data["n_features"]),
+                metadata=json.loads(str(data["metadata"]))
+            )
+
+
+class IntentModelRegistry:
+    """
+    Modelos por cuenta cargados desde INTENT_MODEL_DIR/<account_id>.npz.
+    Revisa el mtime del archivo cada reload_seconds y reemplaza el modelo en
+    caliente cuando el entrenamiento publica uno nuevo (o con swap()).
+    """
+
+    def __init__(self, model_dir: str = INTENT_MODEL_DIR, reload_seconds: float = INTENT_MODEL_RELOAD_SECONDS):
+        self.model_dir = model_dir
+        self.reload_seconds = reload_seconds
+        self._models: Dict[str, Tuple[Optional[IntentModel], Optional[float], float]] = {}  # cuenta -> (modelo, mtime, revisado)
+        self._lock = threading.Lock()
+
+    def model_path(self, account_id: str) -> str:
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in account_id)
+        return os.path.join(self.model_dir, f"{safe_name}.npz")
+
+    def get(self, account_id: str) -> Optional[IntentModel]:
+        """Modelo vigente de la cuenta, o None si no hay uno entrenado"""
+        if not account_id:
+            return None
+        entry = self._models.get(account_id)
+        now = time.monotonic()
+        if entry is not None and now - entry[2] < self.reload_seconds:
+            return entry[0]
+
+        with self._lock:
+            entry = self._models.get(account_id)
+            model, loaded_mtime = (entry[0], entry[1]) if entry is not None else (None, None)
+            try:
+                mtime = os.path.getmtime(self.model_path(account_id))
+            except OSError:
+                mtime = None
+
+            if mtime is not None and mtime != loaded_mtime:
+                try:
+                    model = IntentModel.load(self.model_path(account_id))
+                    loaded_mtime = mtime
+                    print(f"🧠 INTENT: Modelo cargado para {account_id} - {len(model.labels)} etiquetas")
+                    metrics.increment("routing.intent_model.loads")
+                except Exception as e:
+                    # Se conserva el modelo anterior
+                    print(f"❌ INTENT: Error cargando modelo de {account_id}: {str(e)}")
+
+            self._models[account_id] = (model, loaded_mtime, now)
+            return model
+
+    def swap(self, account_id: str, model: Optional[IntentModel]) -> None:
+        """Reemplaza el modelo en memoria hasta que se publique un archivo nuevo; None lo descarta"""
+        with self._lock:
+            self._models[account_id] = (model, None, time.monotonic())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+# Registro compartido por el proceso
+intent_model_registry = IntentModelRegistry()
+
+
+class IntentModelClassifier:
+    """
+    Segunda etapa del ruteo (después de las reglas, antes del LLM): usa el
+    modelo de la cuenta restringido a las opciones hijas del path actual.
+    Retorna la estrategia en el formato del HybridOrchestrator o None.
+    """
+
+    def __init__(self, simple_answer_repository, registry: IntentModelRegistry = intent_model_registry,
+                 min_confidence: float = INTENT_MODEL_MIN_CONFIDENCE):
+        self.simple_answer_repo = simple_answer_repository
+        self.registry = registry
+        self.min_confidence = min_confidence
+
+    def classify(self, message: str, session_context: Dict[str, Any],
+                 account_id: str) -> Optional[Dict[str, Any]]:
+        model = self.registry.get(account_id)
+        current_path = session_context.get("current_path", "")
+        if model is None or not current_path:
+            return None
+
+        started = time.perf_counter()
+        menu = get_compiled_menu(self.simple_answer_repo, account_id, current_path)
+        allowed = [LABEL_RESTART, LABEL_LLM] + list(menu.paths)
+        # Sin hijos conocidos por el modelo (texto libre de DbAsk, hojas, opciones
+        # nuevas) no hay nada que elegir: un __restart__ solitario borraría el flujo
+        label, confidence = model.predict(message or "", allowed, required=menu.paths)
+        metrics.observe("routing.intent_model.predict", time.perf_counter() - started)
+
+        if label is None or confidence < self.min_confidence:
+            return None
+
+        handler = current_path.strip("/").split("/")[0] or "DbAnswerHandler"
+        if label == LABEL_RESTART:
+            strategy = {"action": "REQUEST_ACTION", "handler": None, "reset_path": True}
+        elif label == LABEL_LLM:
+            strategy = {"action": "LANGCHAIN_RESPONSE", "handler": handler}
+        else:
+            strategy = {"action": "PROCESS_MESSAGE", "handler": handler, "message": label.rsplit("/", 1)[-1]}
+
+        strategy.update({
+            "reasoning": f"Modelo de intención: '{label}'",
+            "confidence": round(confidence, 3),
+            "source": "intent_model"
+        })
+        return strategy
@@ -0,0 +1,80 @@
+# app/routing/intent_training.py
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from app.cache.response_cache import normalize_message
+from app.routing.intent_model import LABEL_LLM, LABEL_RESTART
+from app.routing.rule_classifier import KEYWORD_ACTIONS
+
+
+def _answer_text(message: Optional[str]) -> str:
+    # Los handlers envían answer.message con los '\n' literales ya convertidos
+    return normalize_message((message or "").replace("\\n", "\n"))
+
+
+def build_training_set(messages: Iterable, answers: Sequence,
+                       initial_paths: Iterable[str] = ()) -> Tuple[List[str], List[str]]:
+    """
+    Arma (textos, etiquetas) para el modelo de intención de una cuenta.
+
+    - Semillas de tbl_simple_answer: el segmento de la opción y sus descripciones
+      se etiquetan con el handler_path de la opción.
+    - Historial de tbl_message (ordenado por sesión y fecha): cada mensaje del
+      usuario se etiqueta con el path cuya respuesta envió el bot a continuación;
+      si el bot respondió algo que no es de tbl_simple_answer, con __llm__.
+      Las respuestas de paths iniciales cuentan como __restart__.
+    """
+    initial = set(initial_paths)
+    texts: List[str] = []
+    labels: List[str] = []
+
+    # 1. Semillas
+    for keyword in KEYWORD_ACTIONS["REQUEST_ACTION"]:
+        texts.append(keyword)
+        labels.append(LABEL_RESTART)
+
+    reply_to_path: Dict[str, Optional[str]] = {}
+    error_replies: Set[str] = set()
+    for answer in answers:
+        path = answer.handler_path
+        label = LABEL_RESTART if path in initial else path
+        if label != LABEL_RESTART and path.count("/") >= 3:
+            for seed in (path.rsplit("/", 1)[-1], answer.description, answer.handler_path_to_description):
+                if seed and normalize_message(seed):
+                    texts.append(seed)
+                    labels.append(label)
+
+        reply = _answer_text(answer.message)
+        if reply:
+            # Respuestas repetidas en varios paths no sirven como etiqueta
+            reply_to_path[reply] = label if reply_to_path.get(reply, label) == label else None
+        if answer.invalid_error:
+            error_replies.add(_answer_text(answer.invalid_error))
+
+    # 2. Historial: mensaje del usuario -> primera respuesta del bot en la sesión
+    pending_user_text: Optional[str] = None
+    current_session = None
+    for message in messages:
+        if message.session_id != current_session:
+            current_session = message.session_id
+            pending_user_text = None
+
+        if message.message_direction == 0:
+            pending_user_text = message.message if message.message and message.message.strip() else None
+            continue
+
+        if pending_user_text is None:
+            continue
+
+        reply = _answer_text(message.message)
+        if reply in reply_to_path:
+            label = reply_to_path[reply]
+        elif reply in error_replies or not reply:
+            label = None
+        else:
+            label = LABEL_LLM
+
+        if label is not None:
+            texts.append(pending_user_text)
+            labels.append(label)
+        pending_user_text = None
+
+    return texts, labels
@@ -0,0 +1,150 @@
+# app/routing/rule_classifier.py
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from app.cache.config_cache import menu_options_cache
+from app.cache.response_cache import normalize_message
+from app.repositories.simple_answer_repository import SimpleAnswerRepository
+
+# Por debajo de esta confianza se consulta al LLM
+RULE_ROUTER_MIN_CONFIDENCE = float(os.getenv('RULE_ROUTER_MIN_CONFIDENCE', '0.8'))
+
+DEFAULT_HANDLER = "DbAnswerHandler"
+
+# Palabras clave deterministas (mensaje normalizado completo) -> acción.
+# REQUEST_ACTION por palabra clave reinicia la conversación desde el path inicial.
+KEYWORD_ACTIONS = {
+    "REQUEST_ACTION": frozenset([
+        "menu", "menu principal", "ver menu", "volver al menu", "inicio", "volver al inicio",
+        "empezar", "comenzar", "empezar de nuevo", "reiniciar", "reinicio",
+    ]),
+}
+
+# Handlers que aceptan texto libre en process_message (no requieren opción de menú)
+FREE_TEXT_HANDLERS = frozenset(["ChatGptHandler"])
+
+# "1", "1.", "opcion 1", "la 2", "numero 3"
+_OPTION_NUMBER_RE = re.compile(r"^(?:(?:la|el|opcion|option|numero|nro|n)\s+)?(\d{1,2})$")
+
+
+@dataclass(frozen=True)
+class CompiledMenu:
+    """Opciones hijas de un path, indexadas por su forma normalizada"""
+    options: Dict[str, str] = field(default_factory=dict)       # normalizado -> segmento original
+    descriptions: Dict[str, str] = field(default_factory=dict)  # descripción normalizada -> segmento
+    paths: Tuple[str, ...] = ()                                 # handler_path de cada opción
+
+
+def get_compiled_menu(simple_answer_repo: SimpleAnswerRepository, account_id: str,
+                      current_path: str) -> CompiledMenu:
+    """Menú hijo de current_path, compilado y cacheado por (cuenta, path)"""
+    def load() -> CompiledMenu:
+        options = {}
+        descriptions = {}
+        paths = []
+        for item in simple_answer_repo.get_menu_options(current_path, account_id):
+            segment = item["option"]
+            paths.append(item["path"])
+            options.setdefault(normalize_message(segment), segment)
+            if item.get("description"):
+                descriptions.setdefault(normalize_message(item["description"]), segment)
+        options.pop("", None)
+        descriptions.pop("", None)
+        return CompiledMenu(options=options, descriptions=descriptions, paths=tuple(paths))
+
+    return menu_options_cache.get_or_load((account_id, current_path), load)
+
+
+class RuleBasedClassifier:
+    """
+    Etapa local previa al LLM del HybridOrchestrator.
+    Resuelve los turnos deterministas (primera interacción, opciones del menú
+    actual, números y palabras como 'menú'/'inicio') y devuelve la misma
+    estructura de estrategia que el LLM, con su confianza. Si no está seguro
+    retorna None para escalar al LLM. handler=None indica usar el handler del
+    path inicial de la cuenta.
+    """
+
+    def __init__(self, simple_answer_repository: SimpleAnswerRepository,
+                 min_confidence: float = RULE_ROUTER_MIN_CONFIDENCE):
+        self.simple_answer_repo = simple_answer_repository
+        self.min_confidence = min_confidence
+
+    def classify(self, message: str, session_context: Dict[str, Any],
+                 account_id: str) -> Optional[Dict[str, Any]]:
+        """Estrategia {action, handler, reasoning, confidence, ...} o None si hay que usar el LLM"""
+        strategy = self._classify(message or "", session_context, account_id)
+        if strategy is None or strategy["confidence"] < self.min_confidence:
+            return None
+        strategy["source"] = "rules"
+        return strategy
+
+    def _classify(self, message: str, session_context: Dict[str, Any],
+                  account_id: str) -> Optional[Dict[str, Any]]:
+        current_path = session_context.get("current_path", "")
+        current_handler = self._handler_from_path(current_path)
+
+        # 1. Sin path o sin inicializar: siempre mostrar el mensaje inicial
+        if not current_path or not session_context.get("initialized", False):
+            return self._strategy("REQUEST_ACTION", None, 1.0,
+                                  "Primera interacción con handlers")
+
+        normalized = normalize_message(message)
+
+        # 2. Palabras de reinicio ('menú', 'inicio'...)
+        for action, keywords in KEYWORD_ACTIONS.items():
+            if normalized in keywords:
+                return self._strategy(action, None, 0.95,
+                                      f"Palabra clave '{normalized}'", reset_path=True)
+
+        # 3. Opción exacta del menú actual (lo que el handler concatena al path)
+        menu = get_compiled_menu(self.simple_answer_repo, account_id, current_path)
+        raw_option = message.strip()
+        if raw_option in menu.options.values():
+            return self._strategy("PROCESS_MESSAGE", current_handler, 1.0,
+                                  f"Opción '{raw_option}' del menú actual", message=raw_option)
+
+        # 4. Opción con otra forma: mayúsculas/tildes, 'opción 2', o la descripción de la opción
+        option = menu.options.get(normalized)
+        if option is None:
+            number = _OPTION_NUMBER_RE.match(normalized)
+            if number:
+                option = menu.options.get(number.group(1))
+        if option is not None:
+            return self._strategy("PROCESS_MESSAGE", current_handler, 0.9,
+                                  f"'{message.strip()}' equivale a la opción '{option}'", message=option)
+
+        option = menu.descriptions.get(normalized)
+        if option is not None:
+            return self._strategy("PROCESS_MESSAGE", current_handler, 0.85,
+                                  f"'{message.strip()}' coincide con la descripción de la opción '{option}'",
+                                  message=option)
+
+        # 5. Handlers de texto libre procesan cualquier mensaje
+        if current_handler in FREE_TEXT_HANDLERS:
+            return self._strategy("PROCESS_MESSAGE", current_handler, 0.9,
+                                  f"{current_handler} acepta texto libre")
+
+        # 6. Número sin opción correspondiente: el handler muestra su error de opción inválida
+        if _OPTION_NUMBER_RE.match(normalized) and menu.options:
+            return self._strategy("PROCESS_MESSAGE", current_handler, 0.8,
+                                  "Número fuera de las opciones del menú")
+
+        return None
+
+    def _handler_from_path(self, path: str) -> str:
+        """'/DbAnswerHandler/menu/1' -> 'DbAnswerHandler'"""
+        parts = (path or "").strip("/").split("/")
+        return parts[0] if parts and parts[0] and parts[0] != "EndHandler" else DEFAULT_HANDLER
+
+    def _strategy(self, action: str, handler: Optional[str], confidence: float, reasoning: str,
+                  **extra: Any) -> Dict[str, Any]:
+        strategy = {
+            "action": action,
+            "handler": handler,
+            "reasoning": reasoning,
+            "confidence": confidence,
+        }
+        strategy.update(extra)
+        return strategy
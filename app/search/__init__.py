@@ -0,0 +1 @@
+# app/search/__init__.py
@@ -0,0 +1,87 @@
+# app/search/pg_product_search.py
+from typing import List, Optional, Tuple
+from sqlalchemy import func, or_, literal_column
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.elements import ColumnElement
+from app.models.products import TblProducts
+from app.search.text_normalizer import query_terms
+
+# Columna generada por migrations/versions/0002_product_search.sql
+SEARCH_VECTOR = literal_column("tbl_products.search_vector")
+
+# Peso de la similitud por trigramas (nombre/modelo) dentro del ranking
+TRIGRAM_WEIGHT = 0.5
+
+
+def _build_tsquery(termino: Optional[str], palabras_clave: Optional[str]) -> Optional[str]:
+    """
+    Arma un tsquery OR con prefijos: 'celular:* | samsung:* | gaming:*C'.
+    Las palabras clave se restringen al peso C (características). Los términos
+    ya vienen sin tildes y solo con [a-z0-9], así que no requieren escape.
+    """
+    parts = [f"{t}:*" for t in query_terms(termino or "")]
+    parts += [f"{t}:*C" for t in query_terms(palabras_clave or "")]
+    return " | ".join(parts) if parts else None
+
+
+def _fuzzy_text(termino: Optional[str]) -> str:
+    """Texto normalizado para comparar por trigramas contra nombre/modelo"""
+    return " ".join(query_terms(termino or ""))
+
+
+class PostgresProductSearch:
+    """
+    Búsqueda de productos resuelta en Postgres: tsvector 'spanish' (GIN) para
+    texto completo y pg_trgm para coincidencias difusas en nombre y modelo.
+    Pensado para catálogos que no conviene mantener en memoria.
+    """
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def match(self, termino: Optional[str],
+              palabras_clave: Optional[str] = None) -> Optional[Tuple[ColumnElement, ColumnElement]]:
+        """
+        Retorna (condición WHERE, expresión de ranking) para componer con otros
+        filtros, o None si el texto no tiene términos buscables.
+        """
+        tsquery_text = _build_tsquery(termino, palabras_clave)
+        if not tsquery_text:
+            return None
+
+        tsquery = func.to_tsquery('spanish', tsquery_text)
+        fuzzy = _fuzzy_text(termino)
+
+        conditions = [SEARCH_VECTOR.op('@@')(tsquery)]
+        rank = func.ts_rank_cd(SEARCH_VECTOR, tsquery)
+
+        if fuzzy:
+            nombre_norm = func.lower(func.f_unaccent(TblProducts.nombre))
+            modelo_norm = func.lower(func.f_unaccent(TblProducts.modelo))
+            conditions += [nombre_norm.op('%')(fuzzy), modelo_norm.op('%')(fuzzy)]
+            rank = rank + TRIGRAM_WEIGHT * func.greatest(
+                func.similarity(nombre_norm, fuzzy),
+                func.similarity(modelo_norm, fuzzy)
+            )
+
+        return or_(*conditions), rank
+
+    def apply(self, query: Query, termino: Optional[str], palabras_clave: Optional[str] = None,
+              order_by_rank: bool = True) -> Query:
+        """Agrega el filtro de texto (y opcionalmente el orden por relevancia) a una query"""
+        matched = self.match(termino, palabras_clave)
+        if matched is None:
+            return query
+        condition, rank = matched
+        query = query.filter(condition)
+        if order_by_rank:
+            query = query.order_by(rank.desc(), TblProducts.precio_con_impuesto.desc())
+        return query
+
+    def search(self, termino: Optional[str], palabras_clave: Optional[str] = None,
+               limit: int = 5) -> List[TblProducts]:
+        """Productos activos ordenados por relevancia (y precio DESC como desempate)"""
+        query = self.db.query(TblProducts).filter(TblProducts.activo == True)
+        if self.match(termino, palabras_clave) is None:
+            return query.order_by(TblProducts.precio_con_impuesto.desc()).limit(limit).all()
+        return self.apply(query, termino, palabras_clave).limit(limit).all()
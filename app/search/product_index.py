@@ -0,0 +1,195 @@
+# app/search/product_index.py
+import bisect
+import heapq
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from app.models.product_snapshot import ProductSnapshot
+from app.search.text_normalizer import tokenize
+from app.utils.metrics import metrics
+
+# Peso de cada campo en el puntaje (BM25F simplificado)
+FIELD_WEIGHTS = {
+    "nombre": 3.0,
+    "marca": 2.5,
+    "modelo": 2.5,
+    "categoria": 1.5,
+    "caracteristicas": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Coincidencias por prefijo ('sams' -> 'samsung') valen menos que las exactas
+PREFIX_MATCH_FACTOR = 0.5
+PREFIX_MIN_LENGTH = 3
+PREFIX_MAX_EXPANSIONS = 20
+
+# Las palabras clave del agente solo buscan en características y pesan menos
+KEYWORD_FACTOR = 0.6
+
+
+class _Postings:
+    """Índice invertido término -> [(doc, tf ponderado)] con longitudes por documento"""
+
+    def __init__(self, docs_terms: Sequence[Dict[str, float]]):
+        self.doc_count = len(docs_terms)
+        self.doc_lengths = [sum(terms.values()) for terms in docs_terms]
+        self.avg_length = (sum(self.doc_lengths) / self.doc_count) if self.doc_count else 0.0
+        # Parte del denominador BM25 que solo depende del documento
+        self.doc_norms = [
+            BM25_K1 * (1 - BM25_B + BM25_B * length / (self.avg_length or 1.0))
+            for length in self.doc_lengths
+        ]
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc_id, terms in enumerate(docs_terms):
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+        self.idf = {
+            term: math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    def expand(self, token: str) -> List[Tuple[str, float]]:
+        """Término exacto y, si el token es largo, términos que empiezan por él"""
+        matches = []
+        if token in self.postings:
+            matches.append((token, 1.0))
+        if len(token) >= PREFIX_MIN_LENGTH:
+            start = bisect.bisect_left(self.vocabulary, token)
+            for term in self.vocabulary[start:start + PREFIX_MAX_EXPANSIONS + 1]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    matches.append((term, PREFIX_MATCH_FACTOR))
+        return matches
+
+    def score_into(self, scores: Dict[int, float], tokens: List[str], factor: float = 1.0) -> None:
+        """Suma el puntaje BM25 de cada token a scores[doc]"""
+        for token in tokens:
+            for term, match_factor in self.expand(token):
+                weight = self.idf[term] * match_factor * factor
+                doc_norms = self.doc_norms
+                for doc_id, tf in self.postings[term]:
+                    score = weight * (tf * (BM25_K1 + 1)) / (tf + doc_norms[doc_id])
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido en memoria del catálogo activo con ranking BM25.
+    Inmutable una vez construido: se reemplaza completo al refrescar.
+    """
+
+    def __init__(self, products: Sequence[ProductSnapshot], signature: Optional[tuple] = None):
+        self.products = list(products)
+        self.signature = signature
+        self.built_at = time.monotonic()
+
+        all_fields = []
+        caracteristicas_only = []
+        for product in self.products:
+            terms: Counter = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(getattr(product, field) or ""):
+                    terms[token] += weight
+            all_fields.append(dict(terms))
+            caracteristicas_only.append(dict(Counter(tokenize(product.caracteristicas or ""))))
+
+        self._all = _Postings(all_fields)
+        self._caracteristicas = _Postings(caracteristicas_only)
+
+        # Orden por precio DESC: desempate y resultado cuando no hay términos
+        self._price_rank = sorted(
+            range(len(self.products)),
+            key=lambda i: -float(self.products[i].precio_con_impuesto or 0)
+        )
+
+    def search(self, termino: Optional[str], palabras_clave: Optional[str] = None,
+               limit: int = 5) -> List[ProductSnapshot]:
+        """
+        Mismo contrato que buscar_con_palabras_clave: el término busca en nombre,
+        marca, categoría, modelo y características; las palabras clave solo en
+        características. Ordena por relevancia y luego por precio DESC.
+        """
+        term_tokens = tokenize(termino or "")
+        keyword_tokens = tokenize(palabras_clave or "")
+
+        if not term_tokens and not keyword_tokens:
+            return [self.products[i] for i in self._price_rank[:limit]]
+
+        scores: Dict[int, float] = {}
+        self._all.score_into(scores, term_tokens)
+        self._caracteristicas.score_into(scores, keyword_tokens, KEYWORD_FACTOR)
+
+        ranked = heapq.nsmallest(
+            limit, scores,
+            key=lambda i: (-scores[i], -float(self.products[i].precio_con_impuesto or 0))
+        )
+        return [self.products[i] for i in ranked]
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+
+class ProductCatalogIndex:
+    """
+    Contenedor del índice compartido por todo el proceso.
+    Se construye al primer uso y se reconstruye cuando cambia la firma del
+    catálogo (se consulta como máximo cada refresh_seconds) o con refresh().
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._index: Optional[ProductSearchIndex] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, load_products: Callable[[], List[ProductSnapshot]],
+            load_signature: Callable[[], tuple]) -> ProductSearchIndex:
+        """Retorna el índice vigente, construyéndolo o refrescándolo si hace falta"""
+        index = self._index
+        if index is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return index
+
+        with self._lock:
+            # Otro hilo pudo refrescar mientras esperábamos
+            if self._index is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return self._index
+
+            signature = load_signature()
+            if self._index is None or self._index.signature != signature:
+                self._build(load_products(), signature)
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def refresh(self, load_products: Callable[[], List[ProductSnapshot]],
+                load_signature: Callable[[], tuple]) -> ProductSearchIndex:
+        """Fuerza la reconstrucción del índice"""
+        with self._lock:
+            self._build(load_products(), load_signature())
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def invalidate(self) -> None:
+        """Marca el índice para revalidar la firma en la próxima búsqueda"""
+        self._checked_at = 0.0
+
+    def _build(self, products: List[ProductSnapshot], signature: tuple) -> None:
+        started = time.perf_counter()
+        self._index = ProductSearchIndex(products, signature)
+        elapsed = time.perf_counter() - started
+        metrics.observe("search.product_index.build", elapsed)
+        metrics.set_gauge("search.product_index.size", len(products))
+        print(f"🔎 SEARCH: Índice de productos construido - {len(products)} productos en {elapsed * 1000:.1f} ms")
+
+
+# Índice compartido por el proceso
+product_catalog_index = ProductCatalogIndex(
+    refresh_seconds=float(os.getenv('PRODUCT_INDEX_REFRESH_SECONDS', '300'))
+)
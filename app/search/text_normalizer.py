@@ -0,0 +1,60 @@
+# app/search/text_normalizer.py
+import re
+import unicodedata
+from typing import List
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Palabras vacías frecuentes en consultas de clientes (ya sin tildes)
+SPANISH_STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante con contra de del desde donde
+e el ella ellos en entre era es esa ese eso esta este esto estos hay la las le lo
+los mas me mi mis muy no o para pero por que quiero se si sin sobre su sus te tu
+tus un una unas uno unos y ya busco tienen tienes tiene hola
+""".split())
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas y sin tildes/diacríticos ('Audífonos' -> 'audifonos')"""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+def light_stem(token: str) -> str:
+    """
+    Stemming mínimo de plurales en español: quita la 's' final y luego la 'e'
+    final, así 'celulares'/'celular', 'parlantes'/'parlante' e 'iphones'/'iphone'
+    caen en la misma raíz. No toca números ni tokens cortos.
+    """
+    if token.isdigit() or len(token) <= 3:
+        return token
+    if token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    if len(token) > 4 and token.endswith("e"):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza texto libre: sin tildes, sin stopwords, con stemming ligero"""
+    if not text:
+        return []
+    return [
+        light_stem(token)
+        for token in _TOKEN_RE.findall(fold_accents(text))
+        if token not in SPANISH_STOPWORDS
+    ]
+
+
+def query_terms(text: str) -> List[str]:
+    """
+    Términos de consulta sin stemming (para delegar el stemming a Postgres):
+    sin tildes, solo [a-z0-9] y sin stopwords. Seguros para armar un tsquery.
+    """
+    if not text:
+        return []
+    return [
+        token
+        for token in _TOKEN_RE.findall(fold_accents(text))
+        if token not in SPANISH_STOPWORDS
+    ]
@@ -0,0 +1,70 @@
+# app/services/ai_stack.py
+import os
+import threading
+import time
+from typing import Any, Optional
+from app.utils.metrics import metrics
+
+# false = worker solo de handlers: no se importa LangChain / OpenAI (requirements-core.txt)
+AI_STACK_ENABLED = os.getenv('AI_STACK_ENABLED', 'true').lower() == 'true'
+
+_import_lock = threading.Lock()
+_service_class = None
+
+
+class AIStackDisabled(RuntimeError):
+    """Se pidió el servicio de IA en un worker con AI_STACK_ENABLED=false"""
+
+
+def load_langchain_service_class():
+    """
+    Importa AdvancedLangChainService (y con él langchain, langchain_openai,
+    httpx y el SDK de OpenAI) la primera vez que se necesita.
+    """
+    global _service_class
+    if _service_class is not None:
+        return _service_class
+    if not AI_STACK_ENABLED:
+        raise AIStackDisabled("AI_STACK_ENABLED=false: este worker no carga LangChain")
+
+    with _import_lock:
+        if _service_class is None:
+            started = time.perf_counter()
+            from app.services.langchain_service import AdvancedLangChainService
+            elapsed = time.perf_counter() - started
+            metrics.observe("ai_stack.import", elapsed)
+            print(f"🧠 AI_STACK: LangChain cargado en {elapsed * 1000:.0f} ms")
+            _service_class = AdvancedLangChainService
+    return _service_class
+
+
+def is_loaded() -> bool:
+    return _service_class is not None
+
+
+class LazyLangChainService:
+    """
+    Se comporta como AdvancedLangChainService pero lo importa y construye en
+    el primer acceso a un atributo: los turnos de handlers puros nunca pagan
+    el import ni la creación del agente.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._args = args
+        self._kwargs = kwargs
+        self._service: Optional[Any] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._service is not None
+
+    def get(self):
+        if self._service is None:
+            self._service = load_langchain_service_class()(*self._args, **self._kwargs)
+        return self._service
+
+    def __getattr__(self, name: str) -> Any:
+        # Solo se llama para atributos que no existen en el proxy
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
@@ -0,0 +1,165 @@
+# app/services/context_assembler.py
+import os
+from typing import List, Optional, Tuple
+from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from app.utils.metrics import metrics
+
+try:
+    import tiktoken
+except ImportError:  # Viene con langchain-openai; sin él se estima por caracteres
+    tiktoken = None
+
+# Presupuestos de contexto por llamada al Agent
+LLM_HISTORY_MAX_TOKENS = int(os.getenv('LLM_HISTORY_MAX_TOKENS', '1500'))
+LLM_HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv('LLM_HISTORY_SUMMARY_MAX_TOKENS', '250'))
+LLM_HISTORY_LOAD_LIMIT = int(os.getenv('LLM_HISTORY_LOAD_LIMIT', '30'))       # mensajes leídos de tbl_message
+ACCOUNT_PROMPT_MAX_TOKENS = int(os.getenv('ACCOUNT_PROMPT_MAX_TOKENS', '3000'))
+TOOL_TEXT_FIELD_MAX_CHARS = int(os.getenv('TOOL_TEXT_FIELD_MAX_CHARS', '400'))  # p.ej. 'caracteristicas'
+
+# Tokens fijos que agrega cada mensaje del chat (rol y separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_LINE_MAX_CHARS = 120
+SUMMARY_HEADER = "Resumen de mensajes anteriores de esta conversación:"
+
+_encoding = None
+
+
+def _get_encoding():
+    """Encoding de gpt-4o; False si tiktoken no está o no puede cargar sus tablas"""
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.encoding_for_model("gpt-4o")
+            except Exception as e:
+                print(f"⚠️ CONTEXT: tiktoken no disponible ({str(e)}), estimando tokens por caracteres")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Tokens de un texto (aprox. 4 caracteres por token sin tiktoken)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_chars(text: Optional[str], max_chars: int) -> Optional[str]:
+    """Corta en el último espacio antes de max_chars y agrega '…'"""
+    if not text or len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars].rstrip() + "…"
+
+
+def truncate_tokens(text: Optional[str], max_tokens: int) -> Optional[str]:
+    """Recorta un texto a max_tokens"""
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]).rstrip() + "…"
+    return truncate_chars(text, max_tokens * 4)
+
+
+def cap_account_prompt(prompt: Optional[str], max_tokens: int = ACCOUNT_PROMPT_MAX_TOKENS) -> Optional[str]:
+    """Limita el prompt de tbl_account_prompts para que no crezca sin control"""
+    if prompt and count_tokens(prompt) > max_tokens:
+        print(f"⚠️ CONTEXT: Prompt de cuenta excede {max_tokens} tokens, se recorta")
+        metrics.increment("llm.context.prompt_truncated")
+        return truncate_tokens(prompt, max_tokens)
+    return prompt
+
+
+def split_history(messages: List[BaseMessage], max_tokens: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """
+    Separa (antiguos, recientes): los recientes son el sufijo más largo que
+    cabe en max_tokens, empezando siempre en un mensaje del cliente.
+    """
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        used += count_message_tokens(messages[i])
+        if used > max_tokens:
+            break
+        start = i
+    while start < len(messages) and not isinstance(messages[start], HumanMessage):
+        start += 1
+    return messages[:start], messages[start:]
+
+
+def summary_line(message: BaseMessage) -> str:
+    """Línea extractiva de un mensaje antiguo: quién habló y el inicio de lo que dijo"""
+    speaker = "Cliente" if isinstance(message, HumanMessage) else "Asistente"
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return f"- {speaker}: {truncate_chars(' '.join(content.split()), SUMMARY_LINE_MAX_CHARS)}"
+
+
+class TokenBudgetMemory(ConversationBufferMemory):
+    """
+    Memoria del Agent acotada por tokens en vez de por turnos.
+    Entrega los mensajes recientes que caben en max_history_tokens y, antes,
+    un resumen extractivo de los antiguos (hasta summary_max_tokens) que se
+    actualiza de forma incremental a medida que los turnos salen de la ventana.
+    persisted_summary es el resumen guardado de la sesión (mensajes que ya no
+    se cargan de tbl_message) y va siempre al inicio del resumen.
+    """
+
+    max_history_tokens: int = LLM_HISTORY_MAX_TOKENS
+    summary_max_tokens: int = LLM_HISTORY_SUMMARY_MAX_TOKENS
+    summary_lines: List[str] = []
+    summarized_count: int = 0
+    persisted_summary: str = ""
+
+    @property
+    def buffer_as_messages(self) -> List[BaseMessage]:
+        older, recent = split_history(self.chat_memory.messages, self.max_history_tokens)
+        summary = self._summarize(older)
+
+        history_tokens = sum(count_message_tokens(m) for m in recent)
+        metrics.increment("llm.context.history_tokens", history_tokens)
+        if older:
+            metrics.increment("llm.context.history_trimmed")
+
+        return ([SystemMessage(content=summary)] if summary else []) + recent
+
+    def _summarize(self, older: List[BaseMessage]) -> Optional[str]:
+        if len(older) < self.summarized_count:
+            # La historia se recargó más corta: rehacer
+            self.summary_lines = []
+            self.summarized_count = 0
+        for message in older[self.summarized_count:]:
+            self.summary_lines.append(summary_line(message))
+        self.summarized_count = len(older)
+
+        # Si no cabe, se descartan las líneas más antiguas
+        head = [SUMMARY_HEADER]
+        used = count_tokens(SUMMARY_HEADER)
+        if self.persisted_summary:
+            persisted = truncate_tokens(self.persisted_summary, max(self.summary_max_tokens - used, 0))
+            head.append(persisted)
+            used += count_tokens(persisted) + 1
+        lines: List[str] = []
+        for line in reversed(self.summary_lines):
+            used += count_tokens(line) + 1
+            if used > self.summary_max_tokens:
+                break
+            lines.append(line)
+        if len(head) == 1 and not lines:
+            return None
+        return "\n".join(head + list(reversed(lines)))
+
+    def clear(self) -> None:
+        super().clear()
+        self.summary_lines = []
+        self.summarized_count = 0
+        self.persisted_summary = ""
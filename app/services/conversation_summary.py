@@ -0,0 +1,126 @@
+# app/services/conversation_summary.py
+import os
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+from app.services.context_assembler import truncate_chars
+from app.services.llm_pool import llm_pool, LLMRejected
+from app.utils.metrics import metrics
+
+# Resumen incremental por sesión (guardado en tbl_session_data con id '<session_id>:summary')
+LLM_SUMMARY_ENABLED = os.getenv('LLM_SUMMARY_ENABLED', 'true').lower() == 'true'
+LLM_SUMMARY_REFRESH_TURNS = int(os.getenv('LLM_SUMMARY_REFRESH_TURNS', '6'))    # turnos sin resumir antes de compactar
+LLM_SUMMARY_KEEP_MESSAGES = int(os.getenv('LLM_SUMMARY_KEEP_MESSAGES', '4'))    # mensajes recientes que quedan textuales
+LLM_SUMMARY_MAX_CHARS = int(os.getenv('LLM_SUMMARY_MAX_CHARS', '900'))          # tbl_session_data.data es varchar(2000)
+LLM_SUMMARY_MODE = os.getenv('LLM_SUMMARY_MODE', 'llm')                         # llm | extractive
+LLM_SUMMARY_MODEL = os.getenv('LLM_SUMMARY_MODEL', 'gpt-4o-mini')
+LLM_SUMMARY_DEADLINE_SECONDS = float(os.getenv('LLM_SUMMARY_DEADLINE_SECONDS', '10'))
+LLM_SUMMARY_FOLD_BATCH = int(os.getenv('LLM_SUMMARY_FOLD_BATCH', '100'))             # mensajes por llamada al resumir
+
+MESSAGE_MAX_CHARS = 400
+
+SUMMARY_PROMPT = """Actualiza el resumen de una conversación de WhatsApp entre un cliente y el asistente de una tienda.
+
+Resumen actual:
+{previous}
+
+Mensajes nuevos:
+{messages}
+
+Escribe el resumen actualizado en español, en máximo {max_chars} caracteres. Conserva lo que el
+cliente busca (productos, marcas, presupuesto), datos que dio y lo que el asistente ya ofreció o
+respondió. Sin saludos ni relleno. RESPONDE SOLO EL RESUMEN."""
+
+
+@dataclass
+class ConversationSummary:
+    """Estado del resumen: texto y último tbl_message.id incluido en él"""
+    text: str = ""
+    last_message_id: int = 0
+    summarized_messages: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ConversationSummary":
+        if not data:
+            return cls()
+        return cls(
+            text=data.get("text") or "",
+            last_message_id=int(data.get("last_message_id") or 0),
+            summarized_messages=int(data.get("summarized_messages") or 0)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def transcript_lines(messages: List[Any]) -> List[str]:
+    """Filas de tbl_message en orden cronológico -> '- Cliente: ...' / '- Asistente: ...'"""
+    lines = []
+    for message in messages:
+        if not message.message:
+            continue
+        speaker = "Cliente" if message.message_direction == 0 else "Asistente"
+        lines.append(f"- {speaker}: {truncate_chars(' '.join(message.message.split()), MESSAGE_MAX_CHARS)}")
+    return lines
+
+
+def extractive_fold(previous: str, lines: List[str], max_chars: int = LLM_SUMMARY_MAX_CHARS) -> str:
+    """Resumen sin LLM: agrega las líneas nuevas y conserva el final que cabe en max_chars"""
+    text = "\n".join(part for part in [previous] + lines if part)
+    if len(text) <= max_chars:
+        return text
+    cut = text.find("\n", len(text) - max_chars)
+    return text[cut + 1:] if cut != -1 else text[-max_chars:]
+
+
+class ConversationSummarizer:
+    """
+    Compacta los mensajes antiguos de una sesión en un resumen corto.
+    Con LLM_SUMMARY_MODE=llm usa un modelo chico (dentro del pool de LLM);
+    si falla o el pool está saturado, cae al resumen extractivo.
+    """
+
+    def __init__(self, mode: str = LLM_SUMMARY_MODE, max_chars: int = LLM_SUMMARY_MAX_CHARS):
+        self.mode = mode
+        self.max_chars = max_chars
+        self._llm = None
+
+    def fold(self, previous: str, messages: List[Any], pool_key: str = "default") -> str:
+        lines = transcript_lines(messages)
+        if not lines:
+            return previous
+
+        if self.mode == "llm":
+            try:
+                summary = llm_pool.run(
+                    pool_key,
+                    lambda: self._get_llm().invoke(SUMMARY_PROMPT.format(
+                        previous=previous or "(vacío)",
+                        messages="\n".join(lines),
+                        max_chars=self.max_chars
+                    )).content.strip(),
+                    deadline_seconds=LLM_SUMMARY_DEADLINE_SECONDS
+                )
+                if summary:
+                    metrics.increment("llm.summary.llm")
+                    return truncate_chars(summary, self.max_chars)
+            except LLMRejected:
+                pass
+            except Exception as e:
+                print(f"⚠️ SUMMARY: Error resumiendo con LLM ({str(e)}), usando resumen extractivo")
+
+        metrics.increment("llm.summary.extractive")
+        return extractive_fold(previous, lines, self.max_chars)
+
+    def _get_llm(self):
+        if self._llm is None:
+            from langchain.chat_models import ChatOpenAI
+            self._llm = ChatOpenAI(
+                openai_api_key=os.getenv('OPENAI_API_KEY'),
+                model=LLM_SUMMARY_MODEL,
+                temperature=0
+            )
+        return self._llm
+
+
+# Compartido por el proceso (el cliente de OpenAI se crea una sola vez)
+conversation_summarizer = ConversationSummarizer()
@@ -3,15 +3,25 @@ import requests
 import os
 import json
 from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
 from app.repositories.accounts_repository import AccountsRepository
+from app.cache.token_cache import gupshup_token_cache, invalidate_app_token
 from app.utils.gupshup_logger import GupshupLogger
+from app.utils.metrics import metrics
+
+# Conexiones keep-alive compartidas hacia Gupshup (evita un handshake TLS por envío)
+GUPSHUP_HTTP_POOL_SIZE = int(os.getenv('GUPSHUP_HTTP_POOL_SIZE', '20'))
+
+gupshup_http = requests.Session()
+gupshup_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=GUPSHUP_HTTP_POOL_SIZE))
+gupshup_http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=GUPSHUP_HTTP_POOL_SIZE))
 
 class GupshupSenderService:
     def __init__(self, accounts_repository: AccountsRepository):
         self.accounts_repo = accounts_repository
         self.base_url = os.getenv('GUPSHUP_BASE_URL', 'https://partner.gupshup.io/partner/app')
-        # URL base para autenticación (extraída de tu Java)
-        self.api_base_url = "https://partner.gupshup.io/partner"  # Asumiendo esta URL base
+        # URL base para autenticación y envío (configurable para apuntar a un stand-in local)
+        self.api_base_url = os.getenv('GUPSHUP_API_BASE_URL', 'https://partner.gupshup.io/partner')
     
     def get_login_partner(self, email: str, password: str) -> Dict[str, Any]:
         """Equivale a getLoginPatner en Java"""
@@ -34,7 +44,7 @@ class GupshupSenderService:
                 "password": password
             }
             
-            response = requests.post(url, headers=headers, data=data, timeout=10)
+            response = gupshup_http.post(url, headers=headers, data=data, timeout=10)
             print(f"🔑 LOGIN: Status Code: {response.status_code}")
             
             if response.status_code == 200:
@@ -77,7 +87,7 @@ class GupshupSenderService:
                 "Authorization": login_token
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = gupshup_http.get(url, headers=headers, timeout=10)
             print(f"🎨 TOKEN_APP: Status Code: {response.status_code}")
             
             if response.status_code == 200:
@@ -103,7 +113,65 @@ class GupshupSenderService:
                 "error": f"Token app error: {str(e)}"
             }
         
-    def send_text_message(self, to: str, message: str, display_phone_number: str) -> Dict[str, Any]:
+    def get_app_token(self, account) -> Dict[str, Any]:
+        """
+        Token de app para enviar (login partner + token app), cacheado por
+        (appid, gs_user) durante GUPSHUP_TOKEN_TTL_SECONDS.
+        Retorna {"success": True, "token": ...} o el error con su error_code.
+        """
+        key = (account.appid, account.gs_user)
+        cached = gupshup_token_cache.get(key)
+        if cached:
+            return {"success": True, "token": cached}
+        
+        metrics.increment("gupshup.token_fetch")
+        login_result = self.get_login_partner(account.gs_user, account.gs_password)
+        if not login_result["success"]:
+            GupshupLogger.log_credentials_issue(
+                account.from_uid,
+                f"Login fallido: {login_result['error']}"
+            )
+            return {
+                "success": False,
+                "error": f"Login fallido: {login_result['error']}",
+                "error_code": "LOGIN_FAILED"
+            }
+        
+        login_token = login_result["login_response"].get("token")
+        if not login_token:
+            return {
+                "success": False,
+                "error": "No se obtuvo token de login",
+                "error_code": "NO_LOGIN_TOKEN"
+            }
+        
+        token_result = self.get_token_app(login_token, account.appid)
+        if not token_result["success"]:
+            return {
+                "success": False,
+                "error": f"Token app fallido: {token_result['error']}",
+                "error_code": "TOKEN_APP_FAILED"
+            }
+        
+        app_token_data = token_result["token_response"].get("token")
+        if not app_token_data or not app_token_data.get("token"):
+            return {
+                "success": False,
+                "error": "No se obtuvo token de app",
+                "error_code": "NO_APP_TOKEN"
+            }
+        
+        gupshup_token_cache.set(key, app_token_data["token"])
+        return {"success": True, "token": app_token_data["token"]}
+    
+    def forget_app_token_on_unauthorized(self, response, appid: str) -> None:
+        """Un 401 indica token vencido o revocado: el próximo envío pide uno nuevo"""
+        if response.status_code == 401:
+            print(f"🔑 TOKEN_APP: 401 para app {appid}, se descarta el token cacheado")
+            invalidate_app_token(appid)
+    
+    def send_text_message(self, to: str, message: str, display_phone_number: str,
+                          account=None) -> Dict[str, Any]:
         """
         Envía mensaje de texto via Gupshup API V3 con flujo de autenticación de 3 pasos
         Equivale al flujo Java: getLoginPatner -> getTokenApp -> enviarMensaje
@@ -112,13 +180,16 @@ class GupshupSenderService:
             to: Número del destinatario (ej: '51987654321')
             message: Contenido del mensaje
             display_phone_number: Número de la cuenta de WhatsApp Business
+            account: Snapshot de la cuenta ya obtenido (envíos desde otro hilo,
+                     sin tocar la sesión de BD del request)
             
         Returns:
             Dict con resultado del envío
         """
         try:
             # 1. Obtener credenciales de la cuenta (equivale a findByFromUid)
-            account = self.accounts_repo.find_by_from_uid(display_phone_number)
+            if account is None:
+                account = self.accounts_repo.get_snapshot_by_from_uid(display_phone_number)
             
             if not account:
                 GupshupLogger.log_credentials_issue(
@@ -142,47 +213,12 @@ class GupshupSenderService:
                     "error_code": "MISSING_CREDENTIALS"
                 }
             
-            # 2. PASO 1: Login Partner (equivale a getLoginPatner)
-            login_result = self.get_login_partner(account.gs_user, account.gs_password)
-            
-            if not login_result["success"]:
-                GupshupLogger.log_credentials_issue(
-                    display_phone_number,
-                    f"Login fallido: {login_result['error']}"
-                )
-                return {
-                    "success": False,
-                    "error": f"Login fallido: {login_result['error']}",
-                    "error_code": "LOGIN_FAILED"
-                }
-            
-            login_token = login_result["login_response"].get("token")
-            if not login_token:
-                return {
-                    "success": False,
-                    "error": "No se obtuvo token de login",
-                    "error_code": "NO_LOGIN_TOKEN"
-                }
-            
-            # 3. PASO 2: Get Token App (equivale a getTokenApp)
-            token_result = self.get_token_app(login_token, account.appid)
-            
+            # 2-3. PASO 1 y 2: Login Partner + Get Token App (cacheado)
+            token_result = self.get_app_token(account)
             if not token_result["success"]:
-                return {
-                    "success": False,
-                    "error": f"Token app fallido: {token_result['error']}",
-                    "error_code": "TOKEN_APP_FAILED"
-                }
+                return token_result
             
-            app_token_data = token_result["token_response"].get("token")
-            if not app_token_data or not app_token_data.get("token"):
-                return {
-                    "success": False,
-                    "error": "No se obtuvo token de app",
-                    "error_code": "NO_APP_TOKEN"
-                }
-            
-            app_token = app_token_data["token"]
+            app_token = token_result["token"]
             
             # 4. PASO 3: Enviar Mensaje (equivale a enviarMensaje)
             url = f"{self.api_base_url}/app/{account.appid}/v3/message"
@@ -219,13 +255,14 @@ class GupshupSenderService:
             print(f"🔧 SEND_MSG CURL: {curl_cmd}")
             
             # Enviar request
-            response = requests.post(
+            response = gupshup_http.post(
                 url=url, 
                 headers=headers, 
                 json=payload,
                 timeout=10
             )
             print(f"📤 SEND_MSG: Response Status: {response.status_code}")
+            self.forget_app_token_on_unauthorized(response, account.appid)
             
             # 5. Procesar respuesta
             if response.status_code == 200:
@@ -308,7 +345,7 @@ class GupshupSenderService:
             display_phone_number: Número de la cuenta WhatsApp Business
         """
         try:
-            account = self.accounts_repo.find_by_from_uid(display_phone_number)
+            account = self.accounts_repo.get_snapshot_by_from_uid(display_phone_number)
             
             if not account or not account.appid or not account.gs_user:
                 return {
@@ -353,7 +390,7 @@ class GupshupSenderService:
                     "error_code": "UNSUPPORTED_MEDIA_TYPE"
                 }
             
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
+            response = gupshup_http.post(url, headers=headers, json=payload, timeout=10)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -390,7 +427,7 @@ class GupshupSenderService:
             display_phone_number: Número de la cuenta WhatsApp Business
         """
         try:
-            account = self.accounts_repo.find_by_from_uid(display_phone_number)
+            account = self.accounts_repo.get_snapshot_by_from_uid(display_phone_number)
             
             if not account or not account.appid or not account.gs_user:
                 return {
@@ -425,7 +462,7 @@ class GupshupSenderService:
                 }
             }
             
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
+            response = gupshup_http.post(url, headers=headers, json=payload, timeout=10)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -466,7 +503,7 @@ class GupshupSenderService:
         """
         try:
             # 1. Obtener credenciales y tokens (mismo flujo que send_text_message)
-            account = self.accounts_repo.find_by_from_uid(display_phone_number)
+            account = self.accounts_repo.get_snapshot_by_from_uid(display_phone_number)
             
             if not account or not account.appid or not account.gs_user or not account.gs_password:
                 return {
@@ -475,28 +512,19 @@ class GupshupSenderService:
                     "error_code": "MISSING_CREDENTIALS"
                 }
             
-            # 2. Login y obtener tokens (reutilizando lógica existente)
-            login_result = self.get_login_partner(account.gs_user, account.gs_password)
-            if not login_result["success"]:
-                return {
-                    "success": False,
-                    "error": f"Login fallido para template: {login_result['error']}",
-                    "error_code": "LOGIN_FAILED"
-                }
-            
-            login_token = login_result["login_response"].get("token")
-            token_result = self.get_token_app(login_token, account.appid)
+            # 2. Token de app (cacheado)
+            token_result = self.get_app_token(account)
             if not token_result["success"]:
                 return {
                     "success": False,
-                    "error": f"Token app fallido para template: {token_result['error']}",
-                    "error_code": "TOKEN_APP_FAILED"
+                    "error": f"{token_result['error']} (para template)",
+                    "error_code": token_result["error_code"]
                 }
             
-            app_token = token_result["token_response"]["token"]["token"]
+            app_token = token_result["token"]
             
             # 3. Construir URL y headers según documentación oficial
-            url = f"https://partner.gupshup.io/partner/app/{account.appid}/v3/message"
+            url = f"{self.api_base_url}/app/{account.appid}/v3/message"
             headers = {
                 "accept": "application/json",
                 "Authorization": app_token,
@@ -522,7 +550,8 @@ class GupshupSenderService:
             print(f"📋 TEMPLATE: Payload: {payload}")
             
             # 5. Enviar request
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
+            response = gupshup_http.post(url, headers=headers, json=payload, timeout=15)
+            self.forget_app_token_on_unauthorized(response, account.appid)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -580,7 +609,7 @@ class GupshupSenderService:
         """
         try:
             # 1. Obtener credenciales y tokens (mismo flujo que otras funciones)
-            account = self.accounts_repo.find_by_from_uid(display_phone_number)
+            account = self.accounts_repo.get_snapshot_by_from_uid(display_phone_number)
             
             if not account or not account.appid or not account.gs_user or not account.gs_password:
                 return {
@@ -589,28 +618,19 @@ class GupshupSenderService:
                     "error_code": "MISSING_CREDENTIALS"
                 }
             
-            # 2. Login y obtener tokens
-            login_result = self.get_login_partner(account.gs_user, account.gs_password)
-            if not login_result["success"]:
-                return {
-                    "success": False,
-                    "error": f"Login fallido para flow: {login_result['error']}",
-                    "error_code": "LOGIN_FAILED"
-                }
-            
-            login_token = login_result["login_response"].get("token")
-            token_result = self.get_token_app(login_token, account.appid)
+            # 2. Token de app (cacheado)
+            token_result = self.get_app_token(account)
             if not token_result["success"]:
                 return {
                     "success": False,
-                    "error": f"Token app fallido para flow: {token_result['error']}",
-                    "error_code": "TOKEN_APP_FAILED"
+                    "error": f"{token_result['error']} (para flow)",
+                    "error_code": token_result["error_code"]
                 }
             
-            app_token = token_result["token_response"]["token"]["token"]
+            app_token = token_result["token"]
             
             # 3. Construir URL y headers según documentación oficial
-            url = f"https://partner.gupshup.io/partner/app/{account.appid}/v3/message"
+            url = f"{self.api_base_url}/app/{account.appid}/v3/message"
             headers = {
                 "Authorization": app_token,
                 "Content-Type": "application/json"
@@ -657,7 +677,8 @@ class GupshupSenderService:
             print(f"🌊 FLOW: Payload: {payload}")
             
             # 5. Enviar request
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
+            response = gupshup_http.post(url, headers=headers, json=payload, timeout=15)
+            self.forget_app_token_on_unauthorized(response, account.appid)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -1,8 +1,10 @@
 # app/services/gupshup_service.py
 from typing import Dict, Any, Optional
 import json
+import time
 from datetime import datetime
 from app.models.webhook_data import WebhookData
+from app.services.webhook_parser import extract_webhook_events, group_conversations, group_status_updates
 from app.repositories.gupshup_repository import GupshupRepository
 from app.repositories.accounts_repository import AccountsRepository
 from app.repositories.account_prompts_repository import AccountPromptsRepository
@@ -12,9 +14,13 @@ from app.repositories.products_repository import ProductsRepository
 from app.repositories.simple_answer_repository import SimpleAnswerRepository
 from app.repositories.text_chatbot_repository import TextChatbotRepository
 from app.repositories.session_data_repository import SessionDataRepository
-from app.services.langchain_service import AdvancedLangChainService
+from app.services.ai_stack import AI_STACK_ENABLED, LazyLangChainService
 from app.services.handler_service import HandlerService
 from app.services.gupshup_sender_service import GupshupSenderService
+from app.services.status_pipeline import status_pipeline
+from app.utils.metrics import metrics
+from app.utils.profiling import request_profiler
+from app.utils.query_stats import query_budget
 
 class GupshupService:
     def __init__(self, gupshup_repository: GupshupRepository, 
@@ -39,70 +45,89 @@ class GupshupService:
         # Inicializar servicio de envío Gupshup PRIMERO
         self.gupshup_sender = GupshupSenderService(accounts_repository)
         
-        # Inicializar LangChain Service avanzado con repositorios
-        self.langchain_service = AdvancedLangChainService(
-            message_repository, products_repository, accounts_repository, account_prompts_repository
+        # LangChain Service avanzado: se importa y construye recién en el primer uso
+        self.langchain_service = LazyLangChainService(
+            message_repository, products_repository, accounts_repository, account_prompts_repository,
+            session_data_repository
         )
         
         # Inicializar Handler Service para el sistema de menús
         self.handler_service = HandlerService(
             simple_answer_repository, text_chatbot_repository, session_data_repository,
             self.gupshup_sender,  # Pasar sender para envío inmediato
-            message_repository    # Pasar message_repo para guardar mensajes recursivos
+            message_repository,   # Pasar message_repo para guardar mensajes recursivos
+            self.langchain_service  # Reutilizar LangChain para ChatGptHandler
         )
     
     def process_webhook(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Procesa el webhook de Gupshup con lógica completa de mensaje y sesión"""
+        """
+        Procesa el webhook de Gupshup con todos sus eventos: un solo registro en
+        gupshup_log, status agrupados por message_id y mensajes de usuario en
+        orden dentro de cada conversación.
+        """
         try:
             print(f"🎯 WEBHOOK: Payload completo recibido: {payload}")
             
-            # 1. Extraer datos del payload
-            webhook_data = self._extract_payload_data(payload)
+            # 1. Extraer todos los eventos del payload (entries / changes / messages / statuses)
+            events = extract_webhook_events(payload)
+            webhook_data = events[0] if events else WebhookData(raw_payload=payload)
+            status_updates = group_status_updates(events)
+            conversations = group_conversations(events)
             
-            print(f"📋 WEBHOOK: Datos extraídos:")
-            print(f"  - from_uid: {webhook_data.from_uid}")
-            print(f"  - display_phone_number: {webhook_data.display_phone_number}")
-            print(f"  - message_body: {webhook_data.message_body}")
-            print(f"  - message_type: {webhook_data.message_type}")
-            print(f"  - is_user_message: {webhook_data.is_user_message}")
-            print(f"  - is_text_message: {webhook_data.is_text_message()}")
+            print(f"📋 WEBHOOK: {len(events)} eventos - {sum(len(c) for c in conversations.values())} mensajes "
+                  f"en {len(conversations)} conversaciones, {len(status_updates)} status")
+            metrics.increment("webhook.events", len(events))
             
-            # 2. Guardar en gupshup_log siempre
+            # 2. Guardar en gupshup_log siempre (una fila por payload)
             log_result = self.gupshup_repo.save_log(
-                event=json.dumps(payload),
+                event=payload,
                 message_id=webhook_data.message_id,
                 from_uid=webhook_data.display_phone_number or webhook_data.from_uid,
-                type=webhook_data.message_type,
+                type=webhook_data.message_type if len(events) <= 1 else "batch",
                 app_id=webhook_data.app_id,
                 channel="whatsapp"
             )
             
-            # 3. Si es mensaje de texto o interactivo del usuario, procesar mensaje
-            if webhook_data.is_text_message():
-                print(f"✅ WEBHOOK: Es mensaje de tipo '{webhook_data.message_type}' - procesando...")
-                session_result = self._process_user_message(webhook_data)
-                return {
-                    "success": True,
-                    "log_id": log_result.id,
-                    "message_id": session_result.get("message_id"),
-                    "session_id": session_result.get("session_id"),
-                    "is_user_message": True,
-                    "webhook_data": webhook_data
-                }
+            # 3. Mensajes de texto o interactivos del usuario, en orden por conversación
+            results = []
+            for (display_phone_number, client_uid), messages in conversations.items():
+                for message_data in messages:
+                    if not message_data.is_text_message():
+                        print(f"⚠️ WEBHOOK: NO es mensaje procesable - tipo: {message_data.message_type}")
+                        continue
+                    print(f"✅ WEBHOOK: Mensaje '{message_data.message_type}' de {client_uid} para {display_phone_number} - procesando...")
+                    try:
+                        session_result = self._process_user_message(message_data)
+                    except Exception as e:
+                        # Un mensaje con error no debe impedir procesar el resto del lote
+                        print(f"❌ WEBHOOK: Error procesando mensaje {message_data.message_id}: {str(e)}")
+                        session_result = {"success": False, "error": str(e)}
+                    results.append(session_result)
             
-            # 4. Para otros tipos (status, etc.) solo retornar log
-            print(f"⚠️ WEBHOOK: NO es mensaje procesable - tipo: {webhook_data.message_type}, is_user: {webhook_data.is_user_message}")
+            # Status de entrega: a la ingesta en lotes (tbl_message_status); el pipeline
+            # recibe todos para conservar el timestamp de cada etapa
+            if status_updates:
+                status_pipeline.add(events)
+            
+            # 4. Respuesta: datos del primer mensaje procesado (o solo el log)
+            first_result = results[0] if results else {}
             return {
                 "success": True,
                 "log_id": log_result.id,
-                "is_user_message": webhook_data.is_user_message,
-                "webhook_data": webhook_data
+                "message_id": first_result.get("message_id"),
+                "session_id": first_result.get("session_id"),
+                "is_user_message": bool(results) or webhook_data.is_user_message,
+                "webhook_data": webhook_data,
+                "events": len(events),
+                "messages_processed": len(results),
+                "status_updates": len(status_updates),
+                "results": results
             }
             
         except Exception as e:
             # En caso de error, guardar el payload completo
             error_log = self.gupshup_repo.save_log(
-                event=json.dumps(payload),
+                event=payload,
                 type="error",
                 channel="webhook_error"
             )
@@ -113,71 +138,9 @@ class GupshupService:
                 "log_id": error_log.id
             }
     
-    def _extract_payload_data(self, payload: Dict[str, Any]) -> WebhookData:
-        """Extrae datos del payload y los organiza en WebhookData"""
-        webhook_data = WebhookData(raw_payload=payload)
-        
-        try:
-            # Navegar por la estructura del payload como en Java
-            entry = payload.get("entry", [])
-            
-            if entry and len(entry) > 0:
-                first_entry = entry[0]
-                changes = first_entry.get("changes", [])
-                
-                if changes and len(changes) > 0:
-                    first_change = changes[0]
-                    value = first_change.get("value", {})
-                    
-                    if value:
-                        messages = value.get("messages", [])
-                        statuses = value.get("statuses", [])
-                        
-                        # Extraer metadata
-                        metadata = value.get("metadata", {})
-                        if metadata:
-                            webhook_data.display_phone_number = metadata.get("display_phone_number")
-                            webhook_data.app_id = metadata.get("phone_number_id")
-                        
-                        # Procesar mensajes de usuario
-                        if messages and len(messages) > 0 and not statuses:
-                            webhook_data.is_user_message = True
-                            first_message = messages[0]
-                            
-                            webhook_data.from_uid = first_message.get("from")
-                            webhook_data.message_id = first_message.get("id")
-                            webhook_data.message_type = first_message.get("type")
-                            
-                            # Extraer contenido del mensaje
-                            if webhook_data.message_type == "text":
-                                text_content = first_message.get("text", {})
-                                webhook_data.message_body = text_content.get("body")
-                            elif webhook_data.message_type == "interactive":
-                                # Extraer contenido de mensaje interactivo (botones)
-                                interactive_content = first_message.get("interactive", {})
-                                if interactive_content.get("type") == "button_reply":
-                                    button_reply = interactive_content.get("button_reply", {})
-                                    webhook_data.message_body = button_reply.get("title", "")
-                                elif interactive_content.get("type") == "list_reply":
-                                    list_reply = interactive_content.get("list_reply", {})
-                                    webhook_data.message_body = list_reply.get("title", "")
-                        
-                        # Procesar status updates
-                        elif statuses and len(statuses) > 0:
-                            webhook_data.is_status_update = True
-                            first_status = statuses[0]
-                            
-                            webhook_data.message_id = first_status.get("id")
-                            webhook_data.from_uid = first_status.get("recipient_id")
-                            webhook_data.message_type = "status"
-                            
-        except Exception as e:
-            print(f"Error extracting payload data: {e}")
-            
-        return webhook_data
-    
     def _process_user_message(self, webhook_data: WebhookData) -> Dict[str, Any]:
         """Procesa mensaje de usuario: obtiene/crea sesión y guarda mensaje"""
+        started_at = time.perf_counter()
         try:
             # 1. Obtener o crear session_id - equivale a obtenerOCrearSessionId
             session_id = self._get_or_create_session_id(
@@ -186,7 +149,7 @@ class GupshupService:
             )
             
             # 2. Buscar cuenta y estrategia de procesamiento
-            account = self.accounts_repo.find_by_from_uid(webhook_data.display_phone_number)
+            account = self.accounts_repo.get_snapshot_by_from_uid(webhook_data.display_phone_number)
             if not account:
                 return {
                     "success": False,
@@ -195,6 +158,7 @@ class GupshupService:
             
             account_id = account.account_id
             processing_strategy = account.processing_strategy
+            request_profiler.tag(account_id=account_id, session_id=session_id)
             
             print(f"🎯 ESTRATEGIA DE PROCESAMIENTO: {processing_strategy} para account: {account_id}")
             print(f"📱 FROM_UID: {webhook_data.display_phone_number}")
@@ -215,27 +179,32 @@ class GupshupService:
             )
             
             # 4. DECISIÓN POR ESTRATEGIA DE PROCESAMIENTO 🎯
-            if processing_strategy == "langchain":
+            if processing_strategy == "langchain" and not AI_STACK_ENABLED:
+                print(f"❌ Cuenta {account_id} con estrategia langchain en un worker sin IA (AI_STACK_ENABLED=false)")
+                return {
+                    "success": False,
+                    "error": "AI stack disabled in this worker"
+                }
+            
+            elif processing_strategy == "langchain":
                 # 🔴 SISTEMA LANGCHAIN (Coolbox y cuentas con IA)
                 print("🤖 Usando LANGCHAIN para procesamiento con IA")
-                ai_response = self.langchain_service.process_message(
-                    session_id=session_id,
-                    user_message=webhook_data.message_body,
-                    from_uid=webhook_data.display_phone_number
-                )
+                ai_response = self._process_with_langchain(webhook_data, account_id, session_id, started_at)
                 print(f"🤖 LANGCHAIN: Resultado - success: {ai_response.get('success')}, message: '{ai_response.get('message', '')[:100]}...'")
                 
             elif processing_strategy == "handlers":
                 # 🟡 SISTEMA HANDLERS PURO (Sin IA - Lógica determinista)
                 print("🎭 Usando HANDLERS puros (lógica determinista)")
                 
-                ai_response = self.handler_service.process_message(
-                    from_uid=webhook_data.display_phone_number,
-                    client_uid=webhook_data.from_uid,
-                    message=webhook_data.message_body,
-                    account_id=account_id,
-                    session_id=session_id
-                )
+                # Presupuesto de queries por turno de menú (DB_QUERY_BUDGET_PER_TURN, 0 = solo cuenta)
+                with query_budget(label=f"turno handlers {account_id}"):
+                    ai_response = self.handler_service.process_message(
+                        from_uid=webhook_data.display_phone_number,
+                        client_uid=webhook_data.from_uid,
+                        message=webhook_data.message_body,
+                        account_id=account_id,
+                        session_id=session_id
+                    )
                 
             else:
                 # ❌ ESTRATEGIA NO SOPORTADA
@@ -245,6 +214,13 @@ class GupshupService:
                     "error": f"Processing strategy '{processing_strategy}' not supported"
                 }
             
+            # Compactar el historial de la sesión si el Agent participó (la respuesta ya salió)
+            if self.langchain_service.loaded:
+                try:
+                    self.langchain_service.refresh_conversation_summary(session_id, webhook_data.display_phone_number)
+                except Exception as e:
+                    print(f"⚠️ No se pudo actualizar el resumen de la sesión: {e}")
+            
             # 5. LOS MENSAJES YA SE ENVIARON DURANTE LA RECURSION ✅
             if ai_response["success"]:
                 messages_sent = ai_response.get("messages_sent", 0)
@@ -290,6 +266,95 @@ class GupshupService:
                 "error": str(e)
             }
     
+    def _process_with_langchain(self, webhook_data: WebhookData, account_id: str,
+                                session_id: int, started_at: float) -> Dict[str, Any]:
+        """
+        Genera la respuesta con el Agent y la envía al cliente.
+        Con LLM_STREAMING_ENABLED los párrafos salen a medida que se generan;
+        si no, se envía la respuesta completa al final.
+        """
+        from app.services.streaming_reply import LLM_STREAMING_ENABLED, StreamingReplyCallback
+        
+        reply_stream = None
+        if LLM_STREAMING_ENABLED:
+            # Credenciales leídas aquí: el acuse sale desde el hilo del temporizador
+            # y no debe usar la sesión de BD del request
+            account = self.accounts_repo.get_snapshot_by_from_uid(webhook_data.display_phone_number)
+            reply_stream = StreamingReplyCallback(
+                deliver=lambda chunk: self._deliver_ai_reply(chunk, webhook_data, account_id, session_id),
+                send_ack=lambda text: self.gupshup_sender.send_text_message(
+                    to=webhook_data.from_uid,
+                    message=text,
+                    display_phone_number=webhook_data.display_phone_number,
+                    account=account
+                ),
+                record_ack=lambda result: self._record_ack(result, reply_stream.ack_message,
+                                                           webhook_data, account_id, session_id),
+                started_at=started_at
+            )
+        
+        ai_response = self.langchain_service.process_message(
+            session_id=session_id,
+            user_message=webhook_data.message_body,
+            from_uid=webhook_data.display_phone_number,
+            reply_stream=reply_stream
+        )
+        
+        if ai_response.get("success"):
+            streamed_chunks = ai_response.get("streamed_chunks") or []
+            if streamed_chunks:
+                ai_response["messages_sent"] = len(streamed_chunks)
+            elif ai_response.get("message"):
+                # Respuesta completa (sin streaming o desde caché)
+                self._deliver_ai_reply(ai_response["message"], webhook_data, account_id, session_id)
+                if reply_stream is None or reply_stream.first_reply_at is None:
+                    metrics.observe("llm.time_to_first_reply", time.perf_counter() - started_at)
+                ai_response["messages_sent"] = 1
+        elif ai_response.get("overloaded"):
+            # Pool de LLM saturado: avisar al cliente en vez de quedar en silencio
+            self._deliver_ai_reply(ai_response["message"], webhook_data, account_id, session_id)
+            ai_response["messages_sent"] = 1
+        
+        metrics.observe("llm.total_reply", time.perf_counter() - started_at)
+        return ai_response
+    
+    def _deliver_ai_reply(self, message: str, webhook_data: WebhookData,
+                          account_id: str, session_id: int) -> Dict[str, Any]:
+        """Envía un mensaje del Agent al cliente y lo guarda en tbl_message"""
+        send_result = self._send_smart_message(
+            to=webhook_data.from_uid,
+            message_content=message,
+            display_phone_number=webhook_data.display_phone_number
+        )
+        
+        if not send_result.get("success"):
+            print(f"❌ GUPSHUP: Error enviando respuesta del Agent: {send_result.get('error')}")
+            return send_result
+        
+        self._save_bot_message(message, send_result, webhook_data, account_id, session_id)
+        return send_result
+    
+    def _record_ack(self, send_result: Optional[Dict[str, Any]], message: str, webhook_data: WebhookData,
+                    account_id: str, session_id: int) -> None:
+        """Guarda en tbl_message el acuse de recibo si Gupshup lo aceptó"""
+        if send_result and send_result.get("success"):
+            self._save_bot_message(message, send_result, webhook_data, account_id, session_id)
+    
+    def _save_bot_message(self, message: str, send_result: Dict[str, Any], webhook_data: WebhookData,
+                          account_id: str, session_id: int) -> None:
+        """Guarda en tbl_message un mensaje del bot ya enviado al cliente"""
+        self.message_repo.save_message(
+            from_uid=webhook_data.display_phone_number,
+            client_uid=webhook_data.from_uid,
+            message_body=message,
+            account_id=account_id,
+            session_id=session_id,
+            message_id=send_result.get("message_id"),
+            message_channel=0,
+            message_direction=1,  # Respuesta del bot
+            message_type=1
+        )
+    
     def _get_or_create_session_id(self, client_uid: str, from_uid: str) -> int:
         """Obtiene o crea session_id - equivale a obtenerOCrearSessionId en Java"""
         try:
@@ -328,7 +393,6 @@ class GupshupService:
         """
         try:
             # Intentar parsear como JSON
-            import json
             flow_data = json.loads(message_content)
             
             # 🌊 DETECTAR FLOW (tiene id y token)
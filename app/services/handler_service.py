@@ -7,6 +7,8 @@ from app.handlers.dummy_handler import DummyHandler
 from app.repositories.simple_answer_repository import SimpleAnswerRepository
 from app.repositories.text_chatbot_repository import TextChatbotRepository
 from app.repositories.session_data_repository import SessionDataRepository
+from app.services.ai_stack import AI_STACK_ENABLED, AIStackDisabled, LazyLangChainService
+from app.cluster.session_lock import SessionLockTimeout, session_lock
 
 class HandlerService:
     """
@@ -19,13 +21,15 @@ class HandlerService:
                  text_chatbot_repository: TextChatbotRepository, 
                  session_data_repository: SessionDataRepository,
                  gupshup_sender_service=None,
-                 message_repository=None):
+                 message_repository=None,
+                 langchain_service=None):
         
         self.simple_answer_repo = simple_answer_repository
         self.text_chatbot_repo = text_chatbot_repository
         self.session_data_repo = session_data_repository
         self.gupshup_sender = gupshup_sender_service
         self.message_repo = message_repository
+        self.langchain_service = langchain_service
         
         # Inicializar registry y registrar handlers
         self.handler_registry = HandlerRegistry()
@@ -55,32 +59,28 @@ class HandlerService:
         ask_handler = DbAskHandler(self.simple_answer_repo)
         self.handler_registry.register(ask_handler)
         
-        # Registrar ChatGptHandler (IA integrada) - REQUIERE LangChain service
+        # Registrar ChatGptHandler (IA integrada) - REQUIERE LangChain service (se carga en el primer uso)
         try:
-            from app.services.langchain_service import AdvancedLangChainService
-            from app.repositories.message_repository import MessageRepository
-            from app.repositories.products_repository import ProductsRepository
-            from app.repositories.accounts_repository import AccountsRepository
-            from app.repositories.account_prompts_repository import AccountPromptsRepository
-            from app.config.database import SessionLocal
-            
-            # Crear dependencias para LangChain (temporal)
-            db_session = SessionLocal()
-            try:
-                message_repo = MessageRepository(db_session)
-                products_repo = ProductsRepository(db_session)
-                accounts_repo = AccountsRepository(db_session)
-                prompts_repo = AccountPromptsRepository(db_session)
+            if not AI_STACK_ENABLED:
+                raise AIStackDisabled("AI_STACK_ENABLED=false")
+            
+            langchain_service = self.langchain_service
+            if langchain_service is None:
+                from app.repositories.message_repository import MessageRepository
+                from app.repositories.products_repository import ProductsRepository
+                from app.repositories.accounts_repository import AccountsRepository
+                from app.repositories.account_prompts_repository import AccountPromptsRepository
                 
-                langchain_service = AdvancedLangChainService(
-                    message_repo, products_repo, accounts_repo, prompts_repo
+                # Reutilizar la sesión del request (no abrir conexiones extra)
+                db_session = self.simple_answer_repo.db
+                langchain_service = LazyLangChainService(
+                    MessageRepository(db_session), ProductsRepository(db_session),
+                    AccountsRepository(db_session), AccountPromptsRepository(db_session),
+                    self.session_data_repo
                 )
-                
-                chatgpt_handler = ChatGptHandler(self.simple_answer_repo, langchain_service)
-                self.handler_registry.register(chatgpt_handler)
-                
-            finally:
-                db_session.close()
+            
+            chatgpt_handler = ChatGptHandler(self.simple_answer_repo, langchain_service)
+            self.handler_registry.register(chatgpt_handler)
                 
         except Exception as e:
             print(f"⚠️ No se pudo registrar ChatGptHandler: {e}")
@@ -92,17 +92,12 @@ class HandlerService:
         # Registrar DummyHandler (transferencias a agentes)
         try:
             from app.repositories.transfered_chat_repository import TransferedChatRepository
-            from app.config.database import SessionLocal
-            
-            # Crear repositorio temporal para transferencias
-            db_session = SessionLocal()
-            try:
-                transfered_chat_repo = TransferedChatRepository(db_session)
-                dummy_handler = DummyHandler(self.simple_answer_repo, transfered_chat_repo)
-                self.handler_registry.register(dummy_handler)
-                print(f"✅ Handler registrado: DummyHandler (con transferencias)")
-            finally:
-                db_session.close()
+            
+            # Repositorio de transferencias sobre la misma sesión del request
+            transfered_chat_repo = TransferedChatRepository(self.simple_answer_repo.db)
+            dummy_handler = DummyHandler(self.simple_answer_repo, transfered_chat_repo)
+            self.handler_registry.register(dummy_handler)
+            print(f"✅ Handler registrado: DummyHandler (con transferencias)")
                 
         except Exception as e:
             print(f"⚠️ DummyHandler sin transferencias: {e}")
@@ -117,7 +112,21 @@ class HandlerService:
         """
         Procesa un mensaje usando el sistema de handlers.
         Equivale al flujo completo de HelloHandler.doRequest() en tenet.
+        Toma el lease de la sesión: un solo turno por conversación a la vez.
         """
+        try:
+            with session_lock.hold(session_id, label=f"handlers {account_id}"):
+                return self._process_message(from_uid, client_uid, message, account_id, session_id)
+        except SessionLockTimeout as e:
+            return {
+                "success": False,
+                "message": "",
+                "error": str(e),
+                "session_busy": True
+            }
+    
+    def _process_message(self, from_uid: str, client_uid: str, message: str,
+                         account_id: str, session_id: int) -> Dict[str, Any]:
         try:
             print(f"🚀 HandlerService: Procesando mensaje de {client_uid} para account {account_id}")
             
@@ -366,7 +375,7 @@ class HandlerService:
         Busca por from_uid sin importar el canal.
         """
         # Buscar cualquier configuración para este from_uid (sin filtrar por canal)
-        configs = self.text_chatbot_repo.find_by_from_uid(from_uid)
+        configs = self.text_chatbot_repo.get_snapshots_by_from_uid(from_uid)
         if configs:
             initial_path = configs[0].initial_path  # Tomar el primero
             print(f"🔍 Path inicial para {from_uid}: {initial_path}")
@@ -495,25 +504,21 @@ class HandlerService:
             # Basado en la documentación de WhatsApp Business API
             
             # Obtener credenciales y token (similar a otros métodos)
-            account = self.gupshup_sender.accounts_repo.find_by_from_uid(from_uid)
+            account = self.gupshup_sender.accounts_repo.get_snapshot_by_from_uid(from_uid)
             if not account:
                 return {"success": False, "error": "Account not found"}
             
-            # Login y token (reutilizar lógica existente)
-            login_result = self.gupshup_sender.get_login_partner(account.gs_user, account.gs_password)
-            if not login_result["success"]:
-                return login_result
-            
-            token_result = self.gupshup_sender.get_token_app(login_result["login_response"]["token"], account.appid)
+            # Token de app (cacheado en el sender)
+            token_result = self.gupshup_sender.get_app_token(account)
             if not token_result["success"]:
                 return token_result
             
-            app_token = token_result["token_response"]["token"]["token"]
+            app_token = token_result["token"]
             
             # Construir payload para botones interactivos
-            import requests
+            from app.services.gupshup_sender_service import gupshup_http
             
-            url = f"https://partner.gupshup.io/partner/app/{account.appid}/v3/message"
+            url = f"{self.gupshup_sender.api_base_url}/app/{account.appid}/v3/message"
             headers = {
                 "Authorization": app_token,
                 "Content-Type": "application/json"
@@ -554,7 +559,8 @@ class HandlerService:
             
             print(f"🎁 BUTTONS: Payload: {payload}")
             
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
+            response = gupshup_http.post(url, headers=headers, json=payload, timeout=15)
+            self.gupshup_sender.forget_app_token_on_unauthorized(response, account.appid)
             
             if response.status_code == 200:
                 response_data = response.json()
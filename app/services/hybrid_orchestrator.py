@@ -2,6 +2,10 @@
 from typing import Dict, Any, Optional
 from app.services.langchain_service import AdvancedLangChainService
 from app.services.handler_service import HandlerService
+from app.routing.rule_classifier import RuleBasedClassifier
+from app.routing.intent_model import IntentModelClassifier
+from app.services.llm_pool import llm_pool, LLMRejected
+from app.utils.metrics import metrics
 import json
 
 class HybridOrchestrator:
@@ -10,11 +14,16 @@ class HybridOrchestrator:
     
     LangChain actúa como "director de orquesta" analizando mensajes del usuario
     y decidiendo qué handler ejecutar y cómo (requestAction vs processMessage).
+    Antes del LLM, un clasificador por reglas resuelve los turnos deterministas
+    (opciones de menú, números, 'menú'/'inicio') y luego el modelo de intención
+    local de la cuenta; solo los mensajes ambiguos llegan al LLM.
     """
     
     def __init__(self, langchain_service: AdvancedLangChainService, handler_service: HandlerService):
         self.langchain = langchain_service
         self.handlers = handler_service
+        self.rule_classifier = RuleBasedClassifier(handler_service.simple_answer_repo)
+        self.intent_classifier = IntentModelClassifier(handler_service.simple_answer_repo)
     
     def process_message(self, from_uid: str, client_uid: str, message: str, 
                        account_id: str, session_id: int) -> Dict[str, Any]:
@@ -27,22 +36,35 @@ class HybridOrchestrator:
             # 1. Obtener contexto de la sesión
             session_context = self._get_session_context(str(session_id))
             
-            # 2. Crear prompt para LangChain Analyzer
-            analyzer_prompt = self._build_analyzer_prompt(
-                message, session_context, account_id
-            )
-            
-            # 3. LangChain decide la estrategia
-            strategy_response = self._get_strategy_from_langchain(analyzer_prompt, from_uid, session_id)
-            
-            if not strategy_response.get("success"):
-                return {"success": False, "message": "Error en análisis de estrategia"}
+            # 2. Reglas y modelo local: si hay certeza no se consulta al LLM
+            strategy = self.rule_classifier.classify(message, session_context, account_id)
+            if strategy is None:
+                strategy = self.intent_classifier.classify(message, session_context, account_id)
             
-            strategy = strategy_response.get("strategy", {})
+            if strategy is not None:
+                metrics.increment(f"routing.{strategy['source']}.resolved")
+                print(f"⚡ ESTRATEGIA LOCAL ({strategy['source']}, confianza {strategy['confidence']})")
+            else:
+                metrics.increment("routing.llm.escalated")
+                
+                # 3. Crear prompt para LangChain Analyzer
+                analyzer_prompt = self._build_analyzer_prompt(
+                    message, session_context, account_id
+                )
+                
+                # 4. LangChain decide la estrategia
+                strategy_response = self._get_strategy_from_langchain(analyzer_prompt, from_uid, session_id)
+                
+                if strategy_response.get("overloaded"):
+                    strategy = self._fallback_strategy(session_context)
+                elif not strategy_response.get("success"):
+                    return {"success": False, "message": "Error en análisis de estrategia"}
+                else:
+                    strategy = strategy_response.get("strategy", {})
             
             print(f"🎯 ESTRATEGIA DECIDIDA: {strategy}")
             
-            # 4. Ejecutar la estrategia decidida
+            # 5. Ejecutar la estrategia decidida
             return self._execute_strategy(strategy, from_uid, client_uid, message, 
                                         account_id, session_id, session_context)
             
@@ -111,7 +133,10 @@ RESPONDE SOLO EL JSON, SIN TEXTO ADICIONAL.
         """
         try:
             # Usar el servicio LangChain existente pero con prompt personalizado
-            ai_response = self.langchain.llm.invoke(prompt)
+            ai_response = llm_pool.run(
+                self.langchain._pool_key(from_uid),
+                lambda: self.langchain.llm.invoke(prompt)
+            )
             
             # Parsear la respuesta JSON (manejar markdown)
             try:
@@ -143,6 +168,13 @@ RESPONDE SOLO EL JSON, SIN TEXTO ADICIONAL.
                     "error": f"JSON parsing error: {str(e)}"
                 }
                 
+        except LLMRejected as e:
+            return {
+                "success": False,
+                "overloaded": True,
+                "error": e.reason
+            }
+            
         except Exception as e:
             print(f"❌ Error consultando LangChain para estrategia: {str(e)}")
             return {
@@ -150,6 +182,24 @@ RESPONDE SOLO EL JSON, SIN TEXTO ADICIONAL.
                 "error": str(e)
             }
     
+    def _fallback_strategy(self, session_context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Estrategia sin LLM cuando el pool está saturado: el handler del path
+        actual procesa el mensaje (o se muestra el menú inicial).
+        """
+        current_path = session_context.get("current_path", "")
+        metrics.increment("routing.llm.shed")
+        if not current_path:
+            return {"action": "REQUEST_ACTION", "handler": None, "reasoning": "LLM saturado, menú inicial",
+                    "confidence": 0.0, "source": "fallback"}
+        return {
+            "action": "PROCESS_MESSAGE",
+            "handler": current_path.strip("/").split("/")[0] or "DbAnswerHandler",
+            "reasoning": "LLM saturado, se procesa con el handler actual",
+            "confidence": 0.0,
+            "source": "fallback"
+        }
+    
     def _execute_strategy(self, strategy: Dict[str, Any], from_uid: str, client_uid: str, 
                          message: str, account_id: str, session_id: int, 
                          session_context: Dict[str, Any]) -> Dict[str, Any]:
@@ -157,18 +207,26 @@ RESPONDE SOLO EL JSON, SIN TEXTO ADICIONAL.
         Ejecuta la estrategia decidida por LangChain.
         """
         action = strategy.get("action")
-        handler_name = strategy.get("handler", "DbAnswerHandler")
+        handler_name = strategy.get("handler") or "DbAnswerHandler"
         reasoning = strategy.get("reasoning", "No reasoning provided")
+        # Las reglas pueden normalizar la opción ('Opción 2' -> '2')
+        message = strategy.get("message", message)
         
         print(f"🚀 EJECUTANDO: {action} con {handler_name}")
         print(f"💭 RAZÓN: {reasoning}")
         
         if action == "REQUEST_ACTION":
+            # 'menú'/'inicio': volver al path inicial
+            if strategy.get("reset_path"):
+                session_context["current_path"] = ""
+            
             # Si es primera interacción, configurar current_path inicial
             if not session_context.get("current_path"):
                 initial_path = self.handlers._get_initial_path(from_uid)
                 if initial_path:
                     session_context["current_path"] = initial_path
+                    if not strategy.get("handler"):
+                        handler_name = initial_path.strip("/").split("/")[0] or handler_name
                     print(f"🎯 Path inicial configurado en HybridOrchestrator: {initial_path}")
                 else:
                     print(f"❌ No se pudo obtener path inicial para {from_uid}")
@@ -1,54 +1,44 @@
 # app/services/langchain_service.py
 import os
 import json
-from typing import Dict, Any, List
+import threading
+import time
+from typing import Dict, Any, List, Optional
 from langchain.chat_models import ChatOpenAI
 from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain.memory import ConversationBufferWindowMemory
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from app.repositories.message_repository import MessageRepository
 from app.repositories.products_repository import ProductsRepository
 from app.repositories.accounts_repository import AccountsRepository
 from app.repositories.account_prompts_repository import AccountPromptsRepository
+from app.repositories.session_data_repository import SessionDataRepository
 from app.services.prompt_service import PromptService
-from app.tools.productos_tools import create_producto_tools
+from app.tools.productos_tools import buscar_productos, create_producto_tools
+from app.cache.agent_cache import agent_cache, agent_cache_key
+from app.cache.response_cache import (
+    LLM_RESPONSE_CACHE_ENABLED, llm_response_cache, normalize_message,
+    detect_cacheable_intent, build_cache_key
+)
+from app.services.context_assembler import TokenBudgetMemory, LLM_HISTORY_LOAD_LIMIT, cap_account_prompt
+from app.services.conversation_summary import (
+    LLM_SUMMARY_ENABLED, LLM_SUMMARY_REFRESH_TURNS, LLM_SUMMARY_KEEP_MESSAGES, LLM_SUMMARY_FOLD_BATCH,
+    ConversationSummary, conversation_summarizer
+)
+from app.services.llm_pool import llm_pool, LLMRejected
+from app.cluster.session_lock import SessionLockTimeout, session_lock
+from app.services.streaming_reply import LLM_STREAMING_ENABLED, StreamingReplyCallback
+from app.utils.metrics import metrics
 import logging
 import httpx
 
-class AdvancedLangChainService:
-    def __init__(self, message_repository: MessageRepository, products_repository: ProductsRepository, 
-                 accounts_repository: AccountsRepository, account_prompts_repository: AccountPromptsRepository):
-        self.message_repo = message_repository
-        self.products_repo = products_repository
-        self.prompt_service = PromptService(accounts_repository, account_prompts_repository)
-        
-        # 1. Inicializar LLM (ChatOpenAI)
-        self.llm = ChatOpenAI(
-            openai_api_key=os.getenv('OPENAI_API_KEY'),
-            model="gpt-4o",
-            temperature=0.3
-        )
-        
-        # 2. Crear Tools avanzadas para el Agent
-        self.tools = create_producto_tools(products_repository)
-        
-        # 3. Configurar Memory para mantener contexto
-        self.memory = ConversationBufferWindowMemory(
-            k=10,  # Mantener últimos 10 intercambios
-            memory_key="chat_history",
-            return_messages=True
-        )
-        
-        # 4. System prompt del .env
-        self.system_prompt = os.getenv('SYSTEM_PROMPT', '')
-        
-        # 5. Crear Agent con Tools
-        self.agent_executor = self._create_agent()
-    
-    def _create_agent(self) -> AgentExecutor:
-        """Crea el Agent con Tools y Memory"""
-        # Prompt con instrucciones DIRECTAS y ESTRICTAS
-        system_instructions = """
+# Respuesta cuando el pool de LLM está saturado y el mensaje no alcanzaría su deadline
+LLM_OVERLOAD_MESSAGE = os.getenv(
+    'LLM_OVERLOAD_MESSAGE',
+    'Estamos recibiendo muchas consultas en este momento 🙏 Por favor escríbenos de nuevo en unos minutos.'
+)
+
+# Prompt con instrucciones DIRECTAS y ESTRICTAS (cuando la cuenta no tiene prompt propio)
+DEFAULT_AGENT_INSTRUCTIONS = """
 Soy AVI de Coolbox! 😊 Soy super amigable y conversacional.
 
 🚨 REGLAS ESTRICTAS QUE DEBES SEGUIR:
@@ -74,65 +64,119 @@ Soy AVI de Coolbox! 😊 Soy super amigable y conversacional.
 - Texto robótico sin emojis
 - Respuestas que no inviten a seguir hablando
 """
-        
+
+_llm_lock = threading.Lock()
+_shared_llm: Optional[ChatOpenAI] = None
+
+
+def get_shared_llm() -> ChatOpenAI:
+    """ChatOpenAI único por proceso: reutiliza su cliente HTTP y conexiones"""
+    global _shared_llm
+    if _shared_llm is None:
+        with _llm_lock:
+            if _shared_llm is None:
+                _shared_llm = ChatOpenAI(
+                    openai_api_key=os.getenv('OPENAI_API_KEY'),
+                    model="gpt-4o",
+                    temperature=0.3,
+                    streaming=LLM_STREAMING_ENABLED  # Tokens incrementales para StreamingReplyCallback
+                )
+    return _shared_llm
+
+
+def get_compiled_agent(system_prompt: str, tools: List):
+    """Agente (prompt + LLM con tools) cacheado por hash del system prompt"""
+    def load():
+        started = time.perf_counter()
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instructions),
+            ("system", system_prompt),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad")
         ])
+        agent = create_openai_tools_agent(llm=get_shared_llm(), tools=tools, prompt=prompt)
+        metrics.observe("agent.build", time.perf_counter() - started)
+        return agent
+    
+    return agent_cache.get_or_load(agent_cache_key(system_prompt), load)
+
+
+def prebuild_agent(system_prompt: Optional[str] = None) -> None:
+    """Compila por adelantado el agente de un prompt (warm-up)"""
+    get_compiled_agent(system_prompt or DEFAULT_AGENT_INSTRUCTIONS, [buscar_productos])
+
+
+class AdvancedLangChainService:
+    def __init__(self, message_repository: MessageRepository, products_repository: ProductsRepository, 
+                 accounts_repository: AccountsRepository, account_prompts_repository: AccountPromptsRepository,
+                 session_data_repository: Optional[SessionDataRepository] = None):
+        self.message_repo = message_repository
+        self.products_repo = products_repository
+        self.accounts_repo = accounts_repository
+        self.session_data_repo = session_data_repository  # Resumen incremental por sesión (opcional)
+        self.prompt_service = PromptService(accounts_repository, account_prompts_repository)
         
-        # Crear Agent con Tools
-        agent = create_openai_tools_agent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=prompt
-        )
+        # 1. LLM (ChatOpenAI) compartido por el proceso
+        self.llm = get_shared_llm()
         
-        # Agent Executor con Memory
-        return AgentExecutor(
-            agent=agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True,
-            handle_parsing_errors=True,
-            max_iterations=3
+        # 2. Crear Tools avanzadas para el Agent
+        self.tools = create_producto_tools(products_repository)
+        
+        # 3. Configurar Memory para mantener contexto (acotada por tokens, no por turnos)
+        self.memory = TokenBudgetMemory(
+            memory_key="chat_history",
+            output_key="output",  # Necesario al devolver intermediate_steps
+            return_messages=True
         )
+        
+        # 4. System prompt del .env
+        self.system_prompt = os.getenv('SYSTEM_PROMPT', '')
+        
+        # 5. Crear Agent con Tools
+        self.agent_executor = self._create_agent()
+    
+    def _create_agent(self) -> AgentExecutor:
+        """Crea el Agent con Tools y Memory (prompt estático)"""
+        return self._create_agent_with_prompt(DEFAULT_AGENT_INSTRUCTIONS)
     
     def _create_agent_with_prompt(self, custom_prompt: str) -> AgentExecutor:
         """Crea el Agent con un prompt personalizado desde base de datos"""
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", custom_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
-        ])
-        
-        # Crear Agent con Tools y prompt personalizado
-        agent = create_openai_tools_agent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=prompt
-        )
-        
-        # Agent Executor con Memory
+        # El agente compilado se comparte por prompt; la Memory es de este servicio
         return AgentExecutor(
-            agent=agent,
+            agent=get_compiled_agent(custom_prompt, self.tools),
             tools=self.tools,
             memory=self.memory,
             verbose=True,
             handle_parsing_errors=True,
-            max_iterations=3
+            max_iterations=3,
+            return_intermediate_steps=True  # Para saber qué tools se usaron
         )
     
-    def process_message(self, session_id: int, user_message: str, from_uid: str = None) -> Dict[str, Any]:
+    def process_message(self, session_id: int, user_message: str, from_uid: str = None,
+                        reply_stream: Optional[StreamingReplyCallback] = None) -> Dict[str, Any]:
         """
         Procesa mensaje con Agent avanzado:
         - Agent decide automáticamente qué Tools usar
         - Memory mantiene contexto automáticamente  
         - Tools se ejecutan automáticamente
         - Usa prompt dinámico basado en from_uid
+        - Con reply_stream, la respuesta se despacha por bloques mientras se genera
+          (los bloques enviados vuelven en 'streamed_chunks')
+        - Con el lease de la sesión tomado (memoria y resumen no se pisan entre réplicas)
         """
+        try:
+            with session_lock.hold(session_id, label=f"agent {from_uid}"):
+                return self._process_message(session_id, user_message, from_uid, reply_stream)
+        except SessionLockTimeout as e:
+            return {
+                "type": "session_busy",
+                "message": str(e),
+                "session_busy": True,
+                "success": False
+            }
+    
+    def _process_message(self, session_id: int, user_message: str, from_uid: Optional[str],
+                         reply_stream: Optional[StreamingReplyCallback]) -> Dict[str, Any]:
         try:
             print(f"🤖 AGENT: Procesando mensaje para sesión {session_id}")
             # 1. Cargar historial de BD a Memory (solo la primera vez)
@@ -141,31 +185,75 @@ Soy AVI de Coolbox! 😊 Soy super amigable y conversacional.
             # 2. Obtener prompt dinámico por from_uid si está disponible
             dynamic_prompt = None
             if from_uid:
-                dynamic_prompt = self.prompt_service.get_prompt_by_from_uid(from_uid)
-                if dynamic_prompt:
-                    print(f"✅ Usando prompt dinámico para from_uid: {from_uid}")
-                    # Recrear agent con nuevo prompt
-                    self.agent_executor = self._create_agent_with_prompt(dynamic_prompt)
-                else:
-                    print(f"❌ No se encontró prompt para from_uid: {from_uid}, usando prompt estático")
+                dynamic_prompt = cap_account_prompt(self.prompt_service.get_prompt_by_from_uid(from_uid))
+            
+            # 3. Turnos triviales (saludos, gracias...) se responden desde caché
+            cache_key = self._response_cache_key(dynamic_prompt, user_message, from_uid)
+            if cache_key is not None:
+                cached_output = llm_response_cache.get(cache_key)
+                if cached_output is not None:
+                    metrics.increment("llm.response_cache.hit")
+                    print(f"⚡ AGENT: Respuesta desde caché para '{user_message}'")
+                    # Mantener el turno en Memory como si lo hubiera respondido el Agent
+                    self.memory.save_context({"input": user_message}, {"output": cached_output})
+                    return {
+                        "type": "agent_response",
+                        "message": cached_output,
+                        "tools_used": [],
+                        "cached": True,
+                        "success": True
+                    }
+                metrics.increment("llm.response_cache.miss")
+            else:
+                metrics.increment("llm.response_cache.bypass")
+            
+            if dynamic_prompt:
+                print(f"✅ Usando prompt dinámico para from_uid: {from_uid}")
+                # Recrear agent con nuevo prompt
+                self.agent_executor = self._create_agent_with_prompt(dynamic_prompt)
+            elif from_uid:
+                print(f"❌ No se encontró prompt para from_uid: {from_uid}, usando prompt estático")
             
             print(f"💬 AGENT: Enviando mensaje a Agent: '{user_message}'")
             print(f"📝 SYSTEM PROMPT: {dynamic_prompt[:100] if dynamic_prompt else self.system_prompt}...")
             
-            # 3. Agent procesa mensaje (decide Tools automáticamente)
-            response = self.agent_executor.invoke({
-                "input": user_message
-            })
+            # 4. Agent procesa mensaje (decide Tools automáticamente) dentro del pool de LLM
+            if reply_stream is not None:
+                reply_stream.start()  # El acuse de recibo también cubre la espera en cola
+            try:
+                response = llm_pool.run(
+                    self._pool_key(from_uid),
+                    lambda: self._invoke_agent(user_message, reply_stream),
+                    started_at=reply_stream.started_at if reply_stream is not None else None
+                )
+            finally:
+                if reply_stream is not None:
+                    reply_stream.finish()
             
             print(f"✅ AGENT: Respuesta recibida - output: '{response.get('output', 'NO OUTPUT')}'")
             
+            tools_used = self._extract_tools_used(response)
+            # Solo se cachean respuestas que no dependieron de datos (tools)
+            if cache_key is not None and not tools_used and response.get("output"):
+                llm_response_cache.set(cache_key, response["output"])
+            
             return {
                 "type": "agent_response",
                 "message": response["output"],
-                "tools_used": self._extract_tools_used(response),
+                "tools_used": tools_used,
+                "streamed_chunks": list(reply_stream.sent_chunks) if reply_stream else [],
                 "success": True
             }
             
+        except LLMRejected as e:
+            return {
+                "type": "overloaded",
+                "message": LLM_OVERLOAD_MESSAGE,
+                "reason": e.reason,
+                "overloaded": True,
+                "success": False
+            }
+            
         except Exception as e:
             return {
                 "type": "error",
@@ -173,15 +261,64 @@ Soy AVI de Coolbox! 😊 Soy super amigable y conversacional.
                 "success": False
             }
     
+    def _invoke_agent(self, user_message: str,
+                      reply_stream: Optional[StreamingReplyCallback] = None) -> Dict[str, Any]:
+        if reply_stream is not None:
+            return self.agent_executor.invoke(
+                {"input": user_message},
+                config={"callbacks": [reply_stream]}
+            )
+        return self.agent_executor.invoke({
+            "input": user_message
+        })
+    
+    def _pool_key(self, from_uid: Optional[str]) -> str:
+        """Cuenta para el reparto justo del pool de LLM"""
+        account = self.accounts_repo.get_snapshot_by_from_uid(from_uid) if from_uid else None
+        return account.account_id if account else (from_uid or "default")
+    
+    def _response_cache_key(self, prompt: Optional[str], user_message: str,
+                            from_uid: Optional[str]) -> Optional[tuple]:
+        """
+        Clave de caché si el turno es cacheable: intención permitida por
+        LLM_CACHEABLE_INTENTS y cuenta sin opt-out (llm_cache_enabled). None si no.
+        """
+        if not LLM_RESPONSE_CACHE_ENABLED:
+            return None
+        
+        normalized = normalize_message(user_message)
+        if not detect_cacheable_intent(normalized):
+            return None
+        
+        if from_uid:
+            account = self.accounts_repo.get_snapshot_by_from_uid(from_uid)
+            if account and not account.llm_cache_enabled:
+                return None
+        
+        history = [message.content for message in self.memory.chat_memory.messages]
+        return build_cache_key(prompt or "__default__", normalized, history)
+    
     def _load_session_history(self, session_id: int):
-        """Carga historial de la BD al Memory de LangChain"""
+        """
+        Carga al Memory el resumen guardado de la sesión y los mensajes
+        posteriores a él (sin resumen, los últimos LLM_HISTORY_LOAD_LIMIT)
+        """
         try:
-            # Obtener historial de mensajes de la sesión
-            messages = self.message_repo.find_by_session_id(session_id, limit=10)
-            
             # Solo cargar si Memory está vacía (evita duplicados)
             if not hasattr(self, '_loaded_session') or self._loaded_session != session_id:
+                started = time.perf_counter()
+                summary = self._get_conversation_summary(session_id)
+                
+                # Se leen más turnos de los que caben: los antiguos van al resumen de la Memory
+                if summary.last_message_id:
+                    messages = self.message_repo.find_by_session_id_after(
+                        session_id, summary.last_message_id, limit=LLM_HISTORY_LOAD_LIMIT
+                    )
+                else:
+                    messages = self.message_repo.find_by_session_id(session_id, limit=LLM_HISTORY_LOAD_LIMIT)
+                
                 self.memory.clear()  # Limpiar memory anterior
+                self.memory.persisted_summary = summary.text
                 
                 # Cargar mensajes al Memory
                 for msg in reversed(messages):  # Orden cronológico
@@ -192,10 +329,72 @@ Soy AVI de Coolbox! 😊 Soy super amigable y conversacional.
                 
                 # Marcar como cargado en self, no en memory
                 self._loaded_session = session_id
+                self._conversation_summary = summary
+                metrics.observe("llm.history.load", time.perf_counter() - started)
                 
         except Exception as e:
             print(f"Error cargando historial: {e}")
     
+    def _get_conversation_summary(self, session_id: int) -> ConversationSummary:
+        if not LLM_SUMMARY_ENABLED or self.session_data_repo is None:
+            return ConversationSummary()
+        return ConversationSummary.from_dict(self.session_data_repo.get_conversation_summary(str(session_id)))
+    
+    def refresh_conversation_summary(self, session_id: int, from_uid: Optional[str] = None) -> bool:
+        """
+        Cada LLM_SUMMARY_REFRESH_TURNS turnos sin resumir, incorpora al resumen
+        de la sesión todo menos los últimos LLM_SUMMARY_KEEP_MESSAGES mensajes.
+        Llamar después de enviar la respuesta (no suma latencia al cliente).
+        Lee, resume y guarda con el lease de la sesión tomado.
+        """
+        if (not LLM_SUMMARY_ENABLED or self.session_data_repo is None
+                or getattr(self, '_loaded_session', None) != session_id):
+            return False
+        # Se cuenta en tbl_message (incluye la respuesta de este turno y los turnos de handlers)
+        pending_count = self.message_repo.count_by_session_id_after(
+            session_id, self._conversation_summary.last_message_id
+        )
+        if pending_count < LLM_SUMMARY_REFRESH_TURNS * 2:
+            return False
+        
+        try:
+            with session_lock.hold(session_id, label=f"summary {from_uid}"):
+                return self._refresh_conversation_summary(session_id, from_uid)
+        except SessionLockTimeout:
+            return False
+    
+    def _refresh_conversation_summary(self, session_id: int, from_uid: Optional[str]) -> bool:
+        # Otra réplica pudo haber resumido esta sesión después de cargarla: se parte del guardado
+        stored = ConversationSummary.from_dict(
+            self.session_data_repo.get_conversation_summary(str(session_id), fresh=True)
+        )
+        if stored.last_message_id > self._conversation_summary.last_message_id:
+            metrics.increment("llm.summary.reloaded")
+            self._conversation_summary = stored
+        
+        # Todos los pendientes (no solo la ventana de la Memory), del más antiguo al más nuevo
+        pending = self.message_repo.find_all_by_session_id_after(session_id, self._conversation_summary.last_message_id)
+        if len(pending) < LLM_SUMMARY_REFRESH_TURNS * 2:
+            return False
+        
+        to_fold = pending[:len(pending) - LLM_SUMMARY_KEEP_MESSAGES] if LLM_SUMMARY_KEEP_MESSAGES else pending
+        for start in range(0, len(to_fold), LLM_SUMMARY_FOLD_BATCH):
+            batch = to_fold[start:start + LLM_SUMMARY_FOLD_BATCH]
+            previous = self._conversation_summary
+            summary = ConversationSummary(
+                text=conversation_summarizer.fold(previous.text, batch, self._pool_key(from_uid)),
+                last_message_id=max(msg.id for msg in batch),
+                summarized_messages=previous.summarized_messages + len(batch)
+            )
+            # Se guarda por tanda: si una falla, lo ya resumido no se repite
+            if not self.session_data_repo.save_conversation_summary(str(session_id), summary.to_dict()):
+                return start > 0
+            self._conversation_summary = summary
+        
+        print(f"📝 AGENT: Resumen de sesión {session_id} actualizado - {len(to_fold)} mensajes incorporados")
+        metrics.increment("llm.summary.refreshed")
+        return True
+    
     def _extract_tools_used(self, response: Dict[str, Any]) -> List[str]:
         """Extrae qué tools usó el Agent (para debugging)"""
         tools_used = []
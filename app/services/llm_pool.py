@@ -0,0 +1,208 @@
+# app/services/llm_pool.py
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+from app.utils.metrics import metrics
+
+T = TypeVar("T")
+
+# Llamadas simultáneas a OpenAI en este proceso (el resto de hilos sigue atendiendo handlers)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_PER_ACCOUNT_CONCURRENCY = int(os.getenv('LLM_PER_ACCOUNT_CONCURRENCY', '2'))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '32'))
+# Tiempo total que puede esperar un mensaje (cola + ejecución estimada)
+LLM_REQUEST_DEADLINE_SECONDS = float(os.getenv('LLM_REQUEST_DEADLINE_SECONDS', '20'))
+# Peso por cuenta para el reparto justo: "coolbox:3,otra:1" (por defecto 1)
+LLM_ACCOUNT_WEIGHTS = os.getenv('LLM_ACCOUNT_WEIGHTS', '')
+
+# Latencia inicial estimada hasta tener mediciones
+INITIAL_LATENCY_ESTIMATE = 6.0
+LATENCY_EWMA_ALPHA = 0.2
+
+
+class LLMRejected(Exception):
+    """La llamada no se ejecutó: cola llena o no alcanza a terminar antes del deadline"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """'coolbox:3,otra:1' -> {'coolbox': 3.0, 'otra': 1.0}"""
+    weights = {}
+    for item in spec.split(","):
+        if ":" in item:
+            account, weight = item.rsplit(":", 1)
+            try:
+                weights[account.strip()] = max(float(weight), 0.1)
+            except ValueError:
+                print(f"⚠️ LLM_POOL: Peso inválido '{item}' en LLM_ACCOUNT_WEIGHTS")
+    return weights
+
+
+class _Ticket:
+    __slots__ = ("account", "finish_tag", "granted", "cancelled")
+
+    def __init__(self, account: str, finish_tag: float):
+        self.account = account
+        self.finish_tag = finish_tag
+        self.granted = False
+        self.cancelled = False
+
+
+class LLMExecutionPool:
+    """
+    Control de admisión para llamadas al LLM.
+
+    - Como máximo max_concurrency llamadas a la vez y per_account_limit por cuenta.
+    - Los que esperan se atienden por Weighted Fair Queuing: cada cuenta avanza su
+      'tiempo virtual' en 1/peso por llamada, así una cuenta ruidosa no acapara.
+    - Se descarta (LLMRejected) si la cola está llena o si, con la latencia
+      observada, la respuesta no llegaría antes del deadline del mensaje.
+
+    La función se ejecuta en el hilo del llamador (usa su sesión de BD), el pool
+    solo decide cuándo puede empezar.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 per_account_limit: int = LLM_PER_ACCOUNT_CONCURRENCY,
+                 max_queue: int = LLM_MAX_QUEUE,
+                 weights: Optional[Dict[str, float]] = None):
+        self.max_concurrency = max_concurrency
+        self.per_account_limit = per_account_limit
+        self.max_queue = max_queue
+        self.weights = weights or {}
+        self.latency_estimate = INITIAL_LATENCY_ESTIMATE
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._active_by_account: Dict[str, int] = {}
+        self._queue: List[Tuple[float, int, _Ticket]] = []
+        self._queued = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+
+    def run(self, account: str, fn: Callable[[], T], deadline_seconds: float = LLM_REQUEST_DEADLINE_SECONDS,
+            started_at: Optional[float] = None) -> T:
+        """
+        Ejecuta fn() cuando haya cupo. started_at (perf_counter) permite descontar
+        el tiempo que el mensaje ya lleva en proceso.
+        """
+        deadline = (started_at if started_at is not None else time.perf_counter()) + deadline_seconds
+        account = account or "default"
+        enqueued_at = time.perf_counter()
+
+        self._acquire(account, deadline)
+        metrics.observe("llm.pool.wait", time.perf_counter() - enqueued_at)
+
+        call_started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self._record_latency(time.perf_counter() - call_started)
+            self._release(account)
+
+    def _acquire(self, account: str, deadline: float) -> None:
+        with self._cond:
+            if self._can_start(account) and not self._queue:
+                self._grant(account)
+                return
+
+            if self._queued >= self.max_queue:
+                self._reject("queue_full", account)
+
+            ticket = _Ticket(account, self._next_finish_tag(account))
+            heapq.heappush(self._queue, (ticket.finish_tag, next(self._seq), ticket))
+            self._queued += 1
+            # Puede haber cupo si los que esperan están topados por su cuenta
+            self._dispatch()
+
+            # Esperar mientras todavía sea posible terminar a tiempo
+            while not ticket.granted:
+                remaining = deadline - self.latency_estimate - time.perf_counter()
+                if remaining <= 0:
+                    ticket.cancelled = True
+                    self._queued -= 1
+                    self._dispatch()
+                    self._reject("deadline", account)
+                self._cond.wait(timeout=remaining)
+
+    def _release(self, account: str) -> None:
+        with self._cond:
+            self._active -= 1
+            self._active_by_account[account] -= 1
+            if not self._active_by_account[account]:
+                del self._active_by_account[account]
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Otorga cupos libres a los tickets con menor finish tag cuya cuenta tenga cupo"""
+        skipped = []
+        while self._queue and self._active < self.max_concurrency:
+            entry = heapq.heappop(self._queue)
+            ticket = entry[2]
+            if ticket.cancelled:
+                continue
+            if not self._can_start(ticket.account):
+                skipped.append(entry)
+                continue
+            ticket.granted = True
+            self._queued -= 1
+            self._virtual_time = max(self._virtual_time, ticket.finish_tag)
+            self._grant(ticket.account)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        self._update_gauges()
+        self._cond.notify_all()
+
+    def _can_start(self, account: str) -> bool:
+        return (self._active < self.max_concurrency
+                and self._active_by_account.get(account, 0) < self.per_account_limit)
+
+    def _grant(self, account: str) -> None:
+        self._active += 1
+        self._active_by_account[account] = self._active_by_account.get(account, 0) + 1
+        self._update_gauges()
+
+    def _next_finish_tag(self, account: str) -> float:
+        start = max(self._virtual_time, self._last_finish.get(account, 0.0))
+        finish = start + 1.0 / self.weights.get(account, 1.0)
+        self._last_finish[account] = finish
+        return finish
+
+    def _record_latency(self, seconds: float) -> None:
+        metrics.observe("llm.pool.call", seconds)
+        with self._cond:
+            self.latency_estimate += LATENCY_EWMA_ALPHA * (seconds - self.latency_estimate)
+
+    def _reject(self, reason: str, account: str) -> None:
+        metrics.increment(f"llm.pool.shed.{reason}")
+        self._update_gauges()
+        print(f"🚦 LLM_POOL: Llamada descartada ({reason}) para {account} - "
+              f"activas {self._active}/{self.max_concurrency}, en cola {self._queued}")
+        raise LLMRejected(reason)
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("llm.pool.active", self._active)
+        metrics.set_gauge("llm.pool.queued", self._queued)
+        metrics.set_gauge("llm.pool.latency_estimate", round(self.latency_estimate, 3))
+
+    def status(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "per_account_limit": self.per_account_limit,
+                "active": self._active,
+                "queued": self._queued,
+                "active_by_account": dict(self._active_by_account),
+                "latency_estimate": round(self.latency_estimate, 3),
+            }
+
+
+# Pool compartido por el proceso
+llm_pool = LLMExecutionPool(weights=parse_weights(LLM_ACCOUNT_WEIGHTS))
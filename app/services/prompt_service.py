@@ -17,7 +17,7 @@ class PromptService:
         """
         try:
             # 1. Buscar cuenta por from_uid
-            account = self.accounts_repo.find_by_from_uid(from_uid)
+            account = self.accounts_repo.get_snapshot_by_from_uid(from_uid)
             if not account:
                 print(f"❌ No se encontró cuenta para from_uid: {from_uid}")
                 return None
@@ -0,0 +1,197 @@
+# app/services/status_pipeline.py
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.models.webhook_data import WebhookData
+from app.services.webhook_parser import STATUS_RANK
+from app.utils.metrics import metrics
+
+# Ingesta de status de entrega (sent / delivered / read / failed) en lotes
+STATUS_FLUSH_INTERVAL_SECONDS = float(os.getenv('STATUS_FLUSH_INTERVAL_SECONDS', '2'))
+STATUS_FLUSH_MAX_BATCH = int(os.getenv('STATUS_FLUSH_MAX_BATCH', '500'))
+STATUS_MAX_PENDING = int(os.getenv('STATUS_MAX_PENDING', '20000'))  # sobre esto se descartan status nuevos
+# Guardar además el JSON crudo de los payloads de status en tbl_gupshup_log (comportamiento anterior)
+STATUS_RAW_LOG_ENABLED = os.getenv('STATUS_RAW_LOG_ENABLED', 'false').lower() == 'true'
+
+_STATUS_TIME_FIELD = {
+    "sent": "sent_at",
+    "delivered": "delivered_at",
+    "read": "read_at",
+    "failed": "failed_at",
+}
+
+
+def _event_time(timestamp: Optional[str]) -> datetime:
+    """Timestamp epoch de Gupshup -> datetime local (como created_at en el resto de tablas)"""
+    try:
+        return datetime.fromtimestamp(int(timestamp))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return datetime.now()
+
+
+def _merge(current: Optional[Dict[str, Any]], event: WebhookData) -> Dict[str, Any]:
+    """Combina un status en el registro pendiente de su message_id"""
+    rank = STATUS_RANK.get(event.status, 0)
+    record = current or {
+        "message_id": event.message_id,
+        "from_uid": event.display_phone_number,
+        "client_uid": event.from_uid,
+        "app_id": event.app_id,
+        "status": event.status,
+        "status_rank": rank,
+        "error_code": None,
+        "sent_at": None,
+        "delivered_at": None,
+        "read_at": None,
+        "failed_at": None,
+    }
+    if rank >= record["status_rank"]:
+        record["status"] = event.status
+        record["status_rank"] = rank
+    if event.error_code:
+        record["error_code"] = event.error_code
+    time_field = _STATUS_TIME_FIELD.get(event.status)
+    if time_field and record[time_field] is None:
+        record[time_field] = _event_time(event.timestamp)
+    return record
+
+
+class StatusIngestionPipeline:
+    """
+    Camino rápido para status de entrega: se acumulan en memoria por message_id
+    (varios status del mismo mensaje quedan en un solo registro) y un hilo los
+    vuelca a tbl_message_status con un upsert por lote, en su propia sesión de BD.
+    """
+
+    def __init__(self, flush_interval: float = STATUS_FLUSH_INTERVAL_SECONDS,
+                 max_batch: int = STATUS_FLUSH_MAX_BATCH, max_pending: int = STATUS_MAX_PENDING,
+                 writer: Optional[Callable[[List[Dict[str, Any]]], int]] = None):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._writer = writer or _write_rows
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.flushed = 0
+        self.dropped = 0
+        self.last_flush_at: Optional[float] = None
+
+    def add(self, events: Iterable[WebhookData]) -> int:
+        """Encola status (ignora los que no son status); retorna cuántos se aceptaron"""
+        accepted = 0
+        with self._lock:
+            for event in events:
+                if not event.is_status_update or not event.message_id:
+                    continue
+                current = self._pending.get(event.message_id)
+                if current is None and len(self._pending) >= self.max_pending:
+                    self.dropped += 1
+                    metrics.increment("status_pipeline.dropped")
+                    continue
+                self._pending[event.message_id] = _merge(current, event)
+                metrics.increment(f"webhook.status.{event.status or 'unknown'}")
+                accepted += 1
+            pending = len(self._pending)
+        metrics.set_gauge("status_pipeline.pending", pending)
+
+        self._ensure_thread()
+        if pending >= self.max_batch:
+            self._wakeup.set()
+        return accepted
+
+    def flush(self) -> int:
+        """Vuelca lo pendiente en lotes de max_batch; si falla, se reintenta en el próximo ciclo"""
+        with self._flush_lock:
+            with self._lock:
+                records = list(self._pending.values())
+                self._pending = {}
+
+            written = 0
+            for i in range(0, len(records), self.max_batch):
+                batch = records[i:i + self.max_batch]
+                now = datetime.now()
+                for record in batch:
+                    record["updated_at"] = now
+                started = time.perf_counter()
+                try:
+                    written += self._writer(batch)
+                except Exception as e:
+                    print(f"❌ STATUS_PIPELINE: Error guardando {len(records) - i} status: {str(e)}")
+                    metrics.increment("status_pipeline.flush_errors")
+                    self._requeue(records[i:])
+                    break
+                metrics.observe("status_pipeline.flush", time.perf_counter() - started)
+
+            if written:
+                self.flushed += written
+                self.last_flush_at = time.time()
+                metrics.increment("status_pipeline.flushed", written)
+            metrics.set_gauge("status_pipeline.pending", len(self._pending))
+            return written
+
+    def _requeue(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for record in records:
+                newer = self._pending.get(record["message_id"])
+                if newer is None:
+                    self._pending[record["message_id"]] = record
+                    continue
+                # Llegaron status nuevos mientras tanto: conservar lo más avanzado de ambos
+                if record["status_rank"] > newer["status_rank"]:
+                    newer["status"] = record["status"]
+                    newer["status_rank"] = record["status_rank"]
+                for field in ["error_code"] + list(_STATUS_TIME_FIELD.values()):
+                    if newer[field] is None:
+                        newer[field] = record[field]
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None or self._stopped:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="status-pipeline", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._pending:
+                self.flush()
+
+    def stop(self) -> None:
+        """Detiene el hilo y vuelca lo pendiente (al apagar el proceso)"""
+        self._stopped = True
+        self._wakeup.set()
+        if self._pending:
+            self.flush()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+def _write_rows(rows: List[Dict[str, Any]]) -> int:
+    from config.database import db_session_scope
+    from app.repositories.message_status_repository import MessageStatusRepository
+
+    with db_session_scope() as db:
+        return MessageStatusRepository(db).bulk_upsert(rows)
+
+
+# Pipeline compartido por el proceso
+status_pipeline = StatusIngestionPipeline()
+atexit.register(status_pipeline.stop)
@@ -0,0 +1,178 @@
+# app/services/streaming_reply.py
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from app.utils.metrics import metrics
+
+# Envío incremental de la respuesta del agente (un mensaje de WhatsApp por párrafo)
+LLM_STREAMING_ENABLED = os.getenv('LLM_STREAMING_ENABLED', 'false').lower() == 'true'
+LLM_STREAM_MIN_CHARS = int(os.getenv('LLM_STREAM_MIN_CHARS', '120'))    # párrafos más cortos se juntan
+LLM_STREAM_MAX_CHARS = int(os.getenv('LLM_STREAM_MAX_CHARS', '1000'))   # párrafos más largos se cortan por oración
+
+# Acuse de recibo si no salió nada en ese tiempo (0 = desactivado)
+LLM_ACK_AFTER_SECONDS = float(os.getenv('LLM_ACK_AFTER_SECONDS', '4'))
+LLM_ACK_MESSAGE = os.getenv('LLM_ACK_MESSAGE', 'Dame un momento, estoy revisando 🔎')
+
+_SENTENCE_END_RE = re.compile(r"[.!?…](?=\s)")
+
+
+class ParagraphChunker:
+    """
+    Acumula tokens y devuelve bloques completos listos para enviar: corta en
+    líneas en blanco, junta párrafos cortos y parte los muy largos por oración.
+    Las listas ('• ...' en líneas simples) quedan en un mismo bloque.
+    """
+
+    def __init__(self, min_chars: int = LLM_STREAM_MIN_CHARS, max_chars: int = LLM_STREAM_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._pending = ""
+
+    def feed(self, token: str) -> List[str]:
+        """Agrega un token y retorna los bloques que quedaron completos"""
+        self._buffer += token
+        chunks = []
+
+        while True:
+            boundary = self._buffer.find("\n\n")
+            if boundary == -1:
+                break
+            paragraph = self._buffer[:boundary].strip()
+            self._buffer = self._buffer[boundary + 2:]
+            if paragraph:
+                chunks.extend(self._accept(paragraph))
+
+        if len(self._buffer) > self.max_chars:
+            ends = [m.end() for m in _SENTENCE_END_RE.finditer(self._buffer, 0, self.max_chars)]
+            if ends:
+                sentence = self._buffer[:ends[-1]].strip()
+                self._buffer = self._buffer[ends[-1]:].lstrip()
+                chunks.extend(self._accept(sentence, force=True))
+
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Retorna lo que quede pendiente (fin de la generación)"""
+        text = "\n\n".join(part for part in (self._pending, self._buffer.strip()) if part)
+        self._pending = ""
+        self._buffer = ""
+        return [text] if text else []
+
+    def _accept(self, paragraph: str, force: bool = False) -> List[str]:
+        text = f"{self._pending}\n\n{paragraph}" if self._pending else paragraph
+        if force or len(text) >= self.min_chars:
+            self._pending = ""
+            return [text]
+        self._pending = text
+        return []
+
+
+class StreamingReplyCallback(BaseCallbackHandler):
+    """
+    Callback de LangChain que despacha la respuesta a medida que el LLM la genera.
+    Si en ack_after_seconds no salió ningún bloque, envía un acuse de recibo.
+    Registra llm.time_to_first_reply desde started_at (recepción del mensaje).
+
+    El acuse sale desde el hilo del temporizador, así que send_ack no debe usar
+    la sesión de BD del request; record_ack(resultado) lo registra después desde
+    el hilo del request (antes del primer bloque o al terminar, para respetar
+    el orden de los mensajes).
+    """
+
+    def __init__(self, deliver: Callable[[str], Any], send_ack: Optional[Callable[[str], Any]] = None,
+                 started_at: Optional[float] = None, ack_after_seconds: float = LLM_ACK_AFTER_SECONDS,
+                 ack_message: str = LLM_ACK_MESSAGE, record_ack: Optional[Callable[[Any], Any]] = None):
+        self.deliver = deliver
+        self.send_ack = send_ack
+        self.record_ack = record_ack
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.ack_after_seconds = ack_after_seconds
+        self.ack_message = ack_message
+        self.sent_chunks: List[str] = []
+        self.ack_sent = False
+        self.ack_result: Optional[Any] = None
+        self._ack_recorded = False
+        self.first_reply_at: Optional[float] = None
+        self._chunker = ParagraphChunker()
+        self._lock = threading.Lock()
+        self._ack_timer: Optional[threading.Timer] = None
+
+    def start(self) -> None:
+        """Arranca el temporizador del acuse de recibo"""
+        if self.send_ack and self.ack_after_seconds > 0:
+            remaining = max(self.ack_after_seconds - (time.perf_counter() - self.started_at), 0)
+            self._ack_timer = threading.Timer(remaining, self._send_ack)
+            self._ack_timer.daemon = True
+            self._ack_timer.start()
+
+    def finish(self) -> None:
+        """Despacha lo pendiente y cancela el acuse (llamar siempre al terminar)"""
+        timer = self._ack_timer
+        self._cancel_ack()
+        if timer is not None:
+            timer.join()  # Un acuse en pleno envío termina antes de seguir
+        with self._lock:
+            self._record_ack()
+        for chunk in self._chunker.flush():
+            self._dispatch(chunk)
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        # Los pasos con tool calls llegan con contenido vacío
+        if not token:
+            return
+        for chunk in self._chunker.feed(token):
+            self._dispatch(chunk)
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        for chunk in self._chunker.flush():
+            self._dispatch(chunk)
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self._cancel_ack()
+
+    def _dispatch(self, chunk: str) -> None:
+        with self._lock:
+            self._cancel_ack()
+            self._record_ack()
+            self._mark_first_reply()
+            print(f"📤 STREAM: Enviando bloque {len(self.sent_chunks) + 1} ({len(chunk)} caracteres)")
+            self.deliver(chunk)
+            self.sent_chunks.append(chunk)
+            metrics.increment("llm.stream.chunks_sent")
+
+    def _send_ack(self) -> None:
+        with self._lock:
+            if self.sent_chunks or self.ack_sent:
+                return
+            print(f"⏳ STREAM: Sin respuesta en {self.ack_after_seconds}s, enviando acuse de recibo")
+            try:
+                self.ack_result = self.send_ack(self.ack_message)
+                self.ack_sent = True
+                self._mark_first_reply()
+                metrics.increment("llm.stream.acks_sent")
+            except Exception as e:
+                print(f"❌ STREAM: Error enviando acuse de recibo: {str(e)}")
+
+    def _record_ack(self) -> None:
+        """Registra el acuse enviado (una vez, desde el hilo del request)"""
+        if not self.ack_sent or self._ack_recorded or self.record_ack is None:
+            return
+        self._ack_recorded = True
+        try:
+            self.record_ack(self.ack_result)
+        except Exception as e:
+            print(f"❌ STREAM: Error registrando acuse de recibo: {str(e)}")
+
+    def _mark_first_reply(self) -> None:
+        if self.first_reply_at is None:
+            self.first_reply_at = time.perf_counter()
+            metrics.observe("llm.time_to_first_reply", self.first_reply_at - self.started_at)
+
+    def _cancel_ack(self) -> None:
+        if self._ack_timer is not None:
+            self._ack_timer.cancel()
+            self._ack_timer = None
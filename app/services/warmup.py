@@ -0,0 +1,252 @@
+# app/services/warmup.py
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from app.cache.config_changes import config_change_poller
+from app.utils.metrics import metrics
+
+# Calentamiento al arrancar: /ready responde 503 hasta que termina (/health es solo liveness)
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() == 'true'
+WARMUP_GUPSHUP_TOKENS = os.getenv('WARMUP_GUPSHUP_TOKENS', 'true').lower() == 'true'
+WARMUP_AGENTS = os.getenv('WARMUP_AGENTS', 'true').lower() == 'true'
+WARMUP_DB_MAX_ATTEMPTS = int(os.getenv('WARMUP_DB_MAX_ATTEMPTS', '30'))
+WARMUP_DB_RETRY_SECONDS = float(os.getenv('WARMUP_DB_RETRY_SECONDS', '2'))
+WARMUP_MENUS_PER_ACCOUNT = int(os.getenv('WARMUP_MENUS_PER_ACCOUNT', '200'))
+# Tras un calentamiento fallido, el siguiente /ready lo reintenta con backoff exponencial
+WARMUP_RETRY_SECONDS = float(os.getenv('WARMUP_RETRY_SECONDS', '5'))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv('WARMUP_RETRY_MAX_SECONDS', '60'))
+
+STATE_PENDING = "pending"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class BootWarmup:
+    """
+    Precarga lo que pagan los primeros mensajes tras un deploy: conexiones del
+    pool de BD, cuenta / config de chatbot / grafo de simple_answer de cada
+    número configurado, tokens de app de Gupshup y agentes compilados.
+
+    Los pasos db_pool y config son obligatorios (si fallan el proceso queda en
+    'failed' y /ready responde 503 hasta que un reintento termine bien); tokens
+    y agentes son best-effort. Un número con datos inválidos no bloquea el
+    paso config: se reporta en su detalle.
+    """
+
+    def __init__(self, enabled: bool = WARMUP_ENABLED):
+        self.enabled = enabled
+        self.state = STATE_PENDING if enabled else STATE_READY
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._accounts: List[Any] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.attempts = 0
+        self._retry_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.state == STATE_READY
+
+    def start(self) -> None:
+        """Lanza el calentamiento en un hilo (idempotente); si falló, lo reintenta pasado el backoff"""
+        with self._lock:
+            if self.state == STATE_FAILED:
+                if time.monotonic() < self._retry_at:
+                    return
+                print(f"🔁 WARMUP: Reintentando calentamiento (intento {self.attempts + 1})")
+            elif self.state != STATE_PENDING:
+                return
+            self.state = STATE_WARMING
+            self._thread = threading.Thread(target=self.run, name="boot-warmup", daemon=True)
+            self._thread.start()
+
+    def run(self) -> bool:
+        self.state = STATE_WARMING
+        self.attempts += 1
+        self._accounts = []
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        started = time.perf_counter()
+        print("🔥 WARMUP: Iniciando calentamiento")
+
+        ok = self._step("db_pool", self._warm_db_pool) and self._step("config", self._warm_config)
+        if ok:
+            if WARMUP_GUPSHUP_TOKENS:
+                self._step("gupshup_tokens", self._warm_gupshup_tokens)
+            if WARMUP_AGENTS:
+                self._step("agents", self._warm_agents)
+
+        elapsed = time.perf_counter() - started
+        metrics.observe("warmup.total", elapsed)
+        self.finished_at = datetime.now().isoformat(timespec="seconds")
+        self._accounts = []
+        if not ok:
+            backoff = min(WARMUP_RETRY_SECONDS * 2 ** (self.attempts - 1), WARMUP_RETRY_MAX_SECONDS)
+            self._retry_at = time.monotonic() + backoff
+        with self._lock:
+            self._thread = None
+            self.state = STATE_READY if ok else STATE_FAILED
+        print(f"{'✅' if ok else '❌'} WARMUP: {self.state} en {elapsed * 1000:.0f} ms"
+              f"{'' if ok else f' (reintento en {backoff:.0f}s)'}")
+        return ok
+
+    def _step(self, name: str, fn: Callable[[], Dict[str, Any]]) -> bool:
+        started = time.perf_counter()
+        try:
+            detail = fn() or {}
+            ok = True
+        except Exception as e:
+            detail = {"error": str(e)}
+            ok = False
+            metrics.increment(f"warmup.{name}.error")
+        elapsed = time.perf_counter() - started
+        metrics.observe(f"warmup.{name}", elapsed)
+        self.steps[name] = {"ok": ok, "ms": round(elapsed * 1000, 1), **detail}
+        print(f"{'🔥' if ok else '❌'} WARMUP: {name} en {elapsed * 1000:.0f} ms {detail}")
+        return ok
+
+    def _warm_db_pool(self) -> Dict[str, Any]:
+        """Abre DB_POOL_SIZE conexiones (SELECT 1 en cada una) reintentando hasta que la BD responda"""
+        from sqlalchemy import text
+        from config.database import DB_POOL_SIZE, engine
+
+        for attempt in range(1, WARMUP_DB_MAX_ATTEMPTS + 1):
+            connections = []
+            try:
+                for _ in range(DB_POOL_SIZE):
+                    connection = engine.connect()
+                    connections.append(connection)
+                    connection.execute(text("SELECT 1"))
+                return {"connections": len(connections), "attempts": attempt}
+            except Exception as e:
+                if attempt == WARMUP_DB_MAX_ATTEMPTS:
+                    raise
+                print(f"⏳ WARMUP: BD no disponible (intento {attempt}): {str(e)[:120]}")
+                time.sleep(WARMUP_DB_RETRY_SECONDS)
+            finally:
+                for connection in connections:
+                    connection.close()  # vuelve al pool, queda abierta
+        return {}
+
+    def _warm_config(self) -> Dict[str, Any]:
+        """Cuenta, config de chatbot, grafo de simple_answer y menús de cada número configurado"""
+        from config.database import db_session_scope
+        from app.repositories.accounts_repository import AccountsRepository
+        from app.repositories.simple_answer_repository import SimpleAnswerRepository
+        from app.repositories.text_chatbot_repository import TextChatbotRepository
+        from app.routing.rule_classifier import get_compiled_menu
+
+        # Posición en tbl_config_change_log antes de precargar: lo que cambie durante
+        # el calentamiento lo invalida el poller después
+        try:
+            config_change_poller.ensure_initialized()
+        except Exception as e:
+            print(f"⚠️ WARMUP: Sin registro de cambios de configuración: {str(e)[:120]}")
+
+        counts = {"numbers": 0, "accounts": 0, "answers": 0, "menus": 0}
+        failed: Dict[str, str] = {}
+        with db_session_scope() as db:
+            accounts_repo = AccountsRepository(db)
+            text_chatbot_repo = TextChatbotRepository(db)
+            simple_answer_repo = SimpleAnswerRepository(db)
+            graphs_loaded = set()
+
+            for from_uid in text_chatbot_repo.get_all_configured_numbers():
+                counts["numbers"] += 1
+                try:
+                    self._warm_number(from_uid, accounts_repo, text_chatbot_repo, simple_answer_repo,
+                                      get_compiled_menu, graphs_loaded, counts)
+                except Exception as e:
+                    # Un número con datos inválidos no debe dejar al proceso fuera de /ready
+                    db.rollback()
+                    failed[str(from_uid)] = str(e)[:200]
+                    metrics.increment("warmup.config.number_error")
+                    print(f"⚠️ WARMUP: Error precargando el número {from_uid}: {str(e)[:120]}")
+
+        return {**counts, "failed_numbers": failed} if failed else counts
+
+    def _warm_number(self, from_uid: str, accounts_repo, text_chatbot_repo, simple_answer_repo,
+                     get_compiled_menu, graphs_loaded: set, counts: Dict[str, int]) -> None:
+        text_chatbot_repo.get_snapshots_by_from_uid(from_uid)
+        account = accounts_repo.get_snapshot_by_from_uid(from_uid)
+        if account is None:
+            return
+        counts["accounts"] += 1
+        self._accounts.append(account)
+        if account.account_id in graphs_loaded:
+            return
+        graphs_loaded.add(account.account_id)
+
+        graph = simple_answer_repo.get_graph(account.account_id)
+        if graph is None:
+            return
+        counts["answers"] += len(graph)
+        # Menús de los paths con hijos (sin BD: salen del grafo ya cargado)
+        parents = sorted({a.handler_path.rpartition("/")[0] for a in graph.answers})
+        for parent in parents[:WARMUP_MENUS_PER_ACCOUNT]:
+            get_compiled_menu(simple_answer_repo, account.account_id, parent)
+            counts["menus"] += 1
+
+    def _warm_gupshup_tokens(self) -> Dict[str, Any]:
+        """Token de app por cuenta con credenciales (también abre la conexión TLS a Gupshup)"""
+        from app.services.gupshup_sender_service import GupshupSenderService
+
+        sender = GupshupSenderService(accounts_repository=None)
+        fetched = failed = 0
+        seen = set()
+        for account in self._accounts:
+            key = (account.appid, account.gs_user)
+            if not account.appid or not account.gs_user or not account.gs_password or key in seen:
+                continue
+            seen.add(key)
+            if sender.get_app_token(account)["success"]:
+                fetched += 1
+            else:
+                failed += 1
+        return {"tokens": fetched, "failed": failed}
+
+    def _warm_agents(self) -> Dict[str, Any]:
+        """Importa LangChain y compila el agente por defecto y el de cada cuenta langchain"""
+        from app.services.ai_stack import AI_STACK_ENABLED, load_langchain_service_class
+
+        langchain_accounts = [a for a in self._accounts if a.processing_strategy == "langchain"]
+        if not AI_STACK_ENABLED or not langchain_accounts:
+            return {"skipped": True}
+
+        load_langchain_service_class()
+        from config.database import db_session_scope
+        from app.repositories.accounts_repository import AccountsRepository
+        from app.repositories.account_prompts_repository import AccountPromptsRepository
+        from app.services.context_assembler import cap_account_prompt
+        from app.services.langchain_service import prebuild_agent
+        from app.services.prompt_service import PromptService
+
+        prebuild_agent()
+        prompts = set()
+        with db_session_scope() as db:
+            prompt_service = PromptService(AccountsRepository(db), AccountPromptsRepository(db))
+            for account in langchain_accounts:
+                prompt = cap_account_prompt(prompt_service.get_prompt_by_from_uid(account.from_uid))
+                if prompt and prompt not in prompts:
+                    prompts.add(prompt)
+                    prebuild_agent(prompt)
+        return {"agents": len(prompts) + 1}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": dict(self.steps),
+        }
+
+
+# Calentamiento compartido por el proceso
+boot_warmup = BootWarmup()
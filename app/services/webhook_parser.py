@@ -0,0 +1,116 @@
+# app/services/webhook_parser.py
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Tuple
+from app.models.webhook_data import WebhookData
+
+# Orden de avance de un status; 'failed' siempre prevalece
+STATUS_RANK = {"sent": 1, "delivered": 2, "read": 3, "failed": 4}
+
+
+def _message_body(message: Dict[str, Any]) -> Any:
+    """Texto de un mensaje de texto o interactivo (botones / listas)"""
+    message_type = message.get("type")
+    if message_type == "text":
+        return message.get("text", {}).get("body")
+    if message_type == "interactive":
+        interactive_content = message.get("interactive", {})
+        if interactive_content.get("type") == "button_reply":
+            return interactive_content.get("button_reply", {}).get("title", "")
+        if interactive_content.get("type") == "list_reply":
+            return interactive_content.get("list_reply", {}).get("title", "")
+    return None
+
+
+def _iter_values(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for entry in payload.get("entry") or []:
+        for change in (entry or {}).get("changes") or []:
+            value = (change or {}).get("value")
+            if value:
+                yield value
+
+
+def extract_webhook_events(payload: Dict[str, Any]) -> List[WebhookData]:
+    """
+    Recorre todas las entries/changes del payload y retorna un WebhookData por
+    cada mensaje y cada status, en el orden en que vienen.
+    """
+    events: List[WebhookData] = []
+
+    for value in _iter_values(payload):
+        metadata = value.get("metadata") or {}
+        display_phone_number = metadata.get("display_phone_number")
+        app_id = metadata.get("phone_number_id")
+
+        for message in value.get("messages") or []:
+            events.append(WebhookData(
+                from_uid=message.get("from"),
+                message_id=message.get("id"),
+                message_type=message.get("type"),
+                message_body=_message_body(message),
+                display_phone_number=display_phone_number,
+                app_id=app_id,
+                timestamp=message.get("timestamp"),
+                is_user_message=True,
+                raw_payload=payload
+            ))
+
+        for status in value.get("statuses") or []:
+            errors = status.get("errors") or []
+            events.append(WebhookData(
+                from_uid=status.get("recipient_id"),
+                message_id=status.get("id"),
+                message_type="status",
+                display_phone_number=display_phone_number,
+                app_id=app_id,
+                status=status.get("status"),
+                error_code=str(errors[0].get("code")) if errors and isinstance(errors[0], dict) else None,
+                timestamp=status.get("timestamp"),
+                is_status_update=True,
+                raw_payload=payload
+            ))
+
+    return events
+
+
+def is_status_only_payload(payload: Dict[str, Any]) -> bool:
+    """True si el payload trae status y ningún mensaje (no requiere sesión ni handlers)"""
+    has_statuses = False
+    for value in _iter_values(payload):
+        if value.get("messages"):
+            return False
+        has_statuses = has_statuses or bool(value.get("statuses"))
+    return has_statuses
+
+
+def _timestamp_key(event: WebhookData) -> int:
+    try:
+        return int(event.timestamp)
+    except (TypeError, ValueError):
+        return 0
+
+
+def group_conversations(events: List[WebhookData]) -> "OrderedDict[Tuple[Any, Any], List[WebhookData]]":
+    """
+    Mensajes de usuario agrupados por conversación (número del negocio, cliente),
+    cada grupo ordenado por timestamp (estable: empates respetan el payload).
+    """
+    conversations: "OrderedDict[Tuple[Any, Any], List[WebhookData]]" = OrderedDict()
+    for event in events:
+        if event.is_user_message:
+            conversations.setdefault((event.display_phone_number, event.from_uid), []).append(event)
+    for messages in conversations.values():
+        messages.sort(key=_timestamp_key)
+    return conversations
+
+
+def group_status_updates(events: List[WebhookData]) -> List[WebhookData]:
+    """Un status por message_id: el más avanzado (y el más reciente en empate)"""
+    latest: Dict[Any, WebhookData] = OrderedDict()
+    for event in events:
+        if not event.is_status_update:
+            continue
+        current = latest.get(event.message_id)
+        if current is None or (STATUS_RANK.get(event.status, 0), _timestamp_key(event)) >= \
+                (STATUS_RANK.get(current.status, 0), _timestamp_key(current)):
+            latest[event.message_id] = event
+    return list(latest.values())
@@ -1,8 +1,16 @@
 # app/tools/productos_tools.py
 from langchain.tools import tool
-from typing import List
+from typing import List, Optional, Tuple
 from app.repositories.products_repository import ProductsRepository
+from app.cache.tool_cache import product_tool_cache
+from app.services.context_assembler import TOOL_TEXT_FIELD_MAX_CHARS, truncate_chars
+from app.utils.metrics import metrics
 import json
+import threading
+
+# Versión del catálogo con la que se llenó la caché; si cambia se vacía completa
+_cached_catalog_version = None
+_version_lock = threading.Lock()
 
 # Variable global para el repository
 _products_repo = None
@@ -11,6 +19,48 @@ def init_products_repo(products_repository: ProductsRepository):
     global _products_repo
     _products_repo = products_repository
 
+def _normalize_query(termino: Optional[str], palabras_clave: Optional[str]) -> Tuple[str, str]:
+    """
+    Clave canónica de una búsqueda. El término conserva el orden (el backend 'sql'
+    lo busca como frase); las palabras clave se combinan con OR, así que se ordenan.
+    """
+    termino_norm = " ".join((termino or "").lower().split())
+    palabras_norm = " ".join(sorted(set((palabras_clave or "").lower().split())))
+    return termino_norm, palabras_norm
+
+def _sync_catalog_version() -> None:
+    """Vacía la caché si el catálogo cambió desde que se llenó"""
+    global _cached_catalog_version
+    version = _products_repo.get_catalog_version()
+    if version == _cached_catalog_version:
+        return
+    with _version_lock:
+        if version != _cached_catalog_version:
+            if _cached_catalog_version is not None:
+                print(f"🧹 TOOLS: Catálogo cambió, limpiando caché de búsquedas ({len(product_tool_cache)} entradas)")
+            product_tool_cache.clear()
+            _cached_catalog_version = version
+
+def _search_products_json(termino: str, palabras_clave: Optional[str]) -> str:
+    # Búsqueda inteligente con palabras clave adicionales
+    products = _products_repo.buscar_con_palabras_clave(termino, palabras_clave)
+    
+    # Datos crudos para ChatGPT
+    productos_data = []
+    for product in products:
+        productos_data.append({
+            "nombre": product.nombre,
+            "marca": product.marca,
+            "precio": float(product.precio_con_impuesto) if product.precio_con_impuesto else 0,
+            "stock": product.stock_web,
+            "categoria": product.categoria,
+            "modelo": product.modelo,
+            # Acotado para no inflar el contexto del Agent con descripciones largas
+            "caracteristicas": truncate_chars(product.caracteristicas, TOOL_TEXT_FIELD_MAX_CHARS)
+        })
+    
+    return json.dumps(productos_data, ensure_ascii=False)
+
 @tool
 def buscar_productos(termino: str, palabras_clave: str = None) -> str:
     """
@@ -25,25 +75,21 @@ def buscar_productos(termino: str, palabras_clave: str = None) -> str:
     - Usuario: "productos seguridad" → termino="seguridad", palabras_clave="vigilancia alarma camara sensor"
     """
     try:
-        # Búsqueda inteligente con palabras clave adicionales
-        products = _products_repo.buscar_con_palabras_clave(termino, palabras_clave)
+        _sync_catalog_version()
+        key = ("buscar_productos",) + _normalize_query(termino, palabras_clave)
         
-        # Datos crudos para ChatGPT
-        productos_data = []
-        for product in products:
-            productos_data.append({
-                "nombre": product.nombre,
-                "marca": product.marca,
-                "precio": float(product.precio_con_impuesto) if product.precio_con_impuesto else 0,
-                "stock": product.stock_web,
-                "categoria": product.categoria,
-                "modelo": product.modelo,
-                "caracteristicas": product.caracteristicas  # Agregar características
-            })
+        cached = product_tool_cache.get(key)
+        if cached is not None:
+            metrics.increment("tools.buscar_productos.cache_hit")
+            return cached
         
-        return json.dumps(productos_data, ensure_ascii=False)
+        metrics.increment("tools.buscar_productos.cache_miss")
+        result = _search_products_json(termino, palabras_clave)
+        product_tool_cache.set(key, result)
+        return result
         
     except Exception as e:
+        # Los errores no se cachean
         return f"Error: {str(e)}"
 
 def create_producto_tools(products_repository: ProductsRepository) -> List:
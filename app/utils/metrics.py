@@ -0,0 +1,62 @@
+# app/utils/metrics.py
+import threading
+from typing import Dict, Any
+
+
+class MetricsRegistry:
+    """
+    Registro en memoria de contadores, gauges y tiempos del proceso.
+    Thread-safe porque Flask atiende cada webhook en su propio hilo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timers: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Incrementa un contador"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Fija el valor actual de un gauge"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Registra una duración (count, total, max) para un timer"""
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+                self._timers[name] = timer
+            timer["count"] += 1
+            timer["total_seconds"] += seconds
+            if seconds > timer["max_seconds"]:
+                timer["max_seconds"] = seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copia consistente de todas las métricas"""
+        with self._lock:
+            timers = {}
+            for name, timer in self._timers.items():
+                avg = timer["total_seconds"] / timer["count"] if timer["count"] else 0.0
+                timers[name] = dict(timer, avg_seconds=avg)
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timers": timers
+            }
+
+    def reset(self) -> None:
+        """Limpia todas las métricas"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timers.clear()
+
+
+# Registro global del proceso
+metrics = MetricsRegistry()
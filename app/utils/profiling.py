@@ -0,0 +1,275 @@
+# app/utils/profiling.py
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+# Perfilado por muestreo de webhooks: por cuenta, por sesión o 1 de cada N requests
+PROFILE_ACCOUNT_IDS = os.getenv('PROFILE_ACCOUNT_IDS', '')
+PROFILE_SESSION_IDS = os.getenv('PROFILE_SESSION_IDS', '')
+PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))   # 0 = sin muestreo aleatorio
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '200'))                 # archivos que se conservan
+
+PROFILE_SUFFIX = ".folded"
+_PROFILE_NAME_RE = re.compile(r"^[\w.-]+\.folded$")
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _parse_ids(value: str) -> Set[str]:
+    return {v.strip() for v in value.split(",") if v.strip()}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    # co_firstlineno: todas las muestras de una función se agrupan en un solo nodo
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def collapse_stack(frame) -> str:
+    """Stack de raíz a hoja en formato collapsed de flamegraph.pl ('a;b;c')"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Un solo hilo que cada interval segundos toma el stack de los hilos
+    registrados (sys._current_frames). Sin hilos registrados queda dormido,
+    así que no cuesta nada mientras no se perfila.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._targets: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: int) -> None:
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                targets = list(self._targets.items())
+            if not targets:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            frames = sys._current_frames()
+            for thread_id, counter in targets:
+                frame = frames.get(thread_id)
+                if frame is not None and thread_id != own_id:
+                    counter[collapse_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval_seconds)
+
+
+class _ProfileScope:
+    def __init__(self):
+        self.account_id: Optional[str] = None
+        self.session_id: Optional[str] = None
+        self.reason: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+
+def _id_set(values: Optional[Iterable[Any]], field: str) -> Optional[Set[str]]:
+    """Lista de ids del body admin -> set; un string suelto se rechaza (no se parte en caracteres)"""
+    if values is None:
+        return None
+    if isinstance(values, (str, bytes)) or not isinstance(values, (list, tuple, set)):
+        raise TypeError(f"{field} debe ser una lista")
+    return {str(v) for v in values if str(v).strip()}
+
+
+class RequestProfiler:
+    """
+    Decide qué requests se perfilan y guarda cada perfil como un archivo
+    .folded en PROFILE_DIR (entrada directa para flamegraph.pl / speedscope).
+
+    profile_request() envuelve el request; tag() se llama cuando se conoce la
+    cuenta / sesión y arranca el muestreo si coinciden con lo configurado.
+    """
+
+    def __init__(self, account_ids: Iterable[str] = (), session_ids: Iterable[str] = (),
+                 sample_every: int = 0, interval_ms: float = PROFILE_INTERVAL_MS,
+                 directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.account_ids: Set[str] = set(account_ids)
+        self.session_ids: Set[str] = set(session_ids)
+        self.sample_every = sample_every
+        self.directory = directory
+        self.keep = keep
+        self._sampler = StackSampler(interval_ms / 1000)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self.profiles_written = 0
+
+    @property
+    def active(self) -> bool:
+        return bool(self.account_ids or self.session_ids or self.sample_every > 0)
+
+    def configure(self, account_ids: Optional[Iterable[str]] = None, session_ids: Optional[Iterable[str]] = None,
+                  sample_every: Optional[int] = None) -> None:
+        """
+        Cambia los objetivos en caliente (endpoint admin); None deja el valor actual.
+        Valida todo antes de aplicar: si un campo es inválido no cambia ninguno.
+        """
+        new_account_ids = _id_set(account_ids, "account_ids")
+        new_session_ids = _id_set(session_ids, "session_ids")
+        new_sample_every = None
+        if sample_every is not None:
+            if isinstance(sample_every, bool):
+                raise TypeError("sample_every debe ser un entero")
+            new_sample_every = max(int(sample_every), 0)
+
+        if new_account_ids is not None:
+            self.account_ids = new_account_ids
+        if new_session_ids is not None:
+            self.session_ids = new_session_ids
+        if new_sample_every is not None:
+            self.sample_every = new_sample_every
+        print(f"🔬 PROFILER: cuentas={sorted(self.account_ids)} sesiones={sorted(self.session_ids)} "
+              f"1/{self.sample_every or '-'}")
+
+    @contextmanager
+    def profile_request(self) -> Iterator[None]:
+        if not self.active:
+            yield
+            return
+
+        scope = _ProfileScope()
+        self._local.scope = scope
+        if self.sample_every > 0:
+            with self._lock:
+                self._requests += 1
+                sampled = self._requests % self.sample_every == 0
+            if sampled:
+                self._start(scope, "sample")
+        try:
+            yield
+        finally:
+            self._local.scope = None
+            if scope.reason is not None:
+                self._finish(scope)
+
+    def tag(self, account_id: Any = None, session_id: Any = None) -> None:
+        """Asocia cuenta / sesión al request actual; si coinciden, empieza a perfilar"""
+        scope: Optional[_ProfileScope] = getattr(self._local, "scope", None)
+        if scope is None:
+            return
+        if account_id is not None and scope.account_id is None:
+            scope.account_id = str(account_id)
+        if session_id is not None and scope.session_id is None:
+            scope.session_id = str(session_id)
+        if scope.reason is not None:
+            return
+        if scope.account_id in self.account_ids:
+            self._start(scope, "account")
+        elif scope.session_id in self.session_ids:
+            self._start(scope, "session")
+
+    def _start(self, scope: _ProfileScope, reason: str) -> None:
+        scope.reason = reason
+        scope.started_at = time.perf_counter()
+        self._sampler.start(threading.get_ident())
+
+    def _finish(self, scope: _ProfileScope) -> None:
+        samples = self._sampler.stop(threading.get_ident())
+        elapsed_ms = (time.perf_counter() - scope.started_at) * 1000
+        if not samples:
+            return
+        try:
+            path = self._write(scope, samples, elapsed_ms)
+            print(f"🔬 PROFILER: {sum(samples.values())} muestras en {elapsed_ms:.0f} ms -> {path}")
+        except Exception as e:
+            print(f"❌ PROFILER: Error guardando perfil: {str(e)}")
+
+    def _write(self, scope: _ProfileScope, samples: Counter, elapsed_ms: float) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        label = "-".join(re.sub(r"[^\w.]", "_", part) for part in [
+            datetime.now().strftime("%Y%m%d-%H%M%S-%f"),
+            scope.account_id or "na",
+            scope.session_id or "na",
+            scope.reason,
+            f"{elapsed_ms:.0f}ms",
+        ])
+        path = os.path.join(self.directory, f"{label}{PROFILE_SUFFIX}")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with self._lock:
+            self.profiles_written += 1
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(PROFILE_SUFFIX))
+        for name in names[:max(len(names) - self.keep, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def list_profiles(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Perfiles más recientes primero"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((n for n in os.listdir(self.directory) if n.endswith(PROFILE_SUFFIX)), reverse=True)
+        profiles = []
+        for name in names[:limit]:
+            stat = os.stat(os.path.join(self.directory, name))
+            profiles.append({"name": name, "bytes": stat.st_size,
+                             "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds")})
+        return profiles
+
+    def profile_path(self, name: str) -> Optional[str]:
+        """Ruta de un perfil por nombre (None si no existe o el nombre no es válido)"""
+        if not _PROFILE_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "account_ids": sorted(self.account_ids),
+            "session_ids": sorted(self.session_ids),
+            "sample_every": self.sample_every,
+            "interval_ms": self._sampler.interval_seconds * 1000,
+            "directory": self.directory,
+            "profiles_written": self.profiles_written,
+        }
+
+
+# Profiler compartido por el proceso
+request_profiler = RequestProfiler(
+    account_ids=_parse_ids(PROFILE_ACCOUNT_IDS),
+    session_ids=_parse_ids(PROFILE_SESSION_IDS),
+    sample_every=PROFILE_SAMPLE_EVERY
+)
@@ -0,0 +1,152 @@
+# app/utils/query_stats.py
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+from sqlalchemy import event
+from app.utils.metrics import metrics
+
+# Conteo y tiempo de sentencias SQL por webhook / turno
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+DB_QUERY_BUDGET_PER_TURN = int(os.getenv('DB_QUERY_BUDGET_PER_TURN', '0'))    # 0 = sin presupuesto
+# true: exceder el presupuesto lanza QueryBudgetExceeded (replay / pruebas); false: solo log y métrica
+DB_QUERY_BUDGET_STRICT = os.getenv('DB_QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+
+_REPOSITORIES_DIR = os.path.join("app", "repositories") + os.sep
+_APP_DIR = os.sep + "app" + os.sep
+_local = threading.local()
+
+
+@dataclass
+class QueryStats:
+    """Sentencias ejecutadas dentro de un track_queries(), agrupadas por método de origen"""
+    count: int = 0
+    total_seconds: float = 0.0
+    slow: int = 0
+    by_origin: Counter = field(default_factory=Counter)
+
+    def top_origins(self, limit: int = 5) -> str:
+        return ", ".join(f"{origin} x{n}" for origin, n in self.by_origin.most_common(limit))
+
+
+class QueryBudgetExceeded(Exception):
+    """Un bloque query_budget() ejecutó más sentencias que las permitidas"""
+
+    def __init__(self, label: str, max_queries: int, stats: QueryStats):
+        self.label = label
+        self.max_queries = max_queries
+        self.stats = stats
+        super().__init__(f"{label}: {stats.count} queries (máximo {max_queries}) - {stats.top_origins()}")
+
+
+def _active() -> List[QueryStats]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def query_origin() -> str:
+    """
+    Método que originó la sentencia: el primer frame de app/repositories
+    (Clase.método); si no pasa por un repository, el primer frame de app/.
+    """
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if _REPOSITORIES_DIR in filename:
+            owner = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            return f"{type(owner).__name__}.{name}" if owner is not None else name
+        if fallback is None and _APP_DIR in filename and not filename.endswith("query_stats.py"):
+            fallback = f"{os.path.basename(filename)}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    elapsed = time.perf_counter() - started
+    metrics.increment("db.queries")
+    metrics.observe("db.query", elapsed)
+
+    stack = _active()
+    slow = elapsed * 1000 >= DB_SLOW_QUERY_MS
+    origin = query_origin() if stack or slow else None
+    for stats in stack:
+        stats.count += 1
+        stats.total_seconds += elapsed
+        stats.by_origin[origin] += 1
+        if slow:
+            stats.slow += 1
+
+    if slow:
+        metrics.increment("db.slow_queries")
+        sql = " ".join(statement.split())
+        print(f"🐢 SLOW_QUERY: {elapsed * 1000:.0f} ms en {origin}: {sql[:300]}{'...' if len(sql) > 300 else ''}")
+
+
+def _handle_error(exception_context):
+    # Sentencia fallida: no llega after_cursor_execute, descartar su inicio
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
+
+
+def install_query_hooks(engine) -> None:
+    """Registra los listeners de conteo / tiempo en el engine (una vez por engine)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Cuenta las sentencias del hilo actual mientras dura el bloque (anidable)"""
+    stats = QueryStats()
+    stack = _active()
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        stack.remove(stats)
+
+
+@contextmanager
+def query_budget(max_queries: int = DB_QUERY_BUDGET_PER_TURN, label: str = "turno",
+                 strict: bool = DB_QUERY_BUDGET_STRICT) -> Iterator[QueryStats]:
+    """
+    Presupuesto de sentencias para un bloque. Al excederlo incrementa
+    db.query_budget.exceeded y, en modo strict, lanza QueryBudgetExceeded.
+    max_queries <= 0 solo cuenta.
+    """
+    with track_queries() as stats:
+        yield stats
+    if 0 < max_queries < stats.count:
+        metrics.increment("db.query_budget.exceeded")
+        print(f"⚠️ QUERY_BUDGET: {label} ejecutó {stats.count} queries (máximo {max_queries}): "
+              f"{stats.top_origins()}")
+        if strict:
+            raise QueryBudgetExceeded(label, max_queries, stats)
+
+
+def record_request_stats(stats: QueryStats, label: str = "webhook") -> Tuple[int, float]:
+    """Vuelca los totales de un request a métricas y log; retorna (queries, segundos)"""
+    metrics.increment(f"{label}.db_queries", stats.count)
+    metrics.observe(f"{label}.db_time", stats.total_seconds)
+    metrics.set_gauge(f"{label}.db_queries_last", stats.count)
+    if stats.count:
+        print(f"🗄️ DB: {label} ejecutó {stats.count} queries en {stats.total_seconds * 1000:.0f} ms "
+              f"({stats.top_origins()})")
+    return stats.count, stats.total_seconds
@@ -1,7 +1,23 @@
 # app/webhook.py
-from flask import Flask, request, jsonify
+import hmac
+import os
+from flask import Flask, request, jsonify, g, send_file
 from typing import Dict, Any
-from config.database import get_db_session
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from config.database import get_db_session, get_pool_status
+from app.utils.metrics import metrics
+from app.utils.profiling import request_profiler
+from app.utils.query_stats import record_request_stats, track_queries
+from app.cache.config_cache import (
+    account_cache, chatbot_config_cache, menu_options_cache, simple_answer_graph_cache
+)
+from app.cache.agent_cache import agent_cache
+from app.cache.config_changes import config_change_poller
+from app.cache.token_cache import gupshup_token_cache
+from app.cache.tool_cache import product_tool_cache
+from app.cache.response_cache import llm_response_cache
+from app.services.llm_pool import llm_pool
 from app.repositories.gupshup_repository import GupshupRepository
 from app.repositories.accounts_repository import AccountsRepository
 from app.repositories.account_prompts_repository import AccountPromptsRepository
@@ -12,9 +28,57 @@ from app.repositories.simple_answer_repository import SimpleAnswerRepository
 from app.repositories.text_chatbot_repository import TextChatbotRepository
 from app.repositories.session_data_repository import SessionDataRepository
 from app.services.gupshup_service import GupshupService
+from app.services.status_pipeline import STATUS_RAW_LOG_ENABLED, status_pipeline
+from app.services.warmup import boot_warmup
+from app.cluster.router import OWNER_HEADER, conversation_router
+from app.cluster.session_lock import session_lock
+from app.services.webhook_parser import extract_webhook_events, is_status_only_payload
 
 app = Flask(__name__)
 
+# Token para los endpoints /admin (header X-Admin-Token); sin token quedan deshabilitados
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+def get_request_db_session() -> Session:
+    """Una única sesión de BD por request, cerrada en el teardown"""
+    if "db_session" not in g:
+        g.db_session = get_db_session()
+    return g.db_session
+
+@app.teardown_appcontext
+def close_request_db_session(exception=None):
+    """Devuelve la conexión al pool al terminar el request (también en error)"""
+    db_session = g.pop("db_session", None)
+    if db_session is not None:
+        if exception is not None:
+            db_session.rollback()
+        db_session.close()
+
+def build_gupshup_service(db_session: Session) -> GupshupService:
+    """Arma GupshupService con sus repositories sobre una sesión de BD (también lo usa el replay)"""
+    # Inicializar repositories
+    gupshup_repo = GupshupRepository(db_session)
+    accounts_repo = AccountsRepository(db_session)
+    account_prompts_repo = AccountPromptsRepository(db_session)
+    session_repo = ChatSessionRepository(db_session)
+    message_repo = MessageRepository(db_session)
+    products_repo = ProductsRepository(db_session)
+    simple_answer_repo = SimpleAnswerRepository(db_session)
+    text_chatbot_repo = TextChatbotRepository(db_session)
+    session_data_repo = SessionDataRepository(db_session)
+    
+    return GupshupService(
+        gupshup_repo, 
+        accounts_repo, 
+        session_repo, 
+        message_repo, 
+        products_repo,
+        account_prompts_repo,
+        simple_answer_repo,
+        text_chatbot_repo,
+        session_data_repo
+    )
+
 @app.route('/webhook/gupshup', methods=['POST'])
 def gupshup_webhook():
     """
@@ -28,75 +92,32 @@ def gupshup_webhook():
         if not payload:
             return jsonify({"error": "No payload received"}), 400
         
-        # Obtener sesión de BD
-        db_session = get_db_session()
-        
-        # Inicializar repositories
-        gupshup_repo = GupshupRepository(db_session)
-        accounts_repo = AccountsRepository(db_session)
-        account_prompts_repo = AccountPromptsRepository(db_session)
-        session_repo = ChatSessionRepository(db_session)
-        message_repo = MessageRepository(db_session)
-        products_repo = ProductsRepository(db_session)
-        simple_answer_repo = SimpleAnswerRepository(db_session)
-        text_chatbot_repo = TextChatbotRepository(db_session)
-        session_data_repo = SessionDataRepository(db_session)
-        
-        # Inicializar service con todos los repositories
-        gupshup_service = GupshupService(
-            gupshup_repo, 
-            accounts_repo, 
-            session_repo, 
-            message_repo, 
-            products_repo,
-            account_prompts_repo,
-            simple_answer_repo,
-            text_chatbot_repo,
-            session_data_repo
-        )
+        # Camino rápido: payloads solo con status de entrega (la mayoría del volumen)
+        if is_status_only_payload(payload):
+            return handle_status_payload(payload)
         
-        # Procesar webhook y guardar en gupshup_log
-        result = gupshup_service.process_webhook(payload)
-        
-        # Cerrar sesión
-        db_session.close()
-        
-        if result["success"]:
-            # Respuesta base
-            response_data = {
-                "status": "success",
-                "message": "Webhook processed successfully",
-                "log_id": result["log_id"],
-                "is_user_message": result["is_user_message"]
+        # Con varias réplicas, la conversación se procesa en su réplica dueña (app/cluster)
+        forwarded = conversation_router.route(payload, request.headers)
+        if forwarded is not None:
+            return forwarded.body, forwarded.status_code, {
+                "Content-Type": forwarded.content_type,
+                OWNER_HEADER: forwarded.owner
             }
+        
+        # Perfilado por cuenta / sesión / 1 de cada N (ver app/utils/profiling.py)
+        with request_profiler.profile_request(), track_queries() as query_stats:
+            try:
+                return handle_message_payload(payload)
+            finally:
+                record_request_stats(query_stats)
             
-            # Si es mensaje de usuario procesado
-            if result["is_user_message"] and "send_result" in result:
-                response_data.update({
-                    "ai_processing": {
-                        "success": result.get("ai_response", {}).get("success", False),
-                        "type": result.get("ai_response", {}).get("type"),
-                        "tools_used": result.get("ai_response", {}).get("tools_used", [])
-                    },
-                    "message_sending": {
-                        "sent_to_user": result.get("sent_to_user", False),
-                        "gupshup_message_id": result.get("send_result", {}).get("message_id"),
-                        "error": result.get("send_result", {}).get("error") if not result.get("sent_to_user") else None
-                    },
-                    "session_data": {
-                        "session_id": result.get("session_id"),
-                        "account_id": result.get("account_id")
-                    }
-                })
-            
-            return jsonify(response_data), 200
-        else:
-            return jsonify({
-                "status": "error",
-                "message": "Error processing webhook",
-                "error": result["error"],
-                "log_id": result["log_id"]
-            }), 500
+    except PoolTimeoutError as e:
+        # Pool de conexiones agotado
+        metrics.increment("db.pool.timeouts")
+        return jsonify({
+            "status": "error",
+            "message": f"Database pool exhausted: {str(e)}"
+        }), 503
             
     except Exception as e:
         return jsonify({
@@ -104,11 +125,150 @@ def gupshup_webhook():
             "message": f"Unexpected error: {str(e)}"
         }), 500
 
+def handle_message_payload(payload: Dict[str, Any]):
+    """Procesa los mensajes del payload con GupshupService y arma la respuesta"""
+    # Obtener sesión de BD (una por request, se cierra en teardown)
+    db_session = get_request_db_session()
+    
+    # Inicializar service con todos los repositories
+    gupshup_service = build_gupshup_service(db_session)
+    
+    # Procesar webhook y guardar en gupshup_log
+    result = gupshup_service.process_webhook(payload)
+    
+    if result["success"]:
+        # Respuesta base
+        response_data = {
+            "status": "success",
+            "message": "Webhook processed successfully",
+            "log_id": result["log_id"],
+            "is_user_message": result["is_user_message"]
+        }
+        
+        # Si es mensaje de usuario procesado
+        if result["is_user_message"] and "send_result" in result:
+            response_data.update({
+                "ai_processing": {
+                    "success": result.get("ai_response", {}).get("success", False),
+                    "type": result.get("ai_response", {}).get("type"),
+                    "tools_used": result.get("ai_response", {}).get("tools_used", [])
+                },
+                "message_sending": {
+                    "sent_to_user": result.get("sent_to_user", False),
+                    "gupshup_message_id": result.get("send_result", {}).get("message_id"),
+                    "error": result.get("send_result", {}).get("error") if not result.get("sent_to_user") else None
+                },
+                "session_data": {
+                    "session_id": result.get("session_id"),
+                    "account_id": result.get("account_id")
+                }
+            })
+        
+        return jsonify(response_data), 200
+    else:
+        return jsonify({
+            "status": "error",
+            "message": "Error processing webhook",
+            "error": result["error"],
+            "log_id": result["log_id"]
+        }), 500
+
+def handle_status_payload(payload: Dict[str, Any]):
+    """Encola los status en el pipeline (sin sesión, handlers ni commit por status)"""
+    accepted = status_pipeline.add(extract_webhook_events(payload))
+    
+    if STATUS_RAW_LOG_ENABLED:
+        GupshupRepository(get_request_db_session()).save_log(
+            event=payload,
+            type="status",
+            channel="whatsapp"
+        )
+    
+    return jsonify({
+        "status": "success",
+        "message": "Status queued",
+        "statuses": accepted,
+        "is_user_message": False
+    }), 200
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "service": "gupshup-webhook"}), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: 503 hasta que termina el calentamiento de arranque (/health es solo liveness)"""
+    # Por si el proceso no los lanzó al arrancar (servidor WSGI externo)
+    config_change_poller.start()
+    boot_warmup.start()
+    status = boot_warmup.status()
+    return jsonify({"status": "ready" if status["ready"] else status["state"], "warmup": status}), \
+        200 if status["ready"] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas del proceso (incluye estado del pool de BD)"""
+    data = metrics.snapshot()
+    data["db_pool"] = get_pool_status()
+    data["caches"] = [account_cache.stats(), chatbot_config_cache.stats(), menu_options_cache.stats(),
+                      simple_answer_graph_cache.stats(), gupshup_token_cache.stats(), agent_cache.stats(),
+                      product_tool_cache.stats(),
+                      llm_response_cache.stats()]
+    data["llm_pool"] = llm_pool.status()
+    data["status_pipeline"] = status_pipeline.status()
+    data["config_changes"] = config_change_poller.status()
+    data["cluster"] = conversation_router.status()
+    data["session_lock"] = session_lock.status()
+    return jsonify(data), 200
+
+def admin_denied():
+    """Respuesta de error si el request no trae el token de admin (None si está autorizado)"""
+    if not ADMIN_TOKEN:
+        return jsonify({"status": "error", "message": "Admin endpoints disabled (ADMIN_TOKEN not set)"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"status": "error", "message": "Invalid admin token"}), 401
+    return None
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def admin_profiling():
+    """
+    GET: configuración del profiler y perfiles recientes.
+    POST: cambia objetivos en caliente, p.ej. {"account_ids": ["coolbox"], "sample_every": 0}
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            request_profiler.configure(
+                account_ids=body.get("account_ids"),
+                session_ids=body.get("session_ids"),
+                sample_every=body.get("sample_every")
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+    
+    limit = request.args.get("limit", default=50, type=int)
+    return jsonify({
+        "profiler": request_profiler.status(),
+        "profiles": request_profiler.list_profiles(limit)
+    }), 200
+
+@app.route('/admin/profiling/profiles/<name>', methods=['GET'])
+def admin_profile_download(name: str):
+    """Un perfil en formato collapsed stacks (flamegraph.pl / speedscope)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    
+    path = request_profiler.profile_path(name)
+    if path is None:
+        return jsonify({"status": "error", "message": "Profile not found"}), 404
+    return send_file(os.path.abspath(path), mimetype="text/plain", as_attachment=False)
+
 @app.route('/status', methods=['GET'])
 def status_check():
     """Simple status endpoint for testing"""
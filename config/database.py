@@ -1,8 +1,12 @@
 # config/database.py
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 import os
 from dotenv import load_dotenv
+from app.utils.metrics import metrics
+from app.utils.query_stats import install_query_hooks
 
 # Cargar variables de entorno
 load_dotenv()
@@ -14,24 +18,100 @@ DB_USER = os.getenv('DB_USER')
 DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_NAME = os.getenv('DB_NAME')
 
+# Configuración del pool de conexiones
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))              # segundos esperando conexión libre
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))            # segundos antes de reciclar conexión
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '15000'))  # 0 = sin límite
+
 # Construir URL de conexión
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# statement_timeout por conexión (psycopg2 acepta opciones de servidor vía "options")
+connect_args = {}
+if DB_STATEMENT_TIMEOUT_MS > 0:
+    connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
 # Crear engine
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    connect_args=connect_args,
     echo=False  # Sin debug por defecto
 )
 
+# Conteo, tiempo y log de queries lentas por request (app/utils/query_stats.py)
+install_query_hooks(engine)
+
 # Crear sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# Métricas de saturación del pool
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    metrics.increment("db.pool.connections_opened")
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    metrics.increment("db.pool.checkouts")
+    _update_pool_gauges()
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    _update_pool_gauges()
+
+
+def _update_pool_gauges():
+    """Actualiza gauges de uso del pool (en uso, capacidad, saturación)"""
+    status = get_pool_status()
+    metrics.set_gauge("db.pool.checked_out", status["checked_out"])
+    metrics.set_gauge("db.pool.saturation", status["saturation"])
+
+
+def get_pool_status() -> Dict[str, Any]:
+    """Estado actual del pool: conexiones en uso, libres, overflow y saturación (0..1)"""
+    pool = engine.pool
+    capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    checked_out = pool.checkedout()
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "capacity": capacity,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "saturation": round(checked_out / capacity, 3) if capacity else 0.0
+    }
+
+
 # Función para obtener sesión de BD
 def get_db_session() -> Session:
-    """Genera una sesión de base de datos"""
+    """
+    Genera una sesión de base de datos.
+    El llamador es responsable de cerrarla; preferir db_session_scope().
+    """
+    return SessionLocal()
+
+
+@contextmanager
+def db_session_scope() -> Iterator[Session]:
+    """
+    Sesión con ciclo de vida acotado: rollback si hay error y siempre close(),
+    devolviendo la conexión al pool.
+    """
     db = SessionLocal()
     try:
-        return db
+        yield db
+    except Exception:
+        db.rollback()
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
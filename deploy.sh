@@ -10,9 +10,18 @@ mkdir -p logs
 echo "⏹️  Deteniendo contenedores existentes..."
 docker-compose down
 
-# Construir y levantar contenedores
-echo "🔨 Construyendo e iniciando contenedores..."
-docker-compose up -d --build
+# Construir imágenes y levantar la BD
+echo "🔨 Construyendo imágenes..."
+docker-compose build
+docker-compose up -d db
+
+# Aplicar migraciones de esquema (índices, etc.) antes de levantar la app
+echo "🗄️  Aplicando migraciones..."
+docker-compose run --rm app python -m migrations.migrate || exit 1
+
+# Levantar contenedores
+echo "🚀 Iniciando contenedores..."
+docker-compose up -d
 
 # Mostrar estado de los contenedores
 echo "📊 Estado de los contenedores:"
@@ -1,5 +1,14 @@
 # main.py - Entrada principal del proyecto
+import os
 from app.webhook import app
+from app.cache.config_changes import config_change_poller
+from app.services.warmup import boot_warmup
+
+DEBUG = True
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    # Con el reloader de debug el script corre dos veces: solo calienta el proceso que sirve requests
+    if not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        config_change_poller.start()
+        boot_warmup.start()
+    app.run(host="0.0.0.0", port=5001, debug=DEBUG)
@@ -0,0 +1,151 @@
+# migrations/explain_plans.py
+"""
+Imprime el plan de ejecución de cada método de lectura de los repositorios
+contra una base sembrada con datos sintéticos.
+
+Todo corre dentro de una transacción que se revierte al final: se puede
+apuntar a una base de staging sin dejar rastro.
+
+Uso:
+    python -m migrations.explain_plans [--rows 5000] [--analyze]
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import List, Tuple, Callable, Any
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app.models import (
+    TblAccounts, TblAccountPrompts, TblChatSession, TblGupshupLog, TblMessage,
+    TblSimpleAnswer, TblTextChatbot, TblTransferedChats
+)
+from app.repositories.accounts_repository import AccountsRepository
+from app.repositories.account_prompts_repository import AccountPromptsRepository
+from app.repositories.chat_session_repository import ChatSessionRepository
+from app.repositories.gupshup_repository import GupshupRepository
+from app.repositories.message_repository import MessageRepository
+from app.repositories.simple_answer_repository import SimpleAnswerRepository
+from app.repositories.text_chatbot_repository import TextChatbotRepository
+from app.repositories.transfered_chat_repository import TransferedChatRepository
+
+SEEDED_TABLES = [
+    "tbl_accounts", "tbl_account_prompts", "tbl_text_chatbot", "tbl_simple_answer",
+    "tbl_chat_session", "tbl_message", "tbl_gupshup_log", "tbl_transfered_chats"
+]
+
+
+def seed(db: Session, rows: int) -> None:
+    """Inserta datos sintéticos con una distribución parecida a producción"""
+    now = datetime.now()
+    accounts = max(rows // 500, 2)
+
+    for a in range(accounts):
+        from_uid = f"5100000{a:04d}"
+        account_id = f"acc_{a}"
+        db.add(TblAccounts(account_id=account_id, from_uid=from_uid, appid=f"app_{a}",
+                           processing_strategy="handlers"))
+        db.add(TblAccountPrompts(account_id=account_id, prompt_content="prompt", is_active=True))
+        db.add(TblTextChatbot(from_uid=from_uid, channel=0, initial_path="/DbAnswerHandler/menu"))
+        for i in range(rows // accounts):
+            db.add(TblSimpleAnswer(
+                account_id=account_id,
+                handler_path=f"/DbAnswerHandler/menu/{i // 10}/{i % 10}",
+                handler_path_to="",
+                message=f"opcion {i}"
+            ))
+
+    for i in range(rows):
+        client_uid = f"5199{i:07d}"
+        db.add(TblChatSession(
+            client_uid=client_uid, from_uid=f"5100000{i % accounts:04d}",
+            started_at=now - timedelta(days=i % 30), ended_at=now - timedelta(days=i % 30) + timedelta(days=1),
+            isclosed=(i % 30) != 0
+        ))
+        db.add(TblMessage(session_id=i, client_uid=client_uid, created_at=now - timedelta(minutes=i),
+                          message="hola", message_id=f"wamid.{i}", message_direction=i % 2))
+        db.add(TblGupshupLog(event="{}", message_id=f"wamid.{i}", created_at=now, type="text"))
+        db.add(TblTransferedChats(client_uid=client_uid, session_id=str(i),
+                                  closed_at=None if i % 20 == 0 else now))
+    db.flush()
+
+    for table in SEEDED_TABLES:
+        db.execute(text(f"ANALYZE {table}"))
+
+
+def repository_calls(db: Session) -> List[Tuple[str, Callable[[], Any]]]:
+    """Métodos de lectura del camino caliente a perfilar"""
+    accounts = AccountsRepository(db)
+    prompts = AccountPromptsRepository(db)
+    chatbots = TextChatbotRepository(db)
+    answers = SimpleAnswerRepository(db)
+    sessions = ChatSessionRepository(db)
+    messages = MessageRepository(db)
+    logs = GupshupRepository(db)
+    transfers = TransferedChatRepository(db)
+    now = datetime.now()
+
+    return [
+        ("AccountsRepository.find_by_from_uid", lambda: accounts.find_by_from_uid("51000000001")),
+        ("AccountsRepository.find_by_account_id", lambda: accounts.find_by_account_id("acc_1")),
+        ("AccountPromptsRepository.find_active_prompt_by_account_id",
+         lambda: prompts.find_active_prompt_by_account_id("acc_1")),
+        ("TextChatbotRepository.find_by_from_uid", lambda: chatbots.find_by_from_uid("51000000001")),
+        ("SimpleAnswerRepository.find_by_handler_path",
+         lambda: answers.find_by_handler_path("/DbAnswerHandler/menu/3/4", "acc_1")),
+        ("SimpleAnswerRepository.find_children_paths",
+         lambda: answers.find_children_paths("/DbAnswerHandler/menu/3", "acc_1")),
+        ("SimpleAnswerRepository.find_by_account_id", lambda: answers.find_by_account_id("acc_1")),
+        ("ChatSessionRepository.find_active_session",
+         lambda: sessions.find_active_session("51990000030", "51000000000", now)),
+        ("MessageRepository.find_by_session_id", lambda: messages.find_by_session_id(42, limit=10)),
+        ("MessageRepository.find_by_message_id", lambda: messages.find_by_message_id("wamid.42")),
+        ("GupshupRepository.get_log_by_message_id", lambda: logs.get_log_by_message_id("wamid.42")),
+        ("TransferedChatRepository.find_active_by_session_id",
+         lambda: transfers.find_active_by_session_id("40")),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planes de ejecución de los repositorios")
+    parser.add_argument("--rows", type=int, default=5000, help="Filas sintéticas por tabla")
+    parser.add_argument("--analyze", action="store_true", help="Usar EXPLAIN ANALYZE (ejecuta la query)")
+    args = parser.parse_args()
+
+    from config.database import engine
+
+    with engine.connect() as conn:
+        outer = conn.begin()
+        # Los commit() de los repositorios se convierten en SAVEPOINTs
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            print(f"🌱 Sembrando {args.rows} filas por tabla...")
+            seed(db, args.rows)
+
+            captured: List[Tuple[str, Any]] = []
+
+            def capture(conn_, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith("SELECT"):
+                    captured.append((statement, parameters))
+
+            explain = "EXPLAIN (ANALYZE, BUFFERS)" if args.analyze else "EXPLAIN"
+            for name, call in repository_calls(db):
+                captured.clear()
+                event.listen(conn, "before_cursor_execute", capture)
+                try:
+                    call()
+                finally:
+                    event.remove(conn, "before_cursor_execute", capture)
+
+                print("=" * 80)
+                print(f"📋 {name}")
+                for statement, parameters in captured:
+                    plan = conn.exec_driver_sql(f"{explain} {statement}", parameters).all()
+                    for row in plan:
+                        print(f"   {row[0]}")
+        finally:
+            db.close()
+            outer.rollback()
+            print("🧹 Datos sintéticos revertidos")
+
+
+if __name__ == "__main__":
+    main()
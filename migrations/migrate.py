@@ -0,0 +1,104 @@
+# migrations/migrate.py
+"""
+Aplica los scripts SQL versionados de migrations/versions en orden.
+
+Uso (en deploy, antes de levantar la app):
+    python -m migrations.migrate            # aplica pendientes
+    python -m migrations.migrate --list     # muestra estado
+    python -m migrations.migrate --dry-run  # muestra qué aplicaría
+"""
+import argparse
+import os
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "versions")
+
+# Clave fija para pg_advisory_xact_lock: evita que dos réplicas migren a la vez
+MIGRATION_LOCK_KEY = 726001
+
+CREATE_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS tbl_schema_migrations (
+    version TEXT PRIMARY KEY,
+    applied_at TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+
+def list_migration_files() -> List[Tuple[str, str]]:
+    """Lista (version, ruta) de los scripts .sql ordenados por nombre"""
+    files = []
+    for filename in sorted(os.listdir(VERSIONS_DIR)):
+        if filename.endswith(".sql"):
+            version = filename[:-4]
+            files.append((version, os.path.join(VERSIONS_DIR, filename)))
+    return files
+
+
+def get_applied_versions(engine: Engine) -> set:
+    """Versiones ya registradas en tbl_schema_migrations"""
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_VERSION_TABLE))
+        rows = conn.execute(text("SELECT version FROM tbl_schema_migrations")).all()
+    return {row.version for row in rows}
+
+
+def apply_migrations(engine: Engine, dry_run: bool = False) -> List[str]:
+    """Aplica las migraciones pendientes, cada una en su propia transacción"""
+    applied = get_applied_versions(engine)
+    pending = [(v, p) for v, p in list_migration_files() if v not in applied]
+
+    if not pending:
+        print("✅ MIGRATIONS: Esquema al día")
+        return []
+
+    done = []
+    for version, path in pending:
+        if dry_run:
+            print(f"📝 MIGRATIONS: Pendiente {version}")
+            continue
+
+        with open(path, encoding="utf-8") as f:
+            sql = f.read()
+
+        print(f"🚀 MIGRATIONS: Aplicando {version}...")
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            # Otra réplica pudo aplicarla mientras esperábamos el lock
+            already = conn.execute(
+                text("SELECT 1 FROM tbl_schema_migrations WHERE version = :v"), {"v": version}
+            ).first()
+            if already:
+                print(f"⏭️ MIGRATIONS: {version} ya aplicada por otro proceso")
+                continue
+            conn.exec_driver_sql(sql)
+            conn.execute(
+                text("INSERT INTO tbl_schema_migrations (version) VALUES (:v)"), {"v": version}
+            )
+        print(f"✅ MIGRATIONS: {version} aplicada")
+        done.append(version)
+
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica migraciones SQL versionadas")
+    parser.add_argument("--list", action="store_true", help="Muestra migraciones y su estado")
+    parser.add_argument("--dry-run", action="store_true", help="No aplica, solo lista pendientes")
+    args = parser.parse_args()
+
+    from config.database import engine
+
+    if args.list:
+        applied = get_applied_versions(engine)
+        for version, _ in list_migration_files():
+            status = "aplicada" if version in applied else "PENDIENTE"
+            print(f"{version:<45} {status}")
+        return
+
+    apply_migrations(engine, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+-- 0001_hot_path_indexes.sql
+-- Índices para las búsquedas del camino caliente (webhook -> handlers/LangChain)
+
+-- SimpleAnswerRepository.find_by_handler_path (handler_path = ? [AND account_id = ?])
+CREATE INDEX IF NOT EXISTS ix_simple_answer_path_account
+    ON tbl_simple_answer (handler_path, account_id);
+
+-- find_by_handler_path_like / find_children_paths / find_by_account_id (prefijo LIKE 'x%' + ORDER BY)
+CREATE INDEX IF NOT EXISTS ix_simple_answer_account_path_prefix
+    ON tbl_simple_answer (account_id, handler_path text_pattern_ops);
+
+-- AccountsRepository.find_by_from_uid
+CREATE INDEX IF NOT EXISTS ix_accounts_from_uid
+    ON tbl_accounts (from_uid);
+
+-- AccountsRepository.find_by_account_id
+CREATE INDEX IF NOT EXISTS ix_accounts_account_id
+    ON tbl_accounts (account_id);
+
+-- TextChatbotRepository.find_by_from_uid / find_by_from_uid_and_channel
+CREATE INDEX IF NOT EXISTS ix_text_chatbot_from_uid_channel
+    ON tbl_text_chatbot (from_uid, channel);
+
+-- ChatSessionRepository.find_active_session (solo sesiones abiertas)
+CREATE INDEX IF NOT EXISTS ix_chat_session_active
+    ON tbl_chat_session (client_uid, from_uid, ended_at)
+    WHERE isclosed = false;
+
+-- MessageRepository.find_by_session_id (ORDER BY created_at DESC LIMIT n, recorrido inverso)
+CREATE INDEX IF NOT EXISTS ix_message_session_created
+    ON tbl_message (session_id, created_at);
+
+-- MessageRepository.find_by_message_id
+CREATE INDEX IF NOT EXISTS ix_message_message_id
+    ON tbl_message (message_id);
+
+-- GupshupRepository.get_log_by_message_id
+CREATE INDEX IF NOT EXISTS ix_gupshup_log_message_id
+    ON tbl_gupshup_log (message_id);
+
+-- TransferedChatRepository.find_active_by_session_id / find_active_by_client_uid (no cerradas)
+CREATE INDEX IF NOT EXISTS ix_transfered_chats_open_session
+    ON tbl_transfered_chats (session_id)
+    WHERE closed_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS ix_transfered_chats_open_client
+    ON tbl_transfered_chats (client_uid)
+    WHERE closed_at IS NULL;
+
+-- AccountPromptsRepository.find_active_prompt_by_account_id
+CREATE INDEX IF NOT EXISTS ix_account_prompts_active
+    ON tbl_account_prompts (account_id)
+    WHERE is_active = true;
@@ -0,0 +1,33 @@
+-- 0002_product_search.sql
+-- Búsqueda de productos en Postgres (PRODUCT_SEARCH_BACKEND=postgres):
+-- tsvector generado con configuración 'spanish' + índices trigram para nombre/modelo
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- unaccent() no es IMMUTABLE; este wrapper permite usarlo en columnas generadas e índices
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+-- Pesos: A = nombre/marca/modelo, B = categoría/rubro/sub_familia, C = características
+-- (la columna no se declara en TblProducts: la mantiene Postgres)
+ALTER TABLE tbl_products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', f_unaccent(coalesce(nombre, '') || ' ' || coalesce(marca, '') || ' ' || coalesce(modelo, ''))), 'A') ||
+        setweight(to_tsvector('spanish', f_unaccent(coalesce(categoria, '') || ' ' || coalesce(rubro, '') || ' ' || coalesce(sub_familia, ''))), 'B') ||
+        setweight(to_tsvector('spanish', f_unaccent(coalesce(caracteristicas, ''))), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_products_search_vector
+    ON tbl_products USING GIN (search_vector)
+    WHERE activo = true;
+
+-- Coincidencia difusa (errores de tipeo: 'samsumg', 'iphne') sobre nombre y modelo
+CREATE INDEX IF NOT EXISTS ix_products_nombre_trgm
+    ON tbl_products USING GIN (lower(f_unaccent(nombre)) gin_trgm_ops)
+    WHERE activo = true;
+
+CREATE INDEX IF NOT EXISTS ix_products_modelo_trgm
+    ON tbl_products USING GIN (lower(f_unaccent(modelo)) gin_trgm_ops)
+    WHERE activo = true;
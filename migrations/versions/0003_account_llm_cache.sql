@@ -0,0 +1,5 @@
+-- 0003_account_llm_cache.sql
+-- Opt-out por cuenta de la caché de respuestas del agente (LLM_RESPONSE_CACHE_ENABLED)
+
+ALTER TABLE tbl_accounts
+    ADD COLUMN IF NOT EXISTS llm_cache_enabled BOOLEAN NOT NULL DEFAULT true;
@@ -0,0 +1,25 @@
+-- 0004_message_status.sql
+-- Estado de entrega de los mensajes salientes (sent / delivered / read / failed).
+-- Lo llena StatusIngestionPipeline en lotes; una fila por message_id de Gupshup.
+
+CREATE TABLE IF NOT EXISTS tbl_message_status (
+    message_id VARCHAR(255) PRIMARY KEY,
+    from_uid TEXT,                 -- número del negocio (display_phone_number)
+    client_uid TEXT,               -- destinatario (recipient_id)
+    app_id TEXT,
+    status VARCHAR(20) NOT NULL,
+    status_rank SMALLINT NOT NULL, -- 1 sent, 2 delivered, 3 read, 4 failed
+    error_code TEXT,
+    sent_at TIMESTAMP,
+    delivered_at TIMESTAMP,
+    read_at TIMESTAMP,
+    failed_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- Analítica de entrega por número y fecha
+CREATE INDEX IF NOT EXISTS ix_message_status_from_uid_sent
+    ON tbl_message_status (from_uid, sent_at);
+
+CREATE INDEX IF NOT EXISTS ix_message_status_status
+    ON tbl_message_status (status);
@@ -0,0 +1,61 @@
+-- 0005_gupshup_log_partitioned.sql
+-- tbl_gupshup_log particionada por mes (created_at) con el payload en JSONB comprimido (lz4).
+-- La retención (scripts/log_retention.py) exporta a .jsonl.gz y elimina particiones completas
+-- en vez de DELETE masivos, así vacuum y backups no cargan con el histórico.
+--
+-- La tabla anterior queda como tbl_gupshup_log_legacy (no se copia en línea para no
+-- bloquear el deploy); se archiva con: python -m scripts.log_retention --legacy
+
+ALTER TABLE IF EXISTS tbl_gupshup_log RENAME TO tbl_gupshup_log_legacy;
+ALTER INDEX IF EXISTS ix_gupshup_log_message_id RENAME TO ix_gupshup_log_legacy_message_id;
+
+CREATE SEQUENCE IF NOT EXISTS tbl_gupshup_log_id_seq_p;
+
+-- Los ids siguen después del último de la tabla anterior
+DO $$
+BEGIN
+    IF to_regclass('tbl_gupshup_log_legacy') IS NOT NULL THEN
+        PERFORM setval('tbl_gupshup_log_id_seq_p', (SELECT coalesce(max(id), 0) + 1 FROM tbl_gupshup_log_legacy), false);
+    END IF;
+END $$;
+
+CREATE TABLE tbl_gupshup_log (
+    id BIGINT NOT NULL DEFAULT nextval('tbl_gupshup_log_id_seq_p'),
+    from_uid TEXT,
+    event JSONB COMPRESSION lz4,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    message_id VARCHAR(255),
+    app_id TEXT,
+    type TEXT,
+    channel TEXT,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE tbl_gupshup_log_id_seq_p OWNED BY tbl_gupshup_log.id;
+
+CREATE INDEX IF NOT EXISTS ix_gupshup_log_message_id
+    ON tbl_gupshup_log (message_id);
+
+-- Crea (si falta) la partición mensual que contiene el día dado: tbl_gupshup_log_yYYYYmMM
+CREATE OR REPLACE FUNCTION f_gupshup_log_ensure_partition(day DATE) RETURNS TEXT AS
+$$
+DECLARE
+    month_start DATE := date_trunc('month', day)::date;
+    partition_name TEXT := 'tbl_gupshup_log_y' || to_char(month_start, 'YYYY') || 'm' || to_char(month_start, 'MM');
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE 'CREATE TABLE ' || quote_ident(partition_name)
+             || ' PARTITION OF tbl_gupshup_log FOR VALUES FROM (' || quote_literal(month_start)
+             || ') TO (' || quote_literal((month_start + INTERVAL '1 month')::date) || ')';
+    END IF;
+    RETURN partition_name;
+END
+$$ LANGUAGE plpgsql;
+
+-- Mes actual y los dos siguientes; el job de retención mantiene este margen
+SELECT f_gupshup_log_ensure_partition(current_date);
+SELECT f_gupshup_log_ensure_partition((current_date + INTERVAL '1 month')::date);
+SELECT f_gupshup_log_ensure_partition((current_date + INTERVAL '2 month')::date);
+
+-- Red de seguridad si el job no corrió: los inserts nunca fallan por falta de partición
+CREATE TABLE IF NOT EXISTS tbl_gupshup_log_default PARTITION OF tbl_gupshup_log DEFAULT;
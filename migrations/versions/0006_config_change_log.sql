@@ -0,0 +1,58 @@
+-- 0006_config_change_log.sql
+-- Registro de cambios de configuración (árbol de respuestas, chatbots, cuentas).
+-- Lo llenan triggers, así que cubre también ediciones hechas a mano en la BD.
+-- Cada worker lo consulta por id (ConfigChangePoller) e invalida solo la cuenta
+-- o el número afectado en sus cachés en memoria.
+
+CREATE TABLE IF NOT EXISTS tbl_config_change_log (
+    id BIGSERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    scope_key TEXT,                -- account_id (tbl_simple_answer) o from_uid (tbl_text_chatbot, tbl_accounts)
+    operation VARCHAR(10) NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- Poda por antigüedad (scripts/log_retention.py)
+CREATE INDEX IF NOT EXISTS ix_config_change_log_changed_at
+    ON tbl_config_change_log (changed_at);
+
+-- TG_ARGV[0]: columna que identifica el alcance del cambio
+CREATE OR REPLACE FUNCTION f_config_change_log() RETURNS TRIGGER AS
+$$
+DECLARE
+    old_scope TEXT;
+    new_scope TEXT;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_scope := to_jsonb(OLD) ->> TG_ARGV[0];
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_scope := to_jsonb(NEW) ->> TG_ARGV[0];
+    END IF;
+
+    INSERT INTO tbl_config_change_log (table_name, scope_key, operation)
+    VALUES (TG_TABLE_NAME, COALESCE(new_scope, old_scope), TG_OP);
+
+    -- Un UPDATE que mueve la fila de cuenta / número invalida también el alcance anterior
+    IF TG_OP = 'UPDATE' AND old_scope IS DISTINCT FROM new_scope THEN
+        INSERT INTO tbl_config_change_log (table_name, scope_key, operation)
+        VALUES (TG_TABLE_NAME, old_scope, TG_OP);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_simple_answer_change_log ON tbl_simple_answer;
+CREATE TRIGGER trg_simple_answer_change_log
+    AFTER INSERT OR UPDATE OR DELETE ON tbl_simple_answer
+    FOR EACH ROW EXECUTE PROCEDURE f_config_change_log('account_id');
+
+DROP TRIGGER IF EXISTS trg_text_chatbot_change_log ON tbl_text_chatbot;
+CREATE TRIGGER trg_text_chatbot_change_log
+    AFTER INSERT OR UPDATE OR DELETE ON tbl_text_chatbot
+    FOR EACH ROW EXECUTE PROCEDURE f_config_change_log('from_uid');
+
+DROP TRIGGER IF EXISTS trg_accounts_change_log ON tbl_accounts;
+CREATE TRIGGER trg_accounts_change_log
+    AFTER INSERT OR UPDATE OR DELETE ON tbl_accounts
+    FOR EACH ROW EXECUTE PROCEDURE f_config_change_log('from_uid');
@@ -0,0 +1,12 @@
+-- 0007_session_lease.sql
+-- Lease por sesión de chat (SESSION_LOCK_BACKEND=postgres, app/cluster/session_lock.py):
+-- un solo turno por conversación a la vez aunque dos réplicas reciban mensajes
+-- de la misma sesión durante un failover. Las filas viven lo que dura un turno.
+-- UNLOGGED: no pasa por el WAL; si la BD se reinicia, los leases se pierden
+-- (equivale a que todos vencieran).
+
+CREATE UNLOGGED TABLE IF NOT EXISTS tbl_session_lease (
+    session_key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,           -- host:pid:token del turno que lo tiene
+    expires_at TIMESTAMP NOT NULL
+);
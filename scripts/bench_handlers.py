@@ -0,0 +1,360 @@
+# scripts/bench_handlers.py
+"""
+Microbenchmarks del motor de handlers: HandlerRegistry.execute_handler /
+execute_request_action sobre DbAnswer, DbFlow, DbAsk, DbInteractiveTemplate y
+Dummy, con árboles de menú generados de 10, 1k y 100k nodos y los repositorios
+reemplazados por versiones en memoria (sin base de datos).
+
+Los resultados se guardan como baseline JSON; --compare falla (exit 1) si algún
+caso empeora más que --threshold respecto al baseline (por defecto se compara
+el mínimo de las rondas, el estadístico menos sensible al ruido). Los tiempos
+solo son comparables en la misma máquina: regenerar el baseline con
+--save-baseline antes de medir un cambio en otro equipo.
+
+Uso:
+    python -m scripts.bench_handlers
+    python -m scripts.bench_handlers --sizes 10,1000 --filter DbAnswer
+    python -m scripts.bench_handlers --save-baseline
+    python -m scripts.bench_handlers --compare --threshold 0.2
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "bench_handlers.json")
+DEFAULT_SIZES = [10, 1000, 100000]
+BENCH_ACCOUNT = "bench"
+MENU_ROOT = "/DbAnswerHandler/menu"
+BRANCHING = 10
+
+
+@dataclass
+class BenchAnswer:
+    """Mismos atributos que TblSimpleAnswer, sin el costo de instanciar el modelo ORM"""
+    id: int
+    handler_path: str
+    handler_path_to: str
+    message: str
+    account_id: Optional[str] = None
+    invalid_error: Optional[str] = None
+    redirect_on_error: Optional[str] = None
+    handler_path_to_description: Optional[str] = None
+    description: Optional[str] = None
+
+
+class InMemorySimpleAnswerRepository:
+    """Implementa los métodos de SimpleAnswerRepository que usan los handlers, indexados en dicts"""
+
+    def __init__(self, answers: List[BenchAnswer]):
+        self._by_path: Dict[Tuple[str, Optional[str]], BenchAnswer] = {}
+        self._by_account: Dict[Optional[str], List[BenchAnswer]] = {}
+        for answer in answers:
+            self._by_path.setdefault((answer.handler_path, answer.account_id), answer)
+            self._by_path.setdefault((answer.handler_path, None), answer)
+            self._by_account.setdefault(answer.account_id, []).append(answer)
+        for rows in self._by_account.values():
+            rows.sort(key=lambda a: a.handler_path)
+
+    def find_by_handler_path(self, handler_path: str, account_id: str = None) -> Optional[BenchAnswer]:
+        return self._by_path.get((handler_path, account_id or None))
+
+    def find_by_account_id(self, account_id: str) -> List[BenchAnswer]:
+        return list(self._by_account.get(account_id, []))
+
+    def find_children_paths(self, parent_path: str, account_id: str = None) -> List[BenchAnswer]:
+        pattern = f"{parent_path}/"
+        rows = self._by_account.get(account_id, []) if account_id else \
+            [a for rows in self._by_account.values() for a in rows]
+        return [a for a in rows if a.handler_path.startswith(pattern)
+                and "/" not in a.handler_path[len(pattern):]]
+
+
+class InMemoryTransferedChatRepository:
+    """save() de TransferedChatRepository: asigna id y guarda en una lista"""
+
+    def __init__(self):
+        self.saved: List[Any] = []
+
+    def save(self, transfered_chat):
+        transfered_chat.id = len(self.saved) + 1
+        self.saved.append(transfered_chat)
+        return transfered_chat
+
+
+@dataclass
+class MenuTree:
+    size: int
+    answers: List[BenchAnswer]
+    menu_path: str       # nodo interno más profundo: tiene opciones hijas
+    option: str          # opción válida de menu_path
+    leaf_path: str
+
+
+def generate_menu_tree(size: int, branching: int = BRANCHING) -> MenuTree:
+    """
+    Árbol de menú de `size` nodos en anchura (BFS) con `branching` opciones por
+    nodo. Los nodos internos apuntan a sí mismos (muestran su submenú) y las
+    hojas vuelven a la raíz, como un menú real.
+    """
+    answers: List[BenchAnswer] = []
+    children: Dict[str, List[str]] = {}
+    queue = deque([MENU_ROOT])
+    paths = [MENU_ROOT]
+    while queue and len(paths) < size:
+        parent = queue.popleft()
+        for option in range(1, branching + 1):
+            if len(paths) >= size:
+                break
+            path = f"{parent}/{option}"
+            paths.append(path)
+            children.setdefault(parent, []).append(path)
+            queue.append(path)
+
+    for i, path in enumerate(paths, start=1):
+        options = children.get(path, [])
+        menu_text = "\\n".join(f"{p.rsplit('/', 1)[1]}. Opción {p}" for p in options)
+        answers.append(BenchAnswer(
+            id=i,
+            handler_path=path,
+            handler_path_to=path if options else MENU_ROOT,
+            message=f"Menú {path}\\n{menu_text}" if options else f"Respuesta final de {path}",
+            account_id=BENCH_ACCOUNT,
+            invalid_error="Opción inválida, elige una opción del menú." if options else None,
+            description=f"Nodo {i}"
+        ))
+
+    menu_path = max(children, key=lambda p: (p.count("/"), p)) if children else MENU_ROOT
+    option = children[menu_path][0].rsplit("/", 1)[1] if children else ""
+    return MenuTree(size=len(answers), answers=answers, menu_path=menu_path,
+                    option=option, leaf_path=paths[-1])
+
+
+def build_registry(tree: MenuTree):
+    from app.handlers.handler_registry import HandlerRegistry
+    from app.handlers.db_answer_handler import DbAnswerHandler
+    from app.handlers.db_flow_handler import DbFlowHandler
+    from app.handlers.db_ask_handler import DbAskHandler
+    from app.handlers.db_interactive_template_handler import DbInteractiveTemplateHandler
+    from app.handlers.dummy_handler import DummyHandler
+
+    repo = InMemorySimpleAnswerRepository(tree.answers)
+    registry = HandlerRegistry()
+    with _quiet():
+        for handler in [DbAnswerHandler(repo), DbFlowHandler(repo), DbAskHandler(repo),
+                        DbInteractiveTemplateHandler(repo),
+                        DummyHandler(repo, InMemoryTransferedChatRepository())]:
+            registry.register(handler)
+    return registry
+
+
+def session_template(current_path: str) -> Dict[str, Any]:
+    """session_data con el tamaño típico de una sesión que ya pasó por varios handlers"""
+    return {
+        "current_path": current_path,
+        "current_handler": "DbAnswerHandler",
+        "last_message": "Menú anterior",
+        "handlerHistory": {"lastHandler": {"key": "DbAnswerHandler", "value": MENU_ROOT}},
+        "flow_data": {f"campo_{i}": f"valor {i}" for i in range(10)},
+        "user_answers": {
+            f"/DbAskHandler/pregunta/{i}": {"question": f"Pregunta {i}", "answer": f"Respuesta {i}",
+                                            "client_uid": "51999999999", "timestamp": "bench"}
+            for i in range(20)
+        }
+    }
+
+
+BENCH_CONTEXT = {
+    "account_id": BENCH_ACCOUNT,
+    "from_uid": "51900000000",
+    "client_uid": "51999999999",
+    "session_id": "bench-session",
+}
+
+HANDLER_NAMES = ["DbAnswerHandler", "DbFlowHandler", "DbAskHandler", "DbInteractiveTemplateHandler", "DummyHandler"]
+
+
+def build_cases(tree: MenuTree, registry) -> Dict[str, Callable[[], Any]]:
+    """Casos por handler: process (opción válida / inválida) y request_action"""
+    cases: Dict[str, Callable[[], Any]] = {}
+    menu_session = session_template(tree.menu_path)
+    leaf_session = session_template(tree.leaf_path)
+
+    # Cada llamada recibe una copia: DummyHandler modifica session_data en el lugar
+    for name in HANDLER_NAMES:
+        cases[f"{name}.process.hit"] = lambda n=name: registry.execute_handler(
+            n, tree.option, dict(menu_session), BENCH_CONTEXT)
+        cases[f"{name}.process.miss"] = lambda n=name: registry.execute_handler(
+            n, "opcion-inexistente", dict(menu_session), BENCH_CONTEXT)
+        cases[f"{name}.request_action"] = lambda n=name: registry.execute_request_action(
+            n, 0, BENCH_CONTEXT["from_uid"], BENCH_CONTEXT["client_uid"], dict(leaf_session), BENCH_CONTEXT)
+
+    cases["HandlerRegistry.unknown_handler"] = lambda: registry.execute_handler(
+        "NoExisteHandler", tree.option, dict(menu_session), BENCH_CONTEXT)
+    return cases
+
+
+class _NullWriter:
+    """Descarta los print() de los handlers: se mide el formateo, no la escritura a consola"""
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _quiet():
+    return contextlib.redirect_stdout(_NullWriter())
+
+
+@dataclass
+class BenchResult:
+    name: str
+    iterations: int
+    rounds: int
+    samples_us: List[float] = field(default_factory=list)
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def median_us(self) -> float:
+        return statistics.median(self.samples_us)
+
+    @property
+    def min_us(self) -> float:
+        return min(self.samples_us)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "median_us": round(self.median_us, 3),
+            "min_us": round(self.min_us, 3),
+            "iterations": self.iterations,
+            "rounds": self.rounds,
+            **self.extra,
+        }
+
+
+def measure(name: str, fn: Callable[[], Any], rounds: int, min_round_seconds: float) -> BenchResult:
+    """Calibra iteraciones para que cada ronda dure al menos min_round_seconds (como pytest-benchmark)"""
+    with _quiet():
+        fn()  # warm-up
+        iterations = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_round_seconds or iterations >= 1_000_000:
+                break
+            iterations = max(iterations * 2, int(iterations * min_round_seconds / max(elapsed, 1e-9)))
+
+        result = BenchResult(name=name, iterations=iterations, rounds=rounds)
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            result.samples_us.append((time.perf_counter() - started) / iterations * 1e6)
+    return result
+
+
+def run(sizes: List[int], name_filter: Optional[str], rounds: int, min_round_seconds: float) -> Dict[str, BenchResult]:
+    results: Dict[str, BenchResult] = {}
+    for size in sizes:
+        started = time.perf_counter()
+        tree = generate_menu_tree(size)
+        registry = build_registry(tree)
+        print(f"🌳 BENCH: Árbol de {tree.size} nodos generado en {time.perf_counter() - started:.2f}s "
+              f"(menú {tree.menu_path})")
+
+        for case_name, fn in build_cases(tree, registry).items():
+            name = f"{case_name}[{size}]"
+            if name_filter and name_filter not in name:
+                continue
+            result = measure(name, fn, rounds, min_round_seconds)
+            results[name] = result
+            print(f"  - {name:<52} {result.median_us:>12.1f} µs (min {result.min_us:.1f}, "
+                  f"{result.iterations} x {result.rounds})")
+    return results
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path: str, results: Dict[str, BenchResult]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {name: result.to_dict() for name, result in sorted(results.items())},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"💾 BENCH: Baseline guardado en {path} ({len(results)} casos)")
+
+
+def compare(results: Dict[str, BenchResult], baseline: Dict[str, Dict[str, Any]], threshold: float,
+            stat: str = "min") -> List[str]:
+    """Casos cuyo `stat` (min o median) supera al del baseline en más de threshold (0.2 = 20%)"""
+    regressions = []
+    key = f"{stat}_us"
+    print(f"\n📊 BENCH: Comparación con baseline por {stat} (umbral {threshold:.0%})")
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            print(f"  - {name:<52} sin baseline")
+            continue
+        current = getattr(result, key)
+        change = current / base[key] - 1 if base[key] else 0.0
+        regressed = change > threshold
+        marker = "❌" if regressed else ("✅" if change < -threshold else "  ")
+        print(f"{marker}- {name:<52} {base[key]:>10.1f} -> {current:>10.1f} µs ({change:+.1%})")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def _parse_sizes(value: str) -> List[int]:
+    return [int(s) for s in value.split(",") if s.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks de HandlerRegistry y handlers de BD")
+    parser.add_argument("--sizes", type=_parse_sizes, default=DEFAULT_SIZES,
+                        help="Tamaños de árbol separados por coma (default 10,1000,100000)")
+    parser.add_argument("--filter", help="Solo casos cuyo nombre contiene este texto")
+    parser.add_argument("--rounds", type=int, default=7, help="Rondas por caso (se reporta la mediana)")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Duración mínima de cada ronda (s)")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Guarda el resultado como baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="Compara con un baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regresión tolerada en --compare (0.2 = 20%%)")
+    parser.add_argument("--stat", choices=["min", "median"], default="min",
+                        help="Estadístico comparado; min es el más estable en máquinas compartidas")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.filter, args.rounds, args.min_time)
+
+    regressions: List[str] = []
+    if args.compare:
+        regressions = compare(results, load_baseline(args.compare), args.threshold, args.stat)
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+
+    if regressions:
+        print(f"\n❌ BENCH: {len(regressions)} casos con regresión sobre {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# scripts/bench_imports.py
+"""
+Tiempo de import y RSS de los módulos de arranque, cada ronda en un proceso
+nuevo (sin caché de sys.modules), con AI_STACK_ENABLED=true y false.
+
+Mide lo que paga un worker al arrancar y cuánto agrega cargar LangChain en el
+primer turno de IA. Comparte formato de baseline y --compare con
+scripts/bench_handlers.py.
+
+Uso:
+    python -m scripts.bench_imports
+    python -m scripts.bench_imports --save-baseline
+    python -m scripts.bench_imports --compare --threshold 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+from scripts.bench_handlers import BenchResult, compare, load_baseline, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "bench_imports.json")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (nombre del caso, módulo, AI_STACK_ENABLED)
+IMPORT_CASES = [
+    ("webhook.ai", "app.webhook", "true"),
+    ("webhook.handlers_only", "app.webhook", "false"),
+    ("gupshup_service.ai", "app.services.gupshup_service", "true"),
+    ("gupshup_service.handlers_only", "app.services.gupshup_service", "false"),
+    ("handler_service.handlers_only", "app.services.handler_service", "false"),
+    ("langchain_service.first_use", "app.services.langchain_service", "true"),
+]
+
+_PROBE = """
+import importlib, json, resource, sys, time, warnings
+warnings.simplefilter("ignore")
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+    "langchain_loaded": any(m == "langchain" or m.startswith("langchain.") for m in sys.modules),
+}))
+"""
+
+# El engine se crea al importar config.database: valores de relleno, no se conecta
+_DB_ENV = {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_USER": "bench", "DB_PASSWORD": "bench", "DB_NAME": "bench"}
+
+
+def probe(module: str, ai_stack: str) -> Dict[str, float]:
+    env = dict(os.environ)
+    for key, value in _DB_ENV.items():
+        env.setdefault(key, value)
+    env["AI_STACK_ENABLED"] = ai_stack
+    env["PYTHONPATH"] = PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    completed = subprocess.run([sys.executable, "-c", _PROBE, module], cwd=PROJECT_ROOT, env=env,
+                               capture_output=True, text=True, timeout=120)
+    if completed.returncode != 0:
+        last_line = (completed.stderr.strip().splitlines() or ["error desconocido"])[-1]
+        raise RuntimeError(last_line)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(rounds: int, name_filter: Optional[str]) -> Dict[str, BenchResult]:
+    results: Dict[str, BenchResult] = {}
+    for name, module, ai_stack in IMPORT_CASES:
+        if name_filter and name_filter not in name:
+            continue
+        try:
+            probe(module, ai_stack)  # warm-up: compila .pyc y calienta la caché de disco
+            samples = [probe(module, ai_stack) for _ in range(rounds)]
+        except Exception as e:
+            print(f"  - {name:<36} omitido: {str(e)[:120]}")
+            continue
+
+        result = BenchResult(name=name, iterations=1, rounds=rounds,
+                             samples_us=[s["seconds"] * 1e6 for s in samples])
+        result.extra = {
+            "max_rss_kb": max(s["max_rss_kb"] for s in samples),
+            "modules": samples[-1]["modules"],
+            "langchain_loaded": samples[-1]["langchain_loaded"],
+        }
+        results[name] = result
+        print(f"  - {name:<36} {result.median_us / 1000:>8.0f} ms (min {result.min_us / 1000:.0f}) "
+              f"RSS {result.extra['max_rss_kb'] / 1024:>6.0f} MB, {result.extra['modules']} módulos"
+              f"{', LangChain cargado' if result.extra['langchain_loaded'] else ''}")
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Tiempo de import y RSS de arranque (con y sin IA)")
+    parser.add_argument("--rounds", type=int, default=5, help="Procesos por caso (se reporta la mediana)")
+    parser.add_argument("--filter", help="Solo casos cuyo nombre contiene este texto")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Guarda el resultado como baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="Compara con un baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regresión tolerada en --compare (0.2 = 20%%)")
+    parser.add_argument("--stat", choices=["min", "median"], default="min")
+    args = parser.parse_args(argv)
+
+    print(f"⏱️ BENCH: Imports en procesos nuevos ({args.rounds} rondas por caso)")
+    results = run(args.rounds, args.filter)
+
+    regressions: List[str] = []
+    if args.compare:
+        regressions = compare(results, load_baseline(args.compare), args.threshold, args.stat)
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+
+    if regressions:
+        print(f"\n❌ BENCH: {len(regressions)} casos con regresión sobre {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# scripts/log_retention.py
+"""
+Retención de tbl_gupshup_log (particionada por mes, migración 0005).
+
+- Crea por adelantado las particiones de los próximos meses.
+- Las particiones más antiguas que LOG_RETENTION_MONTHS se exportan a
+  LOG_ARCHIVE_DIR/<partición>.jsonl.gz (una fila JSON por línea) y se eliminan
+  con DROP TABLE: sin DELETE masivos ni bloat para vacuum.
+
+Pensado para correr una vez al día (cron):
+    python -m scripts.log_retention
+    python -m scripts.log_retention --keep-months 6 --no-export
+    python -m scripts.log_retention --legacy      # archiva tbl_gupshup_log_legacy
+    python -m scripts.log_retention --dry-run
+
+También poda tbl_config_change_log (migración 0006): los workers solo leen los
+últimos segundos, así que basta con conservar CONFIG_CHANGE_LOG_RETENTION_DAYS.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+from datetime import date
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+
+LOG_RETENTION_MONTHS = int(os.getenv('LOG_RETENTION_MONTHS', '3'))
+LOG_ARCHIVE_DIR = os.getenv('LOG_ARCHIVE_DIR', 'archive/gupshup_log')
+LOG_PARTITIONS_AHEAD = int(os.getenv('LOG_PARTITIONS_AHEAD', '2'))
+CONFIG_CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CONFIG_CHANGE_LOG_RETENTION_DAYS', '7'))
+
+EXPORT_BATCH_SIZE = 5000
+PARTITION_NAME_RE = re.compile(r"^tbl_gupshup_log_y(\d{4})m(\d{2})$")
+LEGACY_TABLE = "tbl_gupshup_log_legacy"
+
+LIST_PARTITIONS = """
+SELECT child.relname AS name
+FROM pg_inherits
+JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = 'tbl_gupshup_log'
+ORDER BY child.relname
+"""
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def list_partitions(conn) -> List[Tuple[str, date]]:
+    """(nombre, primer día del mes) de las particiones mensuales"""
+    partitions = []
+    for row in conn.execute(text(LIST_PARTITIONS)):
+        match = PARTITION_NAME_RE.match(row.name)
+        if match:
+            partitions.append((row.name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return partitions
+
+
+def ensure_partitions(engine, months_ahead: int, dry_run: bool) -> None:
+    today = date.today()
+    for offset in range(months_ahead + 1):
+        day = add_months(today, offset)
+        if dry_run:
+            print(f"📝 RETENTION: Aseguraría partición para {day:%Y-%m}")
+            continue
+        try:
+            with engine.begin() as conn:
+                name = conn.execute(text("SELECT f_gupshup_log_ensure_partition(:day)"), {"day": day}).scalar()
+            print(f"✅ RETENTION: Partición {name} lista")
+        except Exception as e:
+            # Ocurre si tbl_gupshup_log_default ya tiene filas de ese mes (el job no corrió a tiempo)
+            print(f"❌ RETENTION: No se pudo crear la partición de {day:%Y-%m}: {str(e)}")
+
+
+def export_table(engine, table: str, archive_dir: str) -> Tuple[str, int]:
+    """
+    Exporta la tabla a <archive_dir>/<tabla>.jsonl.gz en streaming (cursor de
+    servidor). Se escribe a un .tmp y se renombra al final: nunca queda un
+    archivo a medias con el nombre definitivo.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{table}.jsonl.gz")
+    tmp_path = f"{path}.tmp"
+    rows = 0
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(text(
+            f"SELECT id, created_at, message_id, from_uid, type, app_id, channel, event "
+            f"FROM {table} ORDER BY id"
+        ))
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for row in result:
+                event = row.event
+                if isinstance(event, str):
+                    # tbl_gupshup_log_legacy guarda el payload como texto
+                    try:
+                        event = json.loads(event)
+                    except ValueError:
+                        pass
+                f.write(json.dumps({
+                    "id": row.id,
+                    "created_at": row.created_at.isoformat() if row.created_at else None,
+                    "message_id": row.message_id,
+                    "from_uid": row.from_uid,
+                    "type": row.type,
+                    "app_id": row.app_id,
+                    "channel": row.channel,
+                    "event": event
+                }, ensure_ascii=False, default=str))
+                f.write("\n")
+                rows += 1
+
+    os.replace(tmp_path, path)
+    return path, rows
+
+
+def drop_table(engine, table: str, partition: bool) -> None:
+    with engine.begin() as conn:
+        if partition:
+            # DETACH primero: el DROP no toma lock sobre la tabla padre mientras dura
+            conn.execute(text(f"ALTER TABLE tbl_gupshup_log DETACH PARTITION {table}"))
+        conn.execute(text(f"DROP TABLE {table}"))
+
+
+def archive(engine, table: str, partition: bool, args) -> None:
+    if args.dry_run:
+        print(f"📝 RETENTION: Archivaría {table}{'' if args.export else ' (sin exportar)'}")
+        return
+
+    if args.export:
+        started = time.perf_counter()
+        path, rows = export_table(engine, table, args.archive_dir)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"📦 RETENTION: {table} -> {path} ({rows} filas, {size_mb:.1f} MB, "
+              f"{time.perf_counter() - started:.1f}s)")
+
+    drop_table(engine, table, partition)
+    print(f"🗑️ RETENTION: {table} eliminada")
+
+
+def prune_config_changes(engine, keep_days: int, dry_run: bool) -> None:
+    if dry_run:
+        print(f"📝 RETENTION: Podaría tbl_config_change_log anterior a {keep_days} días")
+        return
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass('tbl_config_change_log')")).scalar() is None:
+            return
+        deleted = conn.execute(text(
+            "DELETE FROM tbl_config_change_log WHERE changed_at < now() - make_interval(days => :days)"
+        ), {"days": keep_days}).rowcount
+    print(f"🗑️ RETENTION: {deleted} cambios de configuración anteriores a {keep_days} días eliminados")
+
+
+def run(engine, args) -> None:
+    ensure_partitions(engine, args.ahead, args.dry_run)
+
+    cutoff = add_months(date.today(), -args.keep_months)
+    with engine.connect() as conn:
+        expired = [name for name, month in list_partitions(conn) if month < cutoff]
+        legacy_exists = conn.execute(text("SELECT to_regclass(:t)"), {"t": LEGACY_TABLE}).scalar() is not None
+
+    if not expired:
+        print(f"✅ RETENTION: Sin particiones anteriores a {cutoff:%Y-%m}")
+    for name in expired:
+        archive(engine, name, partition=True, args=args)
+
+    if args.legacy:
+        if legacy_exists:
+            archive(engine, LEGACY_TABLE, partition=False, args=args)
+        else:
+            print(f"⏭️ RETENTION: {LEGACY_TABLE} no existe")
+
+    prune_config_changes(engine, args.config_changes_days, args.dry_run)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Retención y archivo de tbl_gupshup_log")
+    parser.add_argument("--keep-months", type=int, default=LOG_RETENTION_MONTHS,
+                        help="Meses completos que se conservan además del actual")
+    parser.add_argument("--ahead", type=int, default=LOG_PARTITIONS_AHEAD,
+                        help="Meses futuros con partición creada por adelantado")
+    parser.add_argument("--archive-dir", default=LOG_ARCHIVE_DIR)
+    parser.add_argument("--no-export", dest="export", action="store_false",
+                        help="Elimina sin exportar a .jsonl.gz")
+    parser.add_argument("--legacy", action="store_true", help="Archiva también tbl_gupshup_log_legacy")
+    parser.add_argument("--config-changes-days", type=int, default=CONFIG_CHANGE_LOG_RETENTION_DAYS,
+                        help="Días que se conservan en tbl_config_change_log")
+    parser.add_argument("--dry-run", action="store_true", help="Solo muestra qué haría")
+    args = parser.parse_args(argv)
+
+    from config.database import engine
+    run(engine, args)
+
+
+if __name__ == "__main__":
+    main()
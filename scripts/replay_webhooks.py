@@ -0,0 +1,380 @@
+# scripts/replay_webhooks.py
+"""
+Reproduce webhooks guardados en tbl_gupshup_log (o exportados por
+scripts/log_retention.py a .jsonl.gz) a través de GupshupService.process_webhook,
+con Gupshup y OpenAI reemplazados por stand-ins locales (scripts/stand_ins.py).
+
+Mide throughput y latencia por evento y compara las respuestas del bot con las
+que se enviaron originalmente (tbl_message).
+
+IMPORTANTE: el replay escribe sesiones, mensajes y logs como el tráfico real.
+Correrlo contra una copia de la base de datos, nunca contra producción.
+
+Uso:
+    python -m scripts.replay_webhooks --since 2026-03-01 --until 2026-03-02 --account-id coolbox
+    python -m scripts.replay_webhooks --file archive/gupshup_log/tbl_gupshup_log_y2026m01.jsonl.gz --speed 10
+    python -m scripts.replay_webhooks --since 2026-03-01 --speed 0 --report replay.jsonl
+    python -m scripts.replay_webhooks --since 2026-03-01 --query-budget 5   # exit 1 si algún turno lo excede
+    python -m scripts.replay_webhooks --since 2026-03-01 --burst 3 --lock-backend postgres
+
+--burst N entrega cada mensaje N veces a la vez (como dos réplicas procesando el
+mismo webhook tras un failover) para probar el lease por sesión
+(app/cluster/session_lock.py): exit 1 si dos turnos de una sesión se solapan.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from scripts.stand_ins import GupshupStandIn, OpenAIStandIn
+
+
+@dataclass
+class ReplayEvent:
+    created_at: Optional[datetime]
+    payload: Dict[str, Any]
+    from_uid: Optional[str] = None
+
+
+@dataclass
+class ReplayStats:
+    events: int = 0
+    messages: int = 0
+    statuses: int = 0
+    errors: int = 0
+    same: int = 0
+    changed: int = 0
+    no_original: int = 0
+    wall_seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    queries: List[int] = field(default_factory=list)
+    budget_exceeded: int = 0
+    burst_copies: int = 0
+    burst_errors: int = 0
+
+
+def _parse_payload(event: Any) -> Optional[Dict[str, Any]]:
+    # tbl_gupshup_log_legacy y versiones anteriores guardan el payload como texto
+    if isinstance(event, str):
+        try:
+            event = json.loads(event)
+        except ValueError:
+            return None
+    return event if isinstance(event, dict) else None
+
+
+def iter_db_events(db, since: Optional[datetime], until: Optional[datetime],
+                   from_uids: Optional[List[str]]) -> Iterator[ReplayEvent]:
+    """Eventos de tbl_gupshup_log en orden cronológico, leídos en lotes"""
+    from app.models.gupshup_log import TblGupshupLog
+
+    query = db.query(TblGupshupLog).filter(TblGupshupLog.channel == "whatsapp")
+    if since is not None:
+        query = query.filter(TblGupshupLog.created_at >= since)
+    if until is not None:
+        query = query.filter(TblGupshupLog.created_at < until)
+    if from_uids:
+        query = query.filter(TblGupshupLog.from_uid.in_(from_uids))
+
+    for log in query.order_by(TblGupshupLog.created_at, TblGupshupLog.id).yield_per(500):
+        payload = _parse_payload(log.event)
+        if payload:
+            yield ReplayEvent(log.created_at, payload, log.from_uid)
+
+
+def iter_file_events(path: str, since: Optional[datetime], until: Optional[datetime],
+                     from_uids: Optional[List[str]]) -> Iterator[ReplayEvent]:
+    """Eventos de un .jsonl(.gz) exportado por log_retention (una fila por línea)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("channel") not in (None, "whatsapp"):
+                continue
+            created_at = datetime.fromisoformat(row["created_at"]) if row.get("created_at") else None
+            if since is not None and created_at is not None and created_at < since:
+                continue
+            if until is not None and created_at is not None and created_at >= until:
+                continue
+            if from_uids and row.get("from_uid") not in from_uids:
+                continue
+            payload = _parse_payload(row.get("event"))
+            if payload:
+                yield ReplayEvent(created_at, payload, row.get("from_uid"))
+
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+def original_replies(db, payload: Dict[str, Any], before: datetime) -> Optional[List[str]]:
+    """Textos que el bot envió originalmente al primer mensaje del payload (None si no está en tbl_message)"""
+    from app.repositories.message_repository import MessageRepository
+    from app.services.webhook_parser import extract_webhook_events
+
+    messages = [e for e in extract_webhook_events(payload) if e.is_user_message and e.message_id]
+    if not messages:
+        return None
+    repo = MessageRepository(db)
+    inbound = repo.find_first_by_message_id(messages[0].message_id)
+    if inbound is None or inbound.created_at is None:
+        return None
+    return [m.message for m in repo.find_bot_replies(inbound, before=before)]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _deliver_copy(payload: Dict[str, Any]) -> bool:
+    """Una entrega extra del mismo webhook (--burst), con su propia sesión de BD"""
+    from config.database import db_session_scope
+    from app.webhook import build_gupshup_service
+
+    try:
+        with db_session_scope() as db:
+            result = build_gupshup_service(db).process_webhook(payload)
+        return all(r.get("success", False) for r in result.get("results") or [result])
+    except Exception as e:
+        print(f"❌ REPLAY: Error en copia del burst: {str(e)[:120]}")
+        return False
+
+
+def replay(events: Iterator[ReplayEvent], gupshup: GupshupStandIn, args) -> ReplayStats:
+    from config.database import db_session_scope
+    from app.services.status_pipeline import status_pipeline
+    from app.services.webhook_parser import extract_webhook_events, is_status_only_payload
+    from app.utils.metrics import metrics
+    from app.utils.query_stats import track_queries
+    from app.webhook import build_gupshup_service
+
+    burst_pool = ThreadPoolExecutor(max_workers=args.burst - 1) if args.burst > 1 else None
+    stats = ReplayStats()
+    replay_started = datetime.now()
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    first_ts: Optional[datetime] = None
+    wall_start = time.perf_counter()
+
+    try:
+        for event in events:
+            if args.limit and stats.events >= args.limit:
+                break
+
+            # Compresión de tiempo: respeta la separación original dividida por --speed
+            if args.speed > 0 and event.created_at is not None:
+                first_ts = first_ts or event.created_at
+                target = wall_start + (event.created_at - first_ts).total_seconds() / args.speed
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            stats.events += 1
+            payload = event.payload
+
+            if is_status_only_payload(payload):
+                stats.statuses += 1
+                if not args.skip_statuses:
+                    status_pipeline.add(extract_webhook_events(payload))
+                continue
+
+            sent_index = len(gupshup.sent)
+            with db_session_scope() as db:
+                originals = original_replies(db, payload, replay_started) if args.diff else None
+                exceeded_before = metrics.snapshot()["counters"].get("db.query_budget.exceeded", 0)
+                # Las copias del burst compiten por el lease de la sesión con la entrega principal
+                copies = [burst_pool.submit(_deliver_copy, payload) for _ in range(args.burst - 1)] if burst_pool else []
+                started = time.perf_counter()
+                with track_queries() as query_stats:
+                    try:
+                        result = build_gupshup_service(db).process_webhook(payload)
+                        ok = result.get("success", False)
+                    except Exception as e:
+                        result, ok = {"error": str(e)}, False
+            stats.latencies.append(time.perf_counter() - started)
+            for copy in copies:
+                stats.burst_copies += 1
+                if not copy.result():
+                    stats.burst_errors += 1
+            stats.queries.append(query_stats.count)
+            over_budget = metrics.snapshot()["counters"].get("db.query_budget.exceeded", 0) > exceeded_before
+            if over_budget:
+                stats.budget_exceeded += 1
+            stats.messages += 1
+            if not ok:
+                stats.errors += 1
+
+            # Con --burst también cuentan las respuestas de las copias
+            replies = [sent["text"] for sent in gupshup.sent_since(sent_index)]
+            if originals is None:
+                verdict = "no_original"
+                stats.no_original += 1
+            elif [_normalize(r) for r in replies] == [_normalize(o) for o in originals]:
+                verdict = "same"
+                stats.same += 1
+            else:
+                verdict = "changed"
+                stats.changed += 1
+
+            if report is not None:
+                report.write(json.dumps({
+                    "created_at": event.created_at.isoformat() if event.created_at else None,
+                    "from_uid": event.from_uid,
+                    "verdict": verdict,
+                    "success": ok,
+                    "error": result.get("error"),
+                    "latency_ms": round(stats.latencies[-1] * 1000, 1),
+                    "db_queries": query_stats.count,
+                    "over_query_budget": over_budget,
+                    "original": originals,
+                    "replayed": replies
+                }, ensure_ascii=False, default=str) + "\n")
+
+            if args.verbose or (verdict == "changed" and args.show_diffs):
+                print(f"🔁 REPLAY [{verdict}] {event.from_uid} @ {event.created_at}: {replies} vs {originals}")
+    finally:
+        if report is not None:
+            report.close()
+        if burst_pool is not None:
+            burst_pool.shutdown(wait=True)
+        status_pipeline.flush()
+
+    stats.wall_seconds = time.perf_counter() - wall_start
+    return stats
+
+
+def session_lock_summary() -> Dict[str, Any]:
+    """Métricas del lease por sesión acumuladas durante el replay"""
+    from app.cluster.session_lock import session_lock
+    from app.utils.metrics import metrics
+
+    snapshot = metrics.snapshot()
+    counters = snapshot["counters"]
+    return {
+        "backend": session_lock.status()["backend"],
+        "wait": snapshot["timers"].get("session_lock.wait", {}),
+        "contended": counters.get("session_lock.contended", 0),
+        "timeouts": counters.get("session_lock.timeout", 0),
+        "overlaps": counters.get("session_lock.overlap", 0),
+        "lost": counters.get("session_lock.lost", 0),
+    }
+
+
+def print_summary(stats: ReplayStats, openai: Optional[OpenAIStandIn],
+                  lock: Optional[Dict[str, Any]] = None) -> None:
+    wall = stats.wall_seconds or 1e-9
+    print("\n📊 REPLAY: Resumen")
+    print(f"  - Eventos: {stats.events} ({stats.messages} con mensajes, {stats.statuses} solo status)")
+    print(f"  - Tiempo: {wall:.1f}s - {stats.events / wall:.1f} eventos/s, {stats.messages / wall:.1f} mensajes/s")
+    print(f"  - Latencia por mensaje: p50 {_percentile(stats.latencies, 0.5) * 1000:.0f} ms, "
+          f"p95 {_percentile(stats.latencies, 0.95) * 1000:.0f} ms, "
+          f"p99 {_percentile(stats.latencies, 0.99) * 1000:.0f} ms")
+    print(f"  - Queries por webhook: p50 {_percentile(stats.queries, 0.5):.0f}, "
+          f"p95 {_percentile(stats.queries, 0.95):.0f}, máx {max(stats.queries, default=0)}")
+    if stats.budget_exceeded:
+        print(f"  - ❌ Turnos sobre el presupuesto de queries: {stats.budget_exceeded}")
+    print(f"  - Errores: {stats.errors}")
+    print(f"  - Respuestas: {stats.same} iguales, {stats.changed} distintas, {stats.no_original} sin original")
+    if stats.burst_copies:
+        print(f"  - Copias del burst: {stats.burst_copies} ({stats.burst_errors} con error)")
+    if lock is not None:
+        wait = lock["wait"]
+        print(f"  - Lease por sesión ({lock['backend']}): espera prom {wait.get('avg_seconds', 0) * 1000:.0f} ms, "
+              f"máx {wait.get('max_seconds', 0) * 1000:.0f} ms en {wait.get('count', 0)} turnos - "
+              f"{lock['contended']} con espera, {lock['timeouts']} timeouts, {lock['lost']} perdidos")
+        if lock["overlaps"]:
+            print(f"  - ❌ Turnos solapados en una misma sesión: {lock['overlaps']}")
+    if openai is not None:
+        print(f"  - Llamadas al stand-in de OpenAI: {openai.completions}")
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay de webhooks de Gupshup contra stand-ins locales")
+    parser.add_argument("--file", help="Archivo .jsonl(.gz) exportado; por defecto lee tbl_gupshup_log")
+    parser.add_argument("--since", help="Desde (ISO, p.ej. 2026-03-01 o 2026-03-01T10:00)")
+    parser.add_argument("--until", help="Hasta, excluyente (ISO)")
+    parser.add_argument("--account-id", action="append", help="Solo eventos de estas cuentas (repetible)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Compresión de tiempo: 1 = tiempo real, 10 = 10x, 0 = lo más rápido posible")
+    parser.add_argument("--limit", type=int, default=0, help="Máximo de eventos")
+    parser.add_argument("--skip-statuses", action="store_true", help="No ingesta los payloads de status")
+    parser.add_argument("--no-diff", dest="diff", action="store_false", help="No compara con las respuestas originales")
+    parser.add_argument("--report", help="Escribe el detalle por mensaje en este .jsonl")
+    parser.add_argument("--show-diffs", action="store_true", help="Imprime las respuestas distintas")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--real-openai", action="store_true", help="Usa OpenAI real en vez del stand-in")
+    parser.add_argument("--gupshup-latency", type=float, default=0.05, help="Latencia simulada de Gupshup (s)")
+    parser.add_argument("--openai-latency", type=float, default=0.8, help="Latencia simulada de OpenAI (s)")
+    parser.add_argument("--query-budget", type=int, default=0,
+                        help="Máximo de queries por turno de handlers; si se excede, exit 1")
+    parser.add_argument("--burst", type=int, default=1,
+                        help="Entregas simultáneas de cada mensaje; si dos turnos de una sesión se solapan, exit 1")
+    parser.add_argument("--lock-backend", choices=["memory", "postgres", "none"],
+                        help="Backend del lease por sesión (SESSION_LOCK_BACKEND)")
+    args = parser.parse_args(argv)
+
+    # Los stand-ins deben configurarse antes de importar la app (lee el entorno al importar)
+    gupshup = GupshupStandIn(latency_seconds=args.gupshup_latency).start()
+    os.environ["GUPSHUP_API_BASE_URL"] = gupshup.url
+    openai = None
+    if not args.real_openai:
+        openai = OpenAIStandIn(latency_seconds=args.openai_latency).start()
+        os.environ["OPENAI_BASE_URL"] = f"{openai.url}/v1"
+        os.environ["OPENAI_API_KEY"] = "stand-in"
+    os.environ["LLM_STREAMING_ENABLED"] = "false"   # Un envío por respuesta: comparable con el original
+    os.environ["LLM_ACK_AFTER_SECONDS"] = "0"
+    if args.query_budget:
+        os.environ["DB_QUERY_BUDGET_PER_TURN"] = str(args.query_budget)
+    if args.lock_backend:
+        os.environ["SESSION_LOCK_BACKEND"] = args.lock_backend
+    print(f"🧪 REPLAY: Gupshup stand-in en {gupshup.url}"
+          + (f", OpenAI stand-in en {openai.url}" if openai else ", OpenAI real"))
+
+    from config.database import get_db_session
+    from app.models.accounts import TblAccounts
+
+    since, until = _parse_datetime(args.since), _parse_datetime(args.until)
+    db = get_db_session()
+    try:
+        from_uids = None
+        if args.account_id:
+            from_uids = [a.from_uid for a in db.query(TblAccounts).filter(
+                TblAccounts.account_id.in_(args.account_id)) if a.from_uid]
+            if not from_uids:
+                print(f"❌ REPLAY: Sin números para las cuentas {args.account_id}")
+                return
+
+        if args.file:
+            events = iter_file_events(args.file, since, until, from_uids)
+        else:
+            events = iter_db_events(db, since, until, from_uids)
+
+        stats = replay(events, gupshup, args)
+    finally:
+        db.close()
+        gupshup.stop()
+        if openai is not None:
+            openai.stop()
+
+    lock = session_lock_summary()
+    print_summary(stats, openai, lock)
+    # Con backend none los solapes son esperables: sirve de línea base para comparar
+    if stats.budget_exceeded or (lock["overlaps"] and lock["backend"] != "NullLeaseBackend"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
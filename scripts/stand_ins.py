@@ -0,0 +1,207 @@
+# scripts/stand_ins.py
+"""
+Servidores HTTP locales que reemplazan a Gupshup y OpenAI durante replays y
+benchmarks. Registran lo que la app envía y responden con latencia configurable.
+
+La app los usa vía GUPSHUP_API_BASE_URL y OPENAI_BASE_URL (ver replay_webhooks.py).
+"""
+import abc
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+ANALYZER_MARKER = "RESPONDE SOLO EL JSON"
+SUMMARY_MARKER = "Actualiza el resumen"
+
+# Estrategia fija para el analizador del HybridOrchestrator
+STAND_IN_STRATEGY = {
+    "action": "PROCESS_MESSAGE",
+    "handler": "DbAnswerHandler",
+    "reasoning": "stand-in",
+    "confidence": 1.0
+}
+
+
+def extract_sent_text(payload: Dict[str, Any]) -> str:
+    """Texto visible de un mensaje enviado a Gupshup (texto, interactivo, template)"""
+    message_type = payload.get("type")
+    if message_type == "text":
+        return (payload.get("text") or {}).get("body", "")
+    if message_type == "interactive":
+        interactive = payload.get("interactive") or {}
+        return (interactive.get("body") or {}).get("text", "") or json.dumps(interactive, ensure_ascii=False)
+    return json.dumps(payload, ensure_ascii=False)
+
+
+class _StandInServer(abc.ABC):
+    """Servidor en un hilo daemon; url queda disponible después de start()"""
+
+    def __init__(self, latency_seconds: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_StandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @abc.abstractmethod
+    def handle(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+        """(status, cuerpo JSON) para un request a la API reemplazada"""
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _dispatch(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                body = None
+                if raw and "json" in content_type:
+                    body = json.loads(raw)
+                elif raw:
+                    body = {"raw": raw.decode("utf-8", "replace")}
+
+                with stand_in._lock:
+                    stand_in.requests += 1
+                if stand_in.latency_seconds:
+                    time.sleep(stand_in.latency_seconds)
+
+                status, response = stand_in.handle(method, self.path, body)
+                if isinstance(response, list):
+                    # Server-sent events (streaming de OpenAI)
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for event in response:
+                        self.wfile.write(f"data: {event}\n\n".encode("utf-8"))
+                    return
+                data = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, format, *args):
+                pass  # Sin una línea por request en la consola
+
+        return Handler
+
+
+class GupshupStandIn(_StandInServer):
+    """Imita login, token de app y /v3/message de la API partner de Gupshup"""
+
+    _MESSAGE_RE = re.compile(r"^/app/([^/]+)/v3/message")
+    _TOKEN_RE = re.compile(r"^/app/([^/]+)/token")
+
+    def __init__(self, latency_seconds: float = 0.0, **kwargs):
+        super().__init__(latency_seconds, **kwargs)
+        self.sent: List[Dict[str, Any]] = []
+
+    def handle(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+        if path.startswith("/account/login"):
+            return 200, {"token": "stand-in-login-token"}
+        if self._TOKEN_RE.match(path):
+            return 200, {"token": {"token": "stand-in-app-token"}}
+        match = self._MESSAGE_RE.match(path)
+        if match and method == "POST":
+            message_id = f"standin-{uuid.uuid4().hex[:16]}"
+            with self._lock:
+                self.sent.append({
+                    "message_id": message_id,
+                    "app_id": match.group(1),
+                    "to": (body or {}).get("to"),
+                    "text": extract_sent_text(body or {}),
+                    "payload": body,
+                    "at": time.time()
+                })
+            return 200, {"id": message_id, "status": "submitted"}
+        return 404, {"error": f"stand-in: ruta no soportada {method} {path}"}
+
+    def sent_since(self, index: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.sent[index:])
+
+
+class OpenAIStandIn(_StandInServer):
+    """Imita /v1/chat/completions (con y sin streaming) con respuestas deterministas"""
+
+    def __init__(self, latency_seconds: float = 0.0, **kwargs):
+        super().__init__(latency_seconds, **kwargs)
+        self.completions = 0
+
+    def handle(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+        if not path.rstrip("/").endswith("/chat/completions"):
+            return 404, {"error": {"message": f"stand-in: ruta no soportada {path}"}}
+
+        body = body or {}
+        messages = body.get("messages") or []
+        content = self._reply(messages)
+        model = body.get("model", "stand-in")
+        with self._lock:
+            self.completions += 1
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        if body.get("stream"):
+            chunks = []
+            for piece in re.findall(r"\S+\s*", content):
+                chunks.append(json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]
+                }))
+            chunks.append(json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }))
+            chunks.append("[DONE]")
+            return 200, chunks
+
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        return 200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def _reply(self, messages: List[Dict[str, Any]]) -> str:
+        text = "\n".join(str(m.get("content") or "") for m in messages)
+        if ANALYZER_MARKER in text:
+            return json.dumps(STAND_IN_STRATEGY)
+        if SUMMARY_MARKER in text:
+            return "Resumen de prueba de la conversación."
+        last_user = next((str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), "")
+        return f"Respuesta de prueba a: {last_user[:200]}"
@@ -0,0 +1,96 @@
+# scripts/train_intent_model.py
+"""
+Entrena el modelo de intención de ruteo por cuenta a partir de tbl_simple_answer
+y el historial de tbl_message, y lo publica en INTENT_MODEL_DIR/<account_id>.npz.
+Las réplicas en ejecución lo recargan solas (IntentModelRegistry).
+
+Uso:
+    python -m scripts.train_intent_model --account-id coolbox
+    python -m scripts.train_intent_model --all [--days 90] [--dry-run]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+from app.models.accounts import TblAccounts
+from app.repositories.message_repository import MessageRepository
+from app.repositories.simple_answer_repository import SimpleAnswerRepository
+from app.repositories.text_chatbot_repository import TextChatbotRepository
+from app.routing.intent_model import IntentModel, intent_model_registry
+from app.routing.intent_training import build_training_set
+
+
+def train_account(db, account: TblAccounts, args) -> None:
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    answers = SimpleAnswerRepository(db).find_by_account_id(account.account_id)
+    initial_paths: List[str] = []
+    if account.from_uid:
+        initial_paths = [c.initial_path for c in TextChatbotRepository(db).find_by_from_uid(account.from_uid)]
+
+    texts, labels = build_training_set(
+        MessageRepository(db).iter_by_account_id(account.account_id, since=since),
+        answers,
+        initial_paths
+    )
+
+    if len(texts) < args.min_samples or len(set(labels)) < 2:
+        print(f"⏭️ {account.account_id}: datos insuficientes ({len(texts)} ejemplos, {len(set(labels))} etiquetas)")
+        return
+
+    # Validación simple con un holdout aleatorio
+    samples = list(zip(texts, labels))
+    random.Random(7).shuffle(samples)
+    holdout = samples[:int(len(samples) * args.holdout)]
+    train = samples[len(holdout):]
+
+    started = time.perf_counter()
+    model = IntentModel.train([text for text, _ in train], [label for _, label in train], epochs=args.epochs)
+    elapsed = time.perf_counter() - started
+    accuracy = model.accuracy([text for text, _ in holdout], [label for _, label in holdout]) if holdout else None
+
+    print(f"🧠 {account.account_id}: {len(train)} ejemplos, {len(model.labels)} etiquetas, "
+          f"entrenado en {elapsed:.1f}s, accuracy holdout: "
+          f"{f'{accuracy:.2%}' if accuracy is not None else 'n/a'}")
+
+    if args.dry_run:
+        return
+
+    # El modelo publicado se entrena con todos los ejemplos
+    model = IntentModel.train(texts, labels, epochs=args.epochs, metadata={
+        "account_id": account.account_id,
+        "trained_at": datetime.now().isoformat(),
+        "samples": len(texts),
+        "holdout_accuracy": accuracy
+    })
+    path = intent_model_registry.model_path(account.account_id)
+    model.save(path)
+    print(f"✅ {account.account_id}: modelo publicado en {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena el modelo de intención de ruteo por cuenta")
+    parser.add_argument("--account-id", action="append", default=[], help="Cuenta a entrenar (repetible)")
+    parser.add_argument("--all", action="store_true", help="Entrenar todas las cuentas")
+    parser.add_argument("--days", type=int, default=90, help="Historial a usar en días (0 = todo)")
+    parser.add_argument("--epochs", type=int, default=15)
+    parser.add_argument("--min-samples", type=int, default=30, help="Mínimo de ejemplos para entrenar")
+    parser.add_argument("--holdout", type=float, default=0.1, help="Fracción para medir accuracy")
+    parser.add_argument("--dry-run", action="store_true", help="Entrena y reporta sin publicar")
+    args = parser.parse_args()
+
+    if not args.all and not args.account_id:
+        parser.error("indicar --account-id o --all")
+
+    from config.database import db_session_scope
+
+    with db_session_scope() as db:
+        query = db.query(TblAccounts)
+        if not args.all:
+            query = query.filter(TblAccounts.account_id.in_(args.account_id))
+        for account in query.all():
+            train_account(db, account, args)
+
+
+if __name__ == "__main__":
+    main()